@@ -0,0 +1,179 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.datastructures import State
+from starlette.requests import Request
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+from loguru import logger
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import collections
+import csv
+import json
+import tempfile
+
+from huggingfastapi.core import readiness, security
+from huggingfastapi.core.config import BULK_EVAL_WINDOW
+from huggingfastapi.models.prediction import EvaluationResult
+from huggingfastapi.services.bulk import BulkRecord, iter_records
+from huggingfastapi.services.evaluation_cache import EvaluationCache
+from huggingfastapi.services.model_registry import TEXT_GENERATION
+from huggingfastapi.api.routes.prompt_evaluation import _evaluate_cached, _evaluate_cached_async, get_evaluator
+
+
+router = APIRouter()
+
+# GoTo evaluations of every bulk run share these threads instead of the default
+# threadpool, whose 40 tokens a few full windows would otherwise use up
+_goto_evaluations = ThreadPoolExecutor(max_workers=BULK_EVAL_WINDOW, thread_name_prefix="bulk-goto")
+
+
+async def _spool_body(request: Request) -> IO[bytes]:
+    """Copy the upload to a temporary file so parsing never holds the whole body in memory"""
+    spool = await run_in_threadpool(tempfile.TemporaryFile)
+    async for chunk in request.stream():
+        await run_in_threadpool(spool.write, chunk)
+    await run_in_threadpool(spool.seek, 0)
+    return spool
+
+
+def _bulk_evaluator(state: State, evaluator_name: str) -> Tuple[Any, str, Callable[[str], Awaitable[EvaluationResult]]]:
+    """Evaluator instance, model id and an awaitable evaluate(prompt) for one bulk run"""
+    if evaluator_name == "gemini":
+        eval_instance = get_evaluator()
+        model_id = eval_instance.model_name
+
+        def evaluate(prompt: str):
+            return _evaluate_cached_async(state, "gemini", eval_instance, model_id, prompt)
+    else:
+        eval_instance = state.goto_prompt_evaluator
+        model_id = state.text_goto_model.model_id
+
+        def evaluate(prompt: str):
+            # Concurrent GoTo evaluations share the generation scheduler's decode batch
+            return asyncio.wrap_future(
+                _goto_evaluations.submit(_evaluate_cached, state, "goto", eval_instance, model_id, prompt)
+            )
+
+    return eval_instance, model_id, evaluate
+
+
+class _BulkWindow:
+    """Evaluations in flight, in input order; duplicate prompts inside the window share one task"""
+
+    def __init__(self, evaluate: Callable[[str], Awaitable[EvaluationResult]], make_key: Callable[[str], str]):
+        self.summary = {"total": 0, "succeeded": 0, "failed": 0, "deduplicated": 0}
+        self._evaluate = evaluate
+        self._make_key = make_key
+        self._entries: collections.deque = collections.deque()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, record: BulkRecord) -> None:
+        key, task = None, None
+        if record.error is None:
+            key = self._make_key(record.prompt)
+            task = self._in_flight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._evaluate(record.prompt))
+                self._in_flight[key] = task
+            else:
+                self.summary["deduplicated"] += 1
+        self._entries.append((record, key, task))
+
+    async def emit_oldest(self) -> str:
+        record, key, task = self._entries.popleft()
+        if task is None:
+            return self._line(record, error=record.error)
+        if self._in_flight.get(key) is task and not any(pending is task for _, _, pending in self._entries):
+            del self._in_flight[key]
+        try:
+            return self._line(record, result=await asyncio.shield(task))
+        except Exception as e:
+            logger.error(f"Bulk evaluation of record {record.index} failed: {str(e)}")
+            return self._line(record, error=f"Evaluation failed: {str(e)}")
+
+    def cancel(self) -> None:
+        """Drop evaluations nobody will read, e.g. after the client disconnected"""
+        for _, _, task in self._entries:
+            if task is not None:
+                task.cancel()
+        self._entries.clear()
+        self._in_flight.clear()
+
+    def _line(self, record: BulkRecord, result: Any = None, error: Optional[str] = None) -> str:
+        self.summary["total"] += 1
+        self.summary["succeeded" if error is None else "failed"] += 1
+        data: Dict[str, Any] = {"index": record.index, "id": record.record_id, "success": error is None}
+        if error is None:
+            data["result"] = {**result.model_dump(), "success": True}
+        else:
+            data["error"] = error
+        return json.dumps(data, ensure_ascii=False) + "\n"
+
+
+async def _bulk_results(request: Request, spool: IO[bytes], fmt: str, evaluator_name: str) -> AsyncIterator[str]:
+    """Evaluate records with at most BULK_EVAL_WINDOW in flight and yield NDJSON lines in input order"""
+    eval_instance, model_id, evaluate = _bulk_evaluator(request.app.state, evaluator_name)
+    window = _BulkWindow(
+        evaluate,
+        lambda prompt: EvaluationCache.make_key(prompt, evaluator_name, model_id, eval_instance.rubric_version),
+    )
+
+    read_error = None
+    try:
+        try:
+            # Reading the spooled file blocks, so records are parsed on the threadpool
+            async for record in iterate_in_threadpool(iter_records(spool, fmt)):
+                window.add(record)
+                while len(window) >= BULK_EVAL_WINDOW:
+                    yield await window.emit_oldest()
+        except (ValueError, csv.Error) as e:
+            # Header, format or decoding (UnicodeDecodeError) problems found while reading;
+            # rows read before it are still reported below
+            read_error = str(e)
+
+        while window:
+            yield await window.emit_oldest()
+        if read_error is not None:
+            yield json.dumps({"success": False, "error": read_error}) + "\n"
+    finally:
+        window.cancel()
+        await run_in_threadpool(spool.close)
+
+    logger.info(f"Bulk evaluation finished: {window.summary}")
+    yield json.dumps({"summary": window.summary}) + "\n"
+
+
+@router.post("/evaluate-bulk", name="evaluate-prompt-bulk")
+async def post_evaluate_bulk(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    evaluator: str = Query("goto", pattern="^(goto|gemini)$"),
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+) -> StreamingResponse:
+    """
+    #### Evaluate a whole file of prompts and stream the results back as NDJSON
+
+    The request body is NDJSON (`{"id": ..., "prompt": ...}` per line) or CSV
+    with `prompt` and optional `id` columns; the format comes from `format`
+    or, if absent, from a `text/csv` Content-Type. Up to `BULK_EVAL_WINDOW`
+    prompts are evaluated concurrently, so they are batched together by the
+    generation backend, and identical prompts are evaluated once.
+
+    Each output line is `{"index", "id", "success", "result" | "error"}`, in
+    input order, followed by a final `{"summary": ...}` line.
+    """
+    if format is None:
+        format = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+
+    if evaluator == "goto":
+        readiness.ensure_model_ready(request.app.state, TEXT_GENERATION)
+        if getattr(request.app.state, "text_goto_model", None) is None:
+            raise HTTPException(status_code=500, detail="Text generation model not initialized")
+
+    spool = await _spool_body(request)
+    logger.info(f"Bulk evaluation request: {evaluator}, {format}")
+    return StreamingResponse(_bulk_results(request, spool, format, evaluator), media_type="application/x-ndjson")
@@ -0,0 +1,118 @@
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.datastructures import State
+from starlette.requests import Request
+from loguru import logger
+import threading
+
+from huggingfastapi.core import readiness, security
+from huggingfastapi.models.payload import EvaluationJobPayload
+from huggingfastapi.models.prediction import EvaluationJobStatus, EvaluationResult
+from huggingfastapi.services.jobs import EvaluationJob, EvaluationJobQueue, QueueFullError, check_callback_url
+from huggingfastapi.services.model_registry import TEXT_GENERATION
+from huggingfastapi.api.routes.prompt_evaluation import _evaluate_cached, get_evaluator
+
+
+router = APIRouter()
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue(state: State) -> EvaluationJobQueue:
+    """Get or create the app's job queue; workers start with the first job"""
+    with _job_queue_lock:
+        job_queue = getattr(state, "evaluation_jobs", None)
+        if job_queue is None:
+            job_queue = EvaluationJobQueue(lambda job: _run_job(state, job))
+            job_queue.start()
+            state.evaluation_jobs = job_queue
+        return job_queue
+
+
+def _run_job(state: State, job: EvaluationJob) -> EvaluationResult:
+    """Evaluate one job through the same cache and coalescing path as the sync routes"""
+    if job.evaluator == "gemini":
+        eval_instance = get_evaluator()
+        return _evaluate_cached(state, "gemini", eval_instance, eval_instance.model_name, job.prompt)
+
+    text_gen_model = getattr(state, "text_goto_model", None)
+    if text_gen_model is None:
+        raise Exception("Text generation model not initialized")
+    return _evaluate_cached(state, "goto", state.goto_prompt_evaluator, text_gen_model.model_id, job.prompt)
+
+
+@router.post("/evaluate-jobs", response_model=EvaluationJobStatus, status_code=202, name="create-evaluation-job")
+def post_evaluation_job(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    payload: EvaluationJobPayload = None,
+) -> EvaluationJobStatus:
+    """
+    #### Queue a prompt evaluation and return immediately with a job id
+
+    The job runs on a bounded worker pool in priority order (higher
+    `priority` first). Poll `GET /evaluate-jobs/{job_id}`, or pass
+    `callback_url` to receive the finished job as a JSON POST; it must
+    resolve to a public address or be listed in `EVAL_JOB_CALLBACK_HOSTS`.
+    Returns 503 with `Retry-After` when the queue is full.
+    """
+    if not payload or not payload.prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
+
+    prompt = payload.prompt.strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+
+    if len(prompt) > 3000:
+        raise HTTPException(status_code=400, detail="Prompt too long (max 3000 characters)")
+
+    callback_url = str(payload.callback_url) if payload.callback_url else None
+    if callback_url is not None:
+        try:
+            check_callback_url(callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid callback_url: {e}")
+
+    if payload.evaluator == "goto":
+        readiness.ensure_model_ready(request.app.state, TEXT_GENERATION)
+
+    job_queue = get_job_queue(request.app.state)
+    job = EvaluationJob(
+        evaluator=payload.evaluator,
+        prompt=prompt,
+        priority=payload.priority,
+        callback_url=callback_url,
+    )
+    try:
+        job_queue.submit(job)
+    except QueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(job_queue.retry_after())})
+
+    return job_queue.describe(job)
+
+
+@router.get("/evaluate-jobs/metrics", name="evaluation-job-metrics")
+def get_evaluation_job_metrics(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+):
+    """
+    #### Queue depth, worker usage and wait/run time percentiles of the job queue
+    """
+    return get_job_queue(request.app.state).stats()
+
+
+@router.get("/evaluate-jobs/{job_id}", response_model=EvaluationJobStatus, name="get-evaluation-job")
+def get_evaluation_job(
+    job_id: str,
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+) -> EvaluationJobStatus:
+    """
+    #### Status of a queued evaluation; `result` is set once it has succeeded
+    """
+    job_queue = get_job_queue(request.app.state)
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    return job_queue.describe(job)
@@ -1,6 +1,8 @@
 from fastapi import APIRouter
+from starlette.requests import Request
+from starlette.responses import Response
 
-from huggingfastapi.models.heartbeat import HearbeatResult
+from huggingfastapi.models.heartbeat import HearbeatResult, ReadinessResult
 
 router = APIRouter()
 
@@ -9,3 +11,16 @@ router = APIRouter()
 def get_hearbeat() -> HearbeatResult:
     heartbeat = HearbeatResult(is_alive=True)
     return heartbeat
+
+
+@router.get("/ready", response_model=ReadinessResult, name="readiness")
+def get_readiness(request: Request, response: Response) -> ReadinessResult:
+    """
+    #### Per-model load state; answers 503 until every model is loaded, for use as a readiness probe
+    """
+    registry = getattr(request.app.state, "model_registry", None)
+    models = registry.snapshot() if registry is not None else {}
+    is_ready = registry is not None and registry.is_ready()
+    if not is_ready:
+        response.status_code = 503
+    return ReadinessResult(is_ready=is_ready, models=models)
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from starlette.requests import Request
 from loguru import logger
 
-from huggingfastapi.core import security
-from huggingfastapi.models.payload import AIDetectionPayload
-from huggingfastapi.models.prediction import AIDetectionResult
+from huggingfastapi.core import readiness, security
+from huggingfastapi.models.payload import AIDetectionPayload, AIDetectionBatchPayload
+from huggingfastapi.models.prediction import AIDetectionResult, AIDetectionBatchResult, AIDetectionLongResult
+from huggingfastapi.services.model_registry import AI_DETECTION
 from huggingfastapi.services.nlp import AIDetectionModel
 
 router = APIRouter()
@@ -15,6 +16,7 @@ router = APIRouter()
 def post_detect_ai(
     request: Request,
     authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(AI_DETECTION)),
     block_data: AIDetectionPayload = None,
 ) -> AIDetectionResult:
     """
@@ -33,3 +35,55 @@ def post_detect_ai(
     prediction: AIDetectionResult = ai_model.predict(block_data)
 
     return prediction
+
+
+@router.post("/detect-ai/batch", response_model=AIDetectionBatchResult, name="detect-ai-batch")
+def post_detect_ai_batch(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(AI_DETECTION)),
+    block_data: AIDetectionBatchPayload = None,
+) -> AIDetectionBatchResult:
+    """
+    #### Detects AI-generated text for many texts in one call
+
+    Texts are tokenized without padding, grouped by length and run in
+    batches padded only to the longest text of each batch, so short texts
+    cost a fraction of a full-length forward pass.
+
+    Returns:
+    - results: One detection result per input item, in input order
+    """
+
+    if block_data is None or not block_data.items:
+        raise HTTPException(status_code=400, detail="At least one item is required")
+
+    ai_model: AIDetectionModel = request.app.state.ai_model
+    predictions = ai_model.predict_batch(block_data.items)
+
+    return AIDetectionBatchResult(results=predictions)
+
+
+@router.post("/detect-ai/long", response_model=AIDetectionLongResult, name="detect-ai-long")
+def post_detect_ai_long(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(AI_DETECTION)),
+    block_data: AIDetectionPayload = None,
+) -> AIDetectionLongResult:
+    """
+    #### Detects AI-generated text in documents longer than the model context
+
+    The text is split into overlapping windows of the model's maximum length
+    instead of being truncated, and the windows are scored in batches.
+
+    Returns:
+    - probability / label / prediction: Aggregate over the whole document
+    - max_probability: Highest probability of any single window
+    - spans: Token and character ranges of each window with its probability
+    """
+
+    ai_model: AIDetectionModel = request.app.state.ai_model
+    prediction: AIDetectionLongResult = ai_model.predict_long(block_data)
+
+    return prediction
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Callable, Dict, Iterator, Optional
+from starlette.datastructures import State
 from starlette.requests import Request
 from loguru import logger
 from datetime import datetime
+import json
 
-from huggingfastapi.core import security
+from huggingfastapi.core import readiness, security
 from huggingfastapi.models.payload import PromptEvaluationPayload
 from huggingfastapi.models.prediction import EvaluationResult, EvaluationResponse
+from huggingfastapi.services.evaluation_cache import EvaluationCache
+from huggingfastapi.services.model_registry import TEXT_GENERATION
 from huggingfastapi.services.nlp import GeminiPromptEvaluator, GoToPromptEvaluator
+from huggingfastapi.services.single_flight import SingleFlight
 from huggingfastapi.services.text_generation import TextGenerationModel
 
 
@@ -23,10 +29,53 @@ def get_evaluator():
     return evaluator
 
 
+def _no_store_if_degraded(response: Response, result: EvaluationResult) -> None:
+    """Keep downstream caches (the local gateway) from storing a partial result"""
+    if result.degraded:
+        response.headers["Cache-Control"] = "no-store"
+
+
+def _evaluate_cached(state: State, evaluator_name: str, eval_instance, model_id: str, prompt: str) -> EvaluationResult:
+    """Serve a stored result for an identical (normalized) prompt, or evaluate and store it
+
+    Identical requests arriving while an evaluation is running share that
+    evaluation instead of starting their own.
+    """
+    cache: EvaluationCache = getattr(state, "evaluation_cache", None)
+    single_flight: SingleFlight = getattr(state, "single_flight", None)
+    key = EvaluationCache.make_key(prompt, evaluator_name, model_id, eval_instance.rubric_version)
+
+    def compute() -> EvaluationResult:
+        if cache is None:
+            return eval_instance.evaluate_prompt(prompt)
+        return cache.get_or_compute(key, lambda: eval_instance.evaluate_prompt(prompt))
+
+    if single_flight is None:
+        return compute()
+    return single_flight.do(key, compute)
+
+
+async def _evaluate_cached_async(state: State, evaluator_name: str, eval_instance, model_id: str, prompt: str) -> EvaluationResult:
+    """Async variant of _evaluate_cached for evaluators with an `evaluate_prompt_async`"""
+    cache: EvaluationCache = getattr(state, "evaluation_cache", None)
+    single_flight: SingleFlight = getattr(state, "single_flight", None)
+    key = EvaluationCache.make_key(prompt, evaluator_name, model_id, eval_instance.rubric_version)
+
+    async def compute() -> EvaluationResult:
+        if cache is None:
+            return await eval_instance.evaluate_prompt_async(prompt)
+        return await cache.get_or_compute_async(key, lambda: eval_instance.evaluate_prompt_async(prompt))
+
+    if single_flight is None:
+        return await compute()
+    return await single_flight.do_async(key, compute)
+
+
 # Ganti `EvaluationResult` menjadi `EvaluationResponse` di sini
 @router.post("/evaluate", response_model=EvaluationResponse, name="evaluate-prompt")
-def post_evaluate_prompt(
+async def post_evaluate_prompt(
     request: Request,
+    response: Response,
     payload: PromptEvaluationPayload = None,
 ) -> EvaluationResponse:
     """
@@ -51,7 +100,9 @@ def post_evaluate_prompt(
         
         # Run evaluation
         logger.info(f"API Request: {prompt[:50]}...")
-        result: EvaluationResult = eval_instance.evaluate_prompt(prompt)
+        # Awaits Gemini on the event loop, so no worker thread is held while it responds
+        result: EvaluationResult = await _evaluate_cached_async(request.app.state, "gemini", eval_instance, eval_instance.model_name, prompt)
+        _no_store_if_degraded(response, result)
         
         # Ubah Pydantic model menjadi dict
         response_data = result.model_dump()
@@ -76,12 +127,14 @@ def post_evaluate_prompt(
 
 
 @router.get('/health', name="health-check")
-def health_check():
+def health_check(request: Request):
     """
     #### Health check endpoint
     Memeriksa status layanan dan konektivitas ke model Gemini.
     """
     eval_instance = get_evaluator()
+    cache: EvaluationCache = getattr(request.app.state, "evaluation_cache", None)
+    single_flight: SingleFlight = getattr(request.app.state, "single_flight", None)
     
     # Di FastAPI, cukup kembalikan dictionary.
     # FastAPI akan otomatis mengubahnya menjadi respons JSON.
@@ -91,6 +144,10 @@ def health_check():
         'version': '2.0.0',
         'model': 'gemini-2.5-pro',
         'gemini_connected': eval_instance.model is not None,
+        'gemini_in_flight': eval_instance.in_flight,
+        'gemini_max_concurrency': eval_instance.max_concurrency,
+        'evaluation_cache': cache.stats() if cache is not None else None,
+        'single_flight': single_flight.stats() if single_flight is not None else None,
         'timestamp': datetime.now().isoformat(),
         'success': True,
         'endpoints': {
@@ -102,6 +159,8 @@ def health_check():
 @router.post('/evaluate-goto', name="evaluate-prompt-goto")
 def post_evaluate_prompt_goto(
     request: Request,
+    response: Response,
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
     payload: PromptEvaluationPayload = None,
 ) -> EvaluationResponse:
     """
@@ -131,7 +190,8 @@ def post_evaluate_prompt_goto(
         
         # Run evaluation
         logger.info(f"GoTo API Request: {prompt[:50]}...")
-        result: EvaluationResult = goto_evaluator.evaluate_prompt(prompt)
+        result: EvaluationResult = _evaluate_cached(request.app.state, "goto", goto_evaluator, text_gen_model.model_id, prompt)
+        _no_store_if_degraded(response, result)
         
         # Convert Pydantic model to dict
         response_data = result.model_dump()
@@ -151,3 +211,106 @@ def post_evaluate_prompt_goto(
     except Exception as e:
         logger.error(f"Error in evaluation endpoint: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Evaluation failed: {str(e)}")
+
+
+def _sse(name: str, data: Dict[str, Any]) -> str:
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _replayed_sse(goto_evaluator: GoToPromptEvaluator, result: EvaluationResult, **done: Any) -> Iterator[str]:
+    """Replay a finished result in the same event shape as a live evaluation"""
+    for metric_name in goto_evaluator.metric_functions:
+        yield _sse("score", {"name": metric_name, "value": getattr(result, metric_name), "elapsed_ms": 0.0})
+    for metric_name in goto_evaluator.qualitative_functions:
+        yield _sse("field", {"name": metric_name, "value": getattr(result, metric_name), "elapsed_ms": 0.0})
+    yield _sse("done", {"result": {**result.model_dump(), 'success': True}, "elapsed_ms": 0.0, **done})
+
+
+def _live_sse(
+    goto_evaluator: GoToPromptEvaluator,
+    prompt: str,
+    on_done: Callable[[Optional[EvaluationResult], Optional[Exception]], None],
+) -> Iterator[str]:
+    """Stream a running evaluation; `on_done` runs on the evaluation thread, even if the client goes away"""
+    for event in goto_evaluator.evaluate_prompt_stream(prompt, on_done=on_done):
+        name = event.pop("event")
+        if name == "done":
+            result: EvaluationResult = event["result"]
+            logger.info(f"GoTo Stream Response: The Score {result.overall_score}")
+            event = {
+                "result": {**result.model_dump(), 'success': True}, "elapsed_ms": event["elapsed_ms"], "cached": False
+            }
+        yield _sse(name, event)
+
+
+def _goto_sse_events(state: State, key: str, goto_evaluator: GoToPromptEvaluator, prompt: str) -> Iterator[str]:
+    """Format the evaluator's progressive events as server-sent events; errors become a final `error` event
+
+    A stored result is replayed. Otherwise the stream joins single-flight like
+    `/evaluate-goto`: the first request for a prompt streams the evaluation
+    live, and identical requests (streamed or not) arriving meanwhile wait
+    for its result instead of evaluating the prompt again.
+    """
+    cache: EvaluationCache = getattr(state, "evaluation_cache", None)
+    single_flight: SingleFlight = getattr(state, "single_flight", None)
+    try:
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            yield from _replayed_sse(goto_evaluator, cached, cached=True)
+            return
+
+        future, leader = single_flight.claim(key) if single_flight is not None else (None, True)
+        if not leader:
+            yield from _replayed_sse(goto_evaluator, future.result(), cached=False, coalesced=True)
+            return
+
+        def settle(result: Optional[EvaluationResult], error: Optional[Exception]) -> None:
+            # Runs when the evaluation finishes, so followers and the cache do not depend on this client
+            if result is not None and cache is not None:
+                cache.put(key, result)
+            if future is not None:
+                single_flight.resolve(key, future, result=result, error=error)
+
+        yield from _live_sse(goto_evaluator, prompt, settle)
+    except Exception as e:
+        logger.error(f"Error in streaming evaluation endpoint: {str(e)}")
+        yield _sse("error", {"detail": f"Evaluation failed: {str(e)}"})
+
+
+@router.post('/evaluate-goto/stream', name="evaluate-prompt-goto-stream")
+def post_evaluate_prompt_goto_stream(
+    request: Request,
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
+    payload: PromptEvaluationPayload = None,
+) -> StreamingResponse:
+    """
+    #### Progressive GoTo evaluation using server-sent events
+
+    Same input as `/evaluate-goto`. Emits a `score` event for each metric and
+    a `field` event for each qualitative field (`name`, `value`, `elapsed_ms`)
+    as soon as it is ready, then a `done` event whose `result` is the full
+    `EvaluationResponse`. Failures are reported as an `error` event. A request
+    for a prompt that is already being evaluated waits for that evaluation
+    and replays it, with `coalesced: true` on the `done` event.
+    """
+    if not payload or not payload.prompt:
+        raise HTTPException(status_code=400, detail="Prompt is required")
+
+    prompt = payload.prompt.strip()
+    if not prompt:
+        raise HTTPException(status_code=400, detail="Prompt cannot be empty")
+
+    if len(prompt) > 3000:
+        raise HTTPException(status_code=400, detail="Prompt too long (max 3000 characters)")
+
+    text_gen_model: TextGenerationModel = request.app.state.text_goto_model
+    if text_gen_model is None:
+        raise HTTPException(status_code=500, detail="Text generation model not initialized")
+
+    goto_evaluator: GoToPromptEvaluator = request.app.state.goto_prompt_evaluator
+    key = EvaluationCache.make_key(prompt, "goto", text_gen_model.model_id, goto_evaluator.rubric_version)
+
+    logger.info(f"GoTo Stream Request: {prompt[:50]}...")
+    return StreamingResponse(
+        _goto_sse_events(request.app.state, key, goto_evaluator, prompt), media_type="text/event-stream"
+    )
@@ -1,19 +1,64 @@
+import asyncio
+import json
+import threading
+import uuid
+from typing import Any, Dict, Iterator
+
 from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
+from starlette.responses import StreamingResponse
 from loguru import logger
 
-from huggingfastapi.core import security
+from huggingfastapi.core import readiness, security
 from huggingfastapi.models.payload import TextGenerationPayload
-from huggingfastapi.models.prediction import TextGenerationResult
+from huggingfastapi.models.prediction import ChatSessionResult, TextGenerationResult
+from huggingfastapi.services.model_registry import TEXT_GENERATION
 from huggingfastapi.services.text_generation import TextGenerationModel
 
 router = APIRouter()
 
+CHAT_SYSTEM_MESSAGE = "Anda adalah asisten AI yang membantu dan ramah. Jawablah pertanyaan dengan jelas dan informatif."
+
+
+async def _generate(request: Request, payload: TextGenerationPayload) -> TextGenerationResult:
+    """Run generation through the continuous-batching scheduler when it is enabled
+
+    Chat session turns bypass the scheduler: they reuse their session's KV cache.
+    So do all requests when a draft model is loaded, since only the model's own
+    generate path decodes speculatively.
+    """
+    text_goto_model: TextGenerationModel = request.app.state.text_goto_model
+    scheduler = getattr(request.app.state, "generation_scheduler", None)
+    speculative = getattr(text_goto_model, "draft_model_id", None) is not None
+    if scheduler is not None and not payload.session_id and not speculative:
+        return await asyncio.wrap_future(scheduler.submit(payload))
+
+    return await run_in_threadpool(text_goto_model.generate, payload)
+
+
+def _sse_events(text_goto_model: TextGenerationModel, payload: TextGenerationPayload) -> Iterator[str]:
+    """Format the model's stream as server-sent events; errors become a final `error` event
+
+    Generation is cancelled when the client disconnects, which closes this generator.
+    """
+    cancel = threading.Event()
+    try:
+        for event in text_goto_model.stream(payload, cancel=cancel):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        logger.error(f"Error in streaming text generation: {str(e)}")
+        yield f"event: error\ndata: {json.dumps({'detail': f'Text generation failed: {str(e)}'})}\n\n"
+    finally:
+        cancel.set()
+
 
 @router.post("/generate-text", response_model=TextGenerationResult, name="generate-text")
-def post_generate_text(
+async def post_generate_text(
     request: Request,
     authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
     payload: TextGenerationPayload = None,
 ) -> TextGenerationResult:
     """
@@ -38,8 +83,7 @@ def post_generate_text(
     """
     
     try:
-        text_goto_model: TextGenerationModel = request.app.state.text_goto_model
-        result: TextGenerationResult = text_goto_model.generate(payload)
+        result: TextGenerationResult = await _generate(request, payload)
         return result
         
     except Exception as e:
@@ -48,9 +92,10 @@ def post_generate_text(
 
 
 @router.post("/chat", response_model=TextGenerationResult, name="chat")
-def post_chat(
+async def post_chat(
     request: Request,
     authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
     payload: TextGenerationPayload = None,
 ) -> TextGenerationResult:
     """
@@ -64,6 +109,10 @@ def post_chat(
     - conversation_history: Optional list of previous messages
     - max_new_tokens: Maximum number of new tokens to generate (default: 256)
     - temperature: Temperature for sampling (default: 0.7)
+    - session_id: Optional id from `POST /chat/sessions`. The server keeps the
+      conversation and its KV cache, so each turn only sends `text` and only
+      the new message is prefilled. `conversation_history`, when given,
+      overrides the stored history.
     
     Returns:
     - generated_text: The AI-generated response
@@ -71,15 +120,16 @@ def post_chat(
     - model: Name of the model used
     - input_length: Length of the input
     - output_length: Length of the generated output
+    - session_id, cached_tokens, prefill_tokens: For session turns, the prompt
+      tokens reused from the session's cache and the tokens prefilled
     """
     
     try:
         # Set a default system message for chat if none provided
         if not payload.system_message:
-            payload.system_message = "Anda adalah asisten AI yang membantu dan ramah. Jawablah pertanyaan dengan jelas dan informatif."
+            payload.system_message = CHAT_SYSTEM_MESSAGE
         
-        text_goto_model: TextGenerationModel = request.app.state.text_goto_model
-        result: TextGenerationResult = text_goto_model.generate(payload)
+        result: TextGenerationResult = await _generate(request, payload)
         return result
         
     except Exception as e:
@@ -87,3 +137,90 @@ def post_chat(
         raise HTTPException(status_code=500, detail=f"Chat failed: {str(e)}")
 
 
+@router.post("/generate-text/stream", name="generate-text-stream")
+def post_generate_text_stream(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
+    payload: TextGenerationPayload = None,
+) -> StreamingResponse:
+    """
+    #### Stream generated text as server-sent events
+
+    Same parameters as `/generate-text`. Emits `token` events with text chunks
+    as soon as they are decoded, then a `done` event with the full result and
+    latency metrics (`time_to_first_token_ms`, `mean_inter_token_latency_ms`,
+    `max_inter_token_latency_ms`, `generated_tokens`, `total_time_ms`).
+    """
+    if payload is None:
+        raise HTTPException(status_code=400, detail="Payload is required")
+
+    text_goto_model: TextGenerationModel = request.app.state.text_goto_model
+    return StreamingResponse(_sse_events(text_goto_model, payload), media_type="text/event-stream")
+
+
+@router.post("/chat/stream", name="chat-stream")
+def post_chat_stream(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
+    payload: TextGenerationPayload = None,
+) -> StreamingResponse:
+    """
+    #### Streaming chat endpoint using server-sent events
+
+    Same parameters and default system message as `/chat`; events as in
+    `/generate-text/stream`.
+    """
+    if payload is None:
+        raise HTTPException(status_code=400, detail="Payload is required")
+    if not payload.system_message:
+        payload.system_message = CHAT_SYSTEM_MESSAGE
+
+    text_goto_model: TextGenerationModel = request.app.state.text_goto_model
+    return StreamingResponse(_sse_events(text_goto_model, payload), media_type="text/event-stream")
+
+
+@router.post("/chat/sessions", response_model=ChatSessionResult, name="create-chat-session")
+async def post_chat_session(
+    authenticated: bool = Depends(security.validate_request),
+) -> ChatSessionResult:
+    """
+    #### Start a chat session
+
+    Returns a new `session_id` to pass to `/chat` and `/chat/stream`. The
+    session is created on its first turn and expires after `CHAT_SESSION_TTL`
+    seconds without one.
+    """
+    return ChatSessionResult(session_id=uuid.uuid4().hex)
+
+
+@router.get("/chat/sessions", name="chat-session-stats")
+async def get_chat_sessions(
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
+) -> Dict[str, Any]:
+    """
+    #### Session store statistics
+
+    Session count, cache hits, offloads, evictions and memory in use per tier.
+    """
+    text_goto_model: TextGenerationModel = request.app.state.text_goto_model
+    return await run_in_threadpool(text_goto_model.session_stats)
+
+
+@router.delete("/chat/sessions/{session_id}", name="delete-chat-session")
+async def delete_chat_session(
+    session_id: str,
+    request: Request,
+    authenticated: bool = Depends(security.validate_request),
+    ready: bool = Depends(readiness.require_model(TEXT_GENERATION)),
+) -> Dict[str, Any]:
+    """
+    #### End a chat session and free its KV cache
+    """
+    text_goto_model: TextGenerationModel = request.app.state.text_goto_model
+    if not await run_in_threadpool(text_goto_model.delete_session, session_id):
+        raise HTTPException(status_code=404, detail=f"Chat session not found: {session_id}")
+    return {"session_id": session_id, "deleted": True}
@@ -0,0 +1,270 @@
+"""Offline batch scoring without going through HTTP
+
+    python -m huggingfastapi.batch --task goto --input prompts.jsonl --output scores.jsonl --workers 2
+
+Input is JSONL or Parquet (needs `pyarrow`). Rows are split into `--workers`
+shards by row index, and each shard runs in its own process with its own
+model. Every shard appends one JSON line per finished row to its own part
+file, which doubles as the checkpoint: after a crash, rerunning the same
+command skips the rows already in the part files. When all shards finish,
+the parts are merged into `--output` in input order.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from loguru import logger
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import sys
+
+
+TASKS = ("goto", "gemini", "detect", "detect-long")
+# Default input column per task
+DEFAULT_FIELDS = {"goto": "prompt", "gemini": "prompt", "detect": "text", "detect-long": "text"}
+
+
+def iter_rows(path: Path, field: str, id_field: str) -> Iterator[Tuple[int, Optional[str], Any]]:
+    """Yield (index, id, text) for every input row without loading the whole file"""
+    if path.suffix == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet input requires pyarrow: pip install pyarrow")
+
+        index = 0
+        for batch in pq.ParquetFile(str(path)).iter_batches(batch_size=1024):
+            for row in batch.to_pylist():
+                record_id = row.get(id_field)
+                yield index, str(record_id) if record_id is not None else None, row.get(field)
+                index += 1
+        return
+
+    with open(path, encoding="utf-8") as source:
+        index = 0
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = {}
+            record_id = row.get(id_field) if isinstance(row, dict) else None
+            text = row.get(field) if isinstance(row, dict) else None
+            yield index, str(record_id) if record_id is not None else None, text
+            index += 1
+
+
+def completed_indices(part: Path) -> set:
+    """Indices already written to a part file, dropping a torn last line from a crash"""
+    if not part.exists():
+        return set()
+
+    done = set()
+    valid_bytes = 0
+    with open(part, "rb") as existing:
+        for line in existing:
+            try:
+                done.add(json.loads(line)["index"])
+            except (ValueError, KeyError):
+                break
+            valid_bytes += len(line)
+    if valid_bytes < part.stat().st_size:
+        logger.warning(f"Truncating incomplete line at the end of {part}")
+        with open(part, "r+b") as existing:
+            existing.truncate(valid_bytes)
+    return done
+
+
+def _build_scorer(task: str, concurrency: int) -> Tuple[Callable[[List[str]], List[Any]], Callable[[], None]]:
+    """Load the model for `task` and return (score a list of texts, cleanup)"""
+    if task in ("detect", "detect-long"):
+        from huggingfastapi.core.config import DEFAULT_MODEL_PATH
+        from huggingfastapi.models.payload import AIDetectionPayload
+        from huggingfastapi.services.nlp import AIDetectionModel
+
+        ai_model = AIDetectionModel(DEFAULT_MODEL_PATH)
+        if task == "detect":
+            return lambda texts: ai_model.predict_batch([AIDetectionPayload(text=text) for text in texts]), lambda: None
+        return lambda texts: [ai_model.predict_long(AIDetectionPayload(text=text)) for text in texts], lambda: None
+
+    if task == "gemini":
+        from huggingfastapi.services.nlp import GeminiPromptEvaluator
+
+        evaluator = GeminiPromptEvaluator()
+        scheduler = None
+    else:
+        from huggingfastapi.services.nlp import GoToPromptEvaluator
+        from huggingfastapi.services.scheduler import GenerationScheduler
+        from huggingfastapi.services.text_generation import TextGenerationModel
+
+        text_gen_model = TextGenerationModel()
+        # Rows evaluated concurrently share one decode batch
+        scheduler = GenerationScheduler(text_gen_model) if concurrency > 1 else None
+        if scheduler is not None:
+            scheduler.start()
+        evaluator = GoToPromptEvaluator(text_gen_model, scheduler=scheduler)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+
+    def score(texts: List[str]) -> List[Any]:
+        futures = [pool.submit(evaluator.evaluate_prompt, text) for text in texts]
+        return [_outcome(future) for future in futures]
+
+    def cleanup() -> None:
+        pool.shutdown()
+        if scheduler is not None:
+            scheduler.stop()
+        if hasattr(evaluator, "close"):
+            evaluator.close()
+
+    return score, cleanup
+
+
+def _outcome(future: Future) -> Any:
+    """Result of a future, or its exception, so one bad row does not stop the shard"""
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
+def run_shard(args: argparse.Namespace, shard: int, part: Path) -> None:
+    """Score every row of one shard that is not already in its part file"""
+    done = completed_indices(part)
+    pending = (
+        row for row in iter_rows(Path(args.input), args.field, args.id_field)
+        if row[0] % args.workers == shard and row[0] not in done
+    )
+    logger.info(f"Shard {shard}: {len(done)} rows already done, writing to {part}")
+
+    score, cleanup = _build_scorer(args.task, args.concurrency)
+    written = 0
+    try:
+        with open(part, "a", encoding="utf-8") as output:
+            while True:
+                chunk = [row for _, row in zip(range(args.batch_size), pending)]
+                if not chunk:
+                    break
+                valid = [
+                    (index, record_id, text) for index, record_id, text in chunk
+                    if isinstance(text, str) and text.strip()
+                ]
+                outcomes = iter(score([text.strip() for _, _, text in valid])) if valid else iter(())
+                results = {index: next(outcomes, None) for index, _, _ in valid}
+
+                for index, record_id, _ in chunk:
+                    record: Dict[str, Any] = {"index": index, "id": record_id}
+                    outcome = results.get(index, ValueError(f"Missing or empty '{args.field}'"))
+                    if isinstance(outcome, Exception):
+                        record.update(success=False, error=str(outcome))
+                    else:
+                        record.update(success=True, result=outcome.model_dump())
+                    output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                # A chunk is durable before the next one starts, so a crash loses at most one chunk
+                output.flush()
+                os.fsync(output.fileno())
+                written += len(chunk)
+                logger.info(f"Shard {shard}: {len(done) + written} rows done")
+    finally:
+        cleanup()
+
+
+def _shard_main(args: argparse.Namespace, shard: int, part: str) -> None:
+    run_shard(args, shard, Path(part))
+
+
+def merge_parts(parts: List[Path], output: Path) -> int:
+    """Merge the (index-ordered) part files into one output file in input order"""
+
+    def records(part: Path) -> Iterator[Tuple[int, str]]:
+        with open(part, encoding="utf-8") as source:
+            for line in source:
+                yield json.loads(line)["index"], line
+
+    count = 0
+    tmp = output.with_name(output.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as merged:
+        for _, line in heapq.merge(*(records(part) for part in parts), key=lambda item: item[0]):
+            merged.write(line)
+            count += 1
+    os.replace(tmp, output)
+    return count
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m huggingfastapi.batch", description=__doc__.splitlines()[0])
+    parser.add_argument("--task", choices=TASKS, required=True, help="Model to run on every row")
+    parser.add_argument("--input", required=True, help="JSONL or .parquet file")
+    parser.add_argument("--output", required=True, help="JSONL file written when all shards finish")
+    parser.add_argument("--field", help="Input column holding the text (default: prompt, or text for detect tasks)")
+    parser.add_argument("--id-field", default="id", help="Input column copied to each output row (default: id)")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Worker processes, each loading its own model (default: 1)"
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Rows evaluated at once per worker (default: 4)")
+    parser.add_argument("--batch-size", type=int, default=16, help="Rows per checkpointed chunk (default: 16)")
+    parser.add_argument("--restart", action="store_true", help="Discard earlier progress instead of resuming")
+    args = parser.parse_args(argv)
+    args.field = args.field or DEFAULT_FIELDS[args.task]
+    if args.workers < 1 or args.concurrency < 1 or args.batch_size < 1:
+        parser.error("--workers, --concurrency and --batch-size must be at least 1")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    output = Path(args.output)
+    work_dir = output.with_name(output.name + ".parts")
+    manifest_path = work_dir / "manifest.json"
+    manifest = {
+        "task": args.task,
+        "input": str(Path(args.input).resolve()),
+        "field": args.field,
+        "workers": args.workers,
+    }
+
+    if args.restart and work_dir.exists():
+        for stale in work_dir.iterdir():
+            stale.unlink()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    if manifest_path.exists():
+        previous = json.loads(manifest_path.read_text())
+        if previous != manifest:
+            logger.error(f"{work_dir} belongs to a different run ({previous}); use --restart to discard it")
+            return 2
+        logger.info(f"Resuming from {work_dir}")
+    else:
+        manifest_path.write_text(json.dumps(manifest))
+
+    parts = [work_dir / f"part-{shard:03d}.jsonl" for shard in range(args.workers)]
+    if args.workers == 1:
+        run_shard(args, 0, parts[0])
+    else:
+        # Spawn, not fork, so every worker initializes CUDA on its own
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=_shard_main, args=(args, shard, str(part)), name=f"batch-shard-{shard}")
+            for shard, part in enumerate(parts)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        failed = [process.name for process in processes if process.exitcode != 0]
+        if failed:
+            logger.error(f"Shards {failed} did not finish; rerun the same command to resume")
+            return 1
+
+    count = merge_parts(parts, output)
+    logger.info(f"Wrote {count} rows to {output}")
+    for stale in work_dir.iterdir():
+        stale.unlink()
+    work_dir.rmdir()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
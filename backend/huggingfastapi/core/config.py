@@ -1,5 +1,5 @@
 from starlette.config import Config
-from starlette.datastructures import Secret
+from starlette.datastructures import CommaSeparatedStrings, Secret
 
 APP_VERSION = "0.1.0"
 APP_NAME = "Hugging FastAPI"
@@ -16,3 +16,81 @@ AI_DETECTION_MODEL : str =  config("AI_DETECTION_MODEL")
 # Text generation model configuration
 TEXT_GENERATION_MODEL: str = config("TEXT_GENERATION_MODEL", default="GoToCompany/gemma2-9b-cpt-sahabatai-v1-instruct")
 GEMINI_API_KEY : str = config("GEMINI_API_KEY")
+
+# GoTo prompt evaluator configuration
+GOTO_EVAL_BATCHED: bool = config("GOTO_EVAL_BATCHED", cast=bool, default=True)
+GOTO_PREFIX_CACHE: bool = config("GOTO_PREFIX_CACHE", cast=bool, default=True)
+# Logit scoring: "logits" reads the numeric answer distribution, "generate" samples text
+GOTO_SCORE_MODE: str = config("GOTO_SCORE_MODE", default="logits")
+SCORE_MIN_BRANCH_PROB: float = config("SCORE_MIN_BRANCH_PROB", cast=float, default=0.01)
+
+# Continuous-batching scheduler for /generate-text and /chat
+GEN_SCHEDULER_ENABLED: bool = config("GEN_SCHEDULER_ENABLED", cast=bool, default=True)
+GEN_MAX_BATCH_SIZE: int = config("GEN_MAX_BATCH_SIZE", cast=int, default=8)
+GEN_TOKEN_BUDGET: int = config("GEN_TOKEN_BUDGET", cast=int, default=8192)
+# Prompt tokens per request (0 = unlimited); older history is dropped ("sliding_window") or summarized ("summarize")
+GEN_PROMPT_TOKEN_BUDGET: int = config("GEN_PROMPT_TOKEN_BUDGET", cast=int, default=4096)
+GEN_HISTORY_POLICY: str = config("GEN_HISTORY_POLICY", default="sliding_window")
+GEN_SUMMARY_MAX_TOKENS: int = config("GEN_SUMMARY_MAX_TOKENS", cast=int, default=128)
+# Speculative decoding: small draft model sharing the text generation tokenizer ("" = off), tokens drafted per step.
+# The scheduler does not draft, so with a draft model /generate-text and /chat bypass it and decode one at a time
+GEN_DRAFT_MODEL: str = config("GEN_DRAFT_MODEL", default="")
+GEN_DRAFT_TOKENS: int = config("GEN_DRAFT_TOKENS", cast=int, default=5)
+
+# Evaluation result cache (in-memory LRU + optional SQLite tier)
+EVAL_CACHE_SIZE: int = config("EVAL_CACHE_SIZE", cast=int, default=1024)
+EVAL_CACHE_TTL: float = config("EVAL_CACHE_TTL", cast=float, default=86400)
+EVAL_CACHE_DB_PATH: str = config("EVAL_CACHE_DB_PATH", default="")
+
+# AI detection batching
+AI_DETECTION_BATCH_SIZE: int = config("AI_DETECTION_BATCH_SIZE", cast=int, default=16)
+AI_DETECTION_MAX_BATCH_TOKENS: int = config("AI_DETECTION_MAX_BATCH_TOKENS", cast=int, default=8192)
+AI_DETECTION_WINDOW_OVERLAP: int = config("AI_DETECTION_WINDOW_OVERLAP", cast=int, default=128)
+
+# Gemini prompt evaluation (calls in flight, attempts per call, first backoff in seconds)
+GEMINI_MAX_CONCURRENCY: int = config("GEMINI_MAX_CONCURRENCY", cast=int, default=64)
+GEMINI_MAX_RETRIES: int = config("GEMINI_MAX_RETRIES", cast=int, default=3)
+GEMINI_RETRY_BASE_DELAY: float = config("GEMINI_RETRY_BASE_DELAY", cast=float, default=1.0)
+
+# GoTo evaluation sub-tasks submitted at once instead of stage by stage
+GOTO_EVAL_PARALLEL: bool = config("GOTO_EVAL_PARALLEL", cast=bool, default=True)
+
+# Evaluation job queue (worker threads, waiting jobs, seconds finished jobs are kept)
+EVAL_JOB_WORKERS: int = config("EVAL_JOB_WORKERS", cast=int, default=2)
+EVAL_JOB_MAX_QUEUE: int = config("EVAL_JOB_MAX_QUEUE", cast=int, default=100)
+EVAL_JOB_TTL: float = config("EVAL_JOB_TTL", cast=float, default=3600)
+# Hosts job callbacks may be POSTed to; empty allows any host that resolves to public addresses only
+EVAL_JOB_CALLBACK_HOSTS: CommaSeparatedStrings = config(
+    "EVAL_JOB_CALLBACK_HOSTS", cast=CommaSeparatedStrings, default=""
+)
+
+# Bulk evaluation (prompts evaluated concurrently by /evaluate-bulk)
+BULK_EVAL_WINDOW: int = config("BULK_EVAL_WINDOW", cast=int, default=32)
+
+# Shared model server for uvicorn workers ("" = every worker loads its own model)
+MODEL_SERVER_ADDRESS: str = config("MODEL_SERVER_ADDRESS", default="")
+MODEL_SERVER_AUTHKEY: str = config("MODEL_SERVER_AUTHKEY", default="") or str(API_KEY)
+MODEL_SERVER_POOL_SIZE: int = config("MODEL_SERVER_POOL_SIZE", cast=int, default=8)
+
+# Background model loading (seconds in Retry-After while models load)
+AI_DETECTION_ENABLED: bool = config("AI_DETECTION_ENABLED", cast=bool, default=True)
+MODEL_LOAD_RETRY_AFTER: float = config("MODEL_LOAD_RETRY_AFTER", cast=float, default=10)
+
+# Saved model artifacts, checked on load: "size" (sizes, re-hash files whose mtime changed),
+# "hash" (sha256 of every file) or "off"
+MODEL_ARTIFACT_VERIFY: str = config("MODEL_ARTIFACT_VERIFY", default="size")
+
+# AI detector backend: "torch", or "onnx" for an int8 ONNX Runtime graph on CPU-only nodes
+AI_DETECTION_BACKEND: str = config("AI_DETECTION_BACKEND", default="torch")
+AI_DETECTION_ONNX_THREADS: int = config("AI_DETECTION_ONNX_THREADS", cast=int, default=0)
+AI_DETECTION_ONNX_TOLERANCE: float = config("AI_DETECTION_ONNX_TOLERANCE", cast=float, default=0.05)
+
+# Tokenization pool (threads, work items prepared ahead of the model)
+TOKENIZER_THREADS: int = config("TOKENIZER_THREADS", cast=int, default=1)
+TOKENIZER_PREFETCH: int = config("TOKENIZER_PREFETCH", cast=int, default=2)
+
+# Server-side KV caches of /chat sessions (device budget, CPU offload budget with 0 = off, idle seconds)
+CHAT_SESSIONS_ENABLED: bool = config("CHAT_SESSIONS_ENABLED", cast=bool, default=True)
+CHAT_SESSION_MEMORY_MB: float = config("CHAT_SESSION_MEMORY_MB", cast=float, default=2048)
+CHAT_SESSION_OFFLOAD_MB: float = config("CHAT_SESSION_OFFLOAD_MB", cast=float, default=0)
+CHAT_SESSION_TTL: float = config("CHAT_SESSION_TTL", cast=float, default=1800)
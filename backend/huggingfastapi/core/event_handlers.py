@@ -1,11 +1,22 @@
 from typing import Callable
+import time
 
 from fastapi import FastAPI
 from loguru import logger
 
-from huggingfastapi.core.config import DEFAULT_MODEL_PATH
+from huggingfastapi.core.config import AI_DETECTION_ENABLED, DEFAULT_MODEL_PATH, GEN_SCHEDULER_ENABLED, MODEL_SERVER_ADDRESS
+from huggingfastapi.services.evaluation_cache import EvaluationCache
+from huggingfastapi.services.model_registry import AI_DETECTION, TEXT_GENERATION, ModelRegistry
+from huggingfastapi.services.model_server import (
+    ModelServerClient,
+    RemoteGenerationScheduler,
+    RemoteGoToPromptEvaluator,
+    RemoteTextGenerationModel,
+)
 from huggingfastapi.services.nlp import AIDetectionModel, GoToPromptEvaluator
-from huggingfastapi.services.text_generation import TextGenerationModel
+from huggingfastapi.services.scheduler import GenerationScheduler
+from huggingfastapi.services.single_flight import SingleFlight
+from huggingfastapi.services.text_generation import TextGenerationModel, download_model_files
 
 
 def _startup_ai_model(app: FastAPI) -> None:
@@ -14,24 +25,87 @@ def _startup_ai_model(app: FastAPI) -> None:
     app.state.ai_model = ai_model_instance
 
 
+def _startup_evaluation_cache(app: FastAPI) -> None:
+    app.state.evaluation_cache = EvaluationCache()
+    logger.info(f"Evaluation cache initialized: {app.state.evaluation_cache}")
+    app.state.single_flight = SingleFlight()
+
+
+def _startup_remote_text_generation_model(app: FastAPI) -> None:
+    client = ModelServerClient(MODEL_SERVER_ADDRESS)
+    while True:
+        try:
+            description = client.call("describe")
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            # The model server may still be starting next to this worker
+            logger.warning(f"Waiting for model server at {MODEL_SERVER_ADDRESS}...")
+            time.sleep(2)
+    app.state.text_goto_model = RemoteTextGenerationModel(client, description)
+    app.state.generation_scheduler = RemoteGenerationScheduler(client) if description["scheduler"] else None
+    app.state.goto_prompt_evaluator = RemoteGoToPromptEvaluator(client, description)
+    logger.info(f"Using shared model server: {client}")
+
+
 def _startup_text_generation_model(app: FastAPI) -> None:
+    if MODEL_SERVER_ADDRESS:
+        _startup_remote_text_generation_model(app)
+        return
+
     logger.info("Initializing text generation model...")
     text_goto_model_instance = TextGenerationModel()
     app.state.text_goto_model = text_goto_model_instance
-    app.state.goto_prompt_evaluator = GoToPromptEvaluator(text_goto_model_instance)
     logger.info("Text generation model initialized successfully.")
 
+    app.state.generation_scheduler = None
+    if GEN_SCHEDULER_ENABLED:
+        scheduler = GenerationScheduler(text_goto_model_instance)
+        scheduler.start()
+        app.state.generation_scheduler = scheduler
+        if text_goto_model_instance.draft_model_id is not None:
+            logger.warning(
+                "A draft model is loaded: /generate-text and /chat bypass the generation scheduler "
+                "to decode speculatively; GoTo evaluations still use the scheduler"
+            )
+
+    app.state.goto_prompt_evaluator = GoToPromptEvaluator(
+        text_goto_model_instance, scheduler=app.state.generation_scheduler
+    )
+
 
 def _shutdown_model(app: FastAPI) -> None:
+    if getattr(app.state, "evaluation_jobs", None) is not None:
+        app.state.evaluation_jobs.stop()
+        app.state.evaluation_jobs = None
+    if getattr(app.state, "generation_scheduler", None) is not None:
+        app.state.generation_scheduler.stop()
+        app.state.generation_scheduler = None
+    if getattr(app.state, "goto_prompt_evaluator", None) is not None:
+        app.state.goto_prompt_evaluator.close()
+        app.state.goto_prompt_evaluator = None
     app.state.ai_model = None
     app.state.text_goto_model = None
+    app.state.evaluation_cache = None
+    app.state.single_flight = None
+    app.state.model_registry = None
 
 
 def start_app_handler(app: FastAPI) -> Callable:
     def startup() -> None:
         logger.info("Running app start handler.")
-        # _startup_ai_model(app)
-        _startup_text_generation_model(app)
+        _startup_evaluation_cache(app)
+        # Weights load on background threads so health checks answer right away
+        registry = ModelRegistry()
+        if AI_DETECTION_ENABLED:
+            registry.register(AI_DETECTION, lambda: _startup_ai_model(app))
+        if MODEL_SERVER_ADDRESS:
+            registry.register(TEXT_GENERATION, lambda: _startup_text_generation_model(app), exclusive=False)
+        else:
+            registry.register(
+                TEXT_GENERATION, lambda: _startup_text_generation_model(app), prefetch=download_model_files
+            )
+        app.state.model_registry = registry
+        registry.start()
     return startup
 
 
@@ -0,0 +1,33 @@
+from typing import Callable
+
+from fastapi import HTTPException
+from starlette.datastructures import State
+from starlette.requests import Request
+from starlette.status import HTTP_500_INTERNAL_SERVER_ERROR, HTTP_503_SERVICE_UNAVAILABLE
+
+from huggingfastapi.services.model_registry import ModelNotReadyError
+
+
+def ensure_model_ready(state: State, name: str) -> None:
+    registry = getattr(state, "model_registry", None)
+    if registry is None:
+        return
+    try:
+        registry.check(name)
+    except ModelNotReadyError as e:
+        # A failed or unregistered model will not become ready by retrying
+        if e.status == "failed":
+            raise HTTPException(status_code=HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+        if e.status == "disabled":
+            raise HTTPException(status_code=HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+        raise HTTPException(
+            status_code=HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
+
+
+def require_model(name: str) -> Callable[[Request], bool]:
+    def dependency(request: Request) -> bool:
+        ensure_model_ready(request.app.state, name)
+        return True
+
+    return dependency
@@ -1,5 +1,18 @@
+from typing import Dict, Optional
+
 from pydantic import BaseModel
 
 
 class HearbeatResult(BaseModel):
     is_alive: bool
+
+
+class ModelReadiness(BaseModel):
+    status: str
+    load_time_s: Optional[float] = None
+    error: Optional[str] = None
+
+
+class ReadinessResult(BaseModel):
+    is_ready: bool
+    models: Dict[str, ModelReadiness]
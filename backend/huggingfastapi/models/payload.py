@@ -1,18 +1,31 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional
+from pydantic import BaseModel, HttpUrl
+from typing import List, Dict, Literal, Optional
 
 
 class AIDetectionPayload(BaseModel):   
     text: str = "AI Detection is a process to determine if text is generated by AI or written by a human. This is a default text for testing purposes."
 
 
+class AIDetectionBatchPayload(BaseModel):
+    items: List[AIDetectionPayload]
+
+
 class TextGenerationPayload(BaseModel):
     text: str
     system_message: Optional[str] = None
     conversation_history: Optional[List[Dict[str, str]]] = None
     max_new_tokens: int = 256
     temperature: float = 0.7
+    session_id: Optional[str] = None
 
 
 class PromptEvaluationPayload(BaseModel):
     prompt: str
+
+
+class EvaluationJobPayload(BaseModel):
+    prompt: str
+    evaluator: Literal["goto", "gemini"] = "goto"
+    priority: int = 0
+    # Only http(s) URLs; the finished job is POSTed there
+    callback_url: Optional[HttpUrl] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from huggingfastapi.core.config import AI_DETECTION_MODEL
 
 
@@ -11,12 +11,56 @@ class AIDetectionResult(BaseModel):
     model: str = AI_DETECTION_MODEL
 
 
+class AIDetectionBatchResult(BaseModel):
+    results: List[AIDetectionResult]
+
+
+class AIDetectionSpan(BaseModel):
+    start_token: int
+    end_token: int
+    start_char: int
+    end_char: int
+    probability: float
+    label: int
+
+
+class AIDetectionLongResult(AIDetectionResult):
+    max_probability: float
+    token_count: int
+    window_count: int
+    spans: List[AIDetectionSpan]
+
+
 class TextGenerationResult(BaseModel):
     generated_text: str
     full_conversation: List[Dict[str, str]]
     model: str
     input_length: int
     output_length: int
+    session_id: Optional[str] = None
+    cached_tokens: Optional[int] = None
+    prefill_tokens: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    history_tokens_kept: Optional[int] = None
+    history_tokens_dropped: Optional[int] = None
+    history_messages_dropped: Optional[int] = None
+    history_summarized: Optional[bool] = None
+    draft_model: Optional[str] = None
+    acceptance_rate: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+
+
+class ChatSessionResult(BaseModel):
+    session_id: str
+
+
+class TextScoreResult(BaseModel):
+    """Score read from the next-token distribution over numeric answers"""
+    expected_score: float
+    most_likely_score: int
+    confidence: float
+    valid_mass: float
+    model: str
     
 class EvaluationResult(BaseModel):
     """Data class for storing evaluation results"""
@@ -33,6 +77,8 @@ class EvaluationResult(BaseModel):
     evaluation_details: Dict
     sources_used: List[str]
     timestamp: str
+    # True when some metrics fell back to defaults (failed sub-task, truncated response); never cached
+    degraded: bool = False
 
     # def to_dict(self) -> Dict:
     #     """Convert to dictionary for JSON serialization"""
@@ -42,3 +88,19 @@ class EvaluationResult(BaseModel):
 class EvaluationResponse(EvaluationResult):
     """Final API response including a success flag."""
     success: bool
+
+
+class EvaluationJobStatus(BaseModel):
+    job_id: str
+    status: str
+    evaluator: str
+    priority: int
+    queue_position: Optional[int] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    wait_time_ms: Optional[float] = None
+    run_time_ms: Optional[float] = None
+    result: Optional[EvaluationResponse] = None
+    error: Optional[str] = None
+    callback_status: Optional[str] = None
@@ -0,0 +1,64 @@
+from typing import IO, Iterator, NamedTuple, Optional
+import csv
+import io
+import json
+
+
+# Same limit as the single-prompt evaluation routes
+MAX_PROMPT_LENGTH = 3000
+
+
+class BulkRecord(NamedTuple):
+    """One input row of a bulk evaluation; `error` is set instead of `prompt` for invalid rows"""
+    index: int
+    record_id: Optional[str]
+    prompt: Optional[str]
+    error: Optional[str] = None
+
+
+def _validated(index: int, record_id: Optional[str], prompt) -> BulkRecord:
+    if not isinstance(prompt, str) or not prompt.strip():
+        return BulkRecord(index, record_id, None, "Prompt is required")
+    prompt = prompt.strip()
+    if len(prompt) > MAX_PROMPT_LENGTH:
+        return BulkRecord(index, record_id, None, f"Prompt too long (max {MAX_PROMPT_LENGTH} characters)")
+    return BulkRecord(index, record_id, prompt)
+
+
+def iter_records(stream: IO[bytes], fmt: str) -> Iterator[BulkRecord]:
+    """Lazily parse an NDJSON or CSV byte stream into BulkRecords
+
+    NDJSON lines are objects with a `prompt` and an optional `id`; CSV needs a
+    header row with a `prompt` column and an optional `id` column. Rows are
+    read one at a time, so memory does not grow with the input size. A
+    malformed row yields a record with `error` set rather than stopping the
+    whole file.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        if reader.fieldnames is None or "prompt" not in reader.fieldnames:
+            raise ValueError("CSV input needs a header row with a 'prompt' column")
+        for index, row in enumerate(reader):
+            yield _validated(index, row.get("id") or None, row.get("prompt"))
+        return
+
+    if fmt != "ndjson":
+        raise ValueError(f"Unsupported bulk format: {fmt}")
+
+    index = 0
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield BulkRecord(index, None, None, f"Invalid JSON: {e}")
+        else:
+            if isinstance(item, dict):
+                record_id = item.get("id")
+                yield _validated(index, str(record_id) if record_id is not None else None, item.get("prompt"))
+            else:
+                yield BulkRecord(index, None, None, "Each line must be a JSON object with a 'prompt'")
+        index += 1
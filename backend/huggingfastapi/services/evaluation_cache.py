@@ -0,0 +1,173 @@
+from typing import Awaitable, Callable, Dict, Optional
+from loguru import logger
+from pathlib import Path
+from starlette.concurrency import run_in_threadpool
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from huggingfastapi.models.prediction import EvaluationResult
+from huggingfastapi.core.config import EVAL_CACHE_DB_PATH, EVAL_CACHE_SIZE, EVAL_CACHE_TTL
+
+
+class EvaluationCache:
+    """Content-addressed cache for prompt evaluation results
+
+    Entries are keyed on the normalized prompt plus the evaluator, model id
+    and rubric version, so changing any of them never serves stale scores.
+    Lookups go to an in-memory LRU tier first, then to an optional SQLite
+    tier shared across restarts. Both tiers expire entries after
+    `ttl_seconds` (0 disables expiry).
+    """
+
+    # Expired on-disk rows are swept at startup and every EVICTION_INTERVAL writes
+    EVICTION_INTERVAL = 256
+
+    def __init__(
+        self,
+        max_entries: int = EVAL_CACHE_SIZE,
+        db_path: Optional[str] = EVAL_CACHE_DB_PATH,
+        ttl_seconds: float = EVAL_CACHE_TTL,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = Path(db_path) if db_path else None
+
+        self._lock = threading.Lock()
+        # key -> (stored_at, serialized EvaluationResult)
+        self._memory: "collections.OrderedDict[str, tuple]" = collections.OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "memory_hits": 0, "disk_hits": 0}
+        self._writes = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if self.db_path is not None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._evict_expired()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(max_entries={self.max_entries}, db_path={self.db_path}, ttl_seconds={self.ttl_seconds})"
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Unicode-normalize and collapse whitespace so trivially different pastes share one entry"""
+        return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+    @classmethod
+    def make_key(cls, prompt: str, evaluator: str, model_id: str, rubric_version: str) -> str:
+        material = json.dumps(
+            [cls.normalize_prompt(prompt), evaluator, model_id, rubric_version], ensure_ascii=False
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return bool(self.ttl_seconds) and time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[EvaluationResult]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["memory_hits"] += 1
+                return EvaluationResult.model_validate_json(entry[1])
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, stored_at FROM evaluations WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[1]):
+                    self._remember(key, row[1], row[0])
+                    self._stats["hits"] += 1
+                    self._stats["disk_hits"] += 1
+                    return EvaluationResult.model_validate_json(row[0])
+
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key: str, result: EvaluationResult) -> None:
+        if result.degraded:
+            # A retry may well succeed, so a partial result must not be served for the whole TTL
+            logger.info(f"Not caching degraded evaluation result: {key[:12]}")
+            return
+        stored_at = time.time()
+        value = result.model_dump_json()
+        with self._lock:
+            self._remember(key, stored_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO evaluations (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, value, stored_at),
+                )
+                self._db.commit()
+            self._writes += 1
+            sweep = self._writes % self.EVICTION_INTERVAL == 0
+        if sweep:
+            self._evict_expired()
+
+    def get_or_compute(self, key: str, compute: Callable[[], EvaluationResult]) -> EvaluationResult:
+        """Return the cached result for `key`, or compute, store and return it"""
+        cached = self.get(key)
+        if cached is not None:
+            logger.info(f"Evaluation cache hit: {key[:12]}")
+            return cached
+
+        result = compute()
+        self.put(key, result)
+        return result
+
+    async def get_or_compute_async(
+        self, key: str, compute: Callable[[], Awaitable[EvaluationResult]]
+    ) -> EvaluationResult:
+        """Async variant of get_or_compute for evaluators that await their model
+
+        The lookup and the store may hit SQLite, so they run in the thread pool
+        rather than blocking the event loop.
+        """
+        cached = await run_in_threadpool(self.get, key)
+        if cached is not None:
+            logger.info(f"Evaluation cache hit: {key[:12]}")
+            return cached
+
+        result = await compute()
+        await run_in_threadpool(self.put, key, result)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_enabled": self._db is not None,
+            }
+
+    def _remember(self, key: str, stored_at: float, value: str) -> None:
+        """Insert into the LRU tier and evict the least recently used entries (caller holds the lock)"""
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_expired(self) -> None:
+        if self._db is None or not self.ttl_seconds:
+            return
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM evaluations WHERE stored_at < ?", (time.time() - self.ttl_seconds,)
+            ).rowcount
+            self._db.commit()
+        if deleted:
+            logger.info(f"Evicted {deleted} expired evaluation cache entries from {self.db_path}")
@@ -0,0 +1,309 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from loguru import logger
+import collections
+import ipaddress
+import itertools
+import json
+import math
+import queue
+import socket
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+from huggingfastapi.models.prediction import EvaluationResult
+from huggingfastapi.core.config import EVAL_JOB_CALLBACK_HOSTS, EVAL_JOB_MAX_QUEUE, EVAL_JOB_TTL, EVAL_JOB_WORKERS
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity and a new job is refused"""
+
+
+def check_callback_url(url: str, allowed_hosts: Sequence[str] = EVAL_JOB_CALLBACK_HOSTS) -> None:
+    """Raise ValueError unless the server may POST job results to `url`
+
+    The URL must be http(s). With `allowed_hosts` configured only those hosts
+    are accepted; otherwise the host must resolve to public addresses only, so
+    callbacks cannot reach loopback, private or link-local (cloud metadata)
+    services from inside the deployment.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError("callback URL must be http or https")
+    host = parts.hostname
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise ValueError(f"callback host {host} is not in EVAL_JOB_CALLBACK_HOSTS")
+        return
+
+    try:
+        addresses = socket.getaddrinfo(host, parts.port or parts.scheme, proto=socket.IPPROTO_TCP)
+    except OSError as e:
+        raise ValueError(f"callback host {host} does not resolve: {e}")
+    for *_, sockaddr in addresses:
+        address = ipaddress.ip_address(sockaddr[0])
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"callback host {host} resolves to a non-public address")
+
+
+class _NoRedirects(urllib.request.HTTPRedirectHandler):
+    """Redirects could point a checked callback at an internal address, so none are followed"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_callback_opener = urllib.request.build_opener(_NoRedirects)
+
+
+@dataclass
+class EvaluationJob:
+    """One queued evaluation and its lifecycle timestamps"""
+    evaluator: str
+    prompt: str
+    priority: int = 0
+    callback_url: Optional[str] = None
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"
+    result: Optional[EvaluationResult] = None
+    error: Optional[str] = None
+    callback_status: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def wait_time_ms(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return round((self.started_at - self.created_at) * 1000, 1)
+
+    @property
+    def run_time_ms(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return round((self.finished_at - self.started_at) * 1000, 1)
+
+
+class EvaluationJobQueue:
+    """Priority queue of evaluation jobs served by a bounded pool of worker threads
+
+    Higher `priority` runs first, ties run in submission order. Submitting to
+    a full queue raises QueueFullError so the API can shed load with a 503
+    instead of letting requests pile up. Finished jobs are kept for
+    `ttl_seconds` so clients can poll them, and are optionally POSTed to the
+    job's callback URL from a separate thread pool, so slow receivers never
+    hold an evaluation worker.
+    """
+
+    CALLBACK_TIMEOUT = 10
+    CALLBACK_ATTEMPTS = 3
+    CALLBACK_WORKERS = 4
+    # Retry-After (seconds) for a full queue before any job has finished, and its upper bound
+    DEFAULT_RETRY_AFTER = 30
+    MAX_RETRY_AFTER = 300
+    # Number of recent jobs the wait/run time metrics are computed over
+    METRICS_WINDOW = 256
+
+    def __init__(
+        self,
+        runner: Callable[[EvaluationJob], EvaluationResult],
+        workers: int = EVAL_JOB_WORKERS,
+        max_queue: int = EVAL_JOB_MAX_QUEUE,
+        ttl_seconds: float = EVAL_JOB_TTL,
+    ):
+        self.runner = runner
+        self.workers = workers
+        self.max_queue = max_queue
+        self.ttl_seconds = ttl_seconds
+
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._jobs: Dict[str, EvaluationJob] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._callbacks: Optional[ThreadPoolExecutor] = None
+        self._running = False
+
+        self._stats = {"submitted": 0, "rejected": 0, "succeeded": 0, "failed": 0, "running": 0}
+        self._wait_times: collections.deque = collections.deque(maxlen=self.METRICS_WINDOW)
+        self._run_times: collections.deque = collections.deque(maxlen=self.METRICS_WINDOW)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(workers={self.workers}, max_queue={self.max_queue}, ttl_seconds={self.ttl_seconds})"
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._callbacks = ThreadPoolExecutor(max_workers=self.CALLBACK_WORKERS, thread_name_prefix="evaluation-callback")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"evaluation-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Evaluation job queue started: {self}")
+
+    def stop(self) -> None:
+        self._running = False
+        for _ in self._threads:
+            # Sentinels sort after every real job, so queued work drains first
+            self._queue.put((float("inf"), next(self._sequence), None))
+        for thread in self._threads:
+            thread.join(timeout=10)
+        self._threads = []
+        if self._callbacks is not None:
+            self._callbacks.shutdown(wait=False)
+            self._callbacks = None
+        logger.info("Evaluation job queue stopped.")
+
+    def submit(self, job: EvaluationJob) -> EvaluationJob:
+        with self._lock:
+            self._evict_expired()
+            if self._queue.qsize() >= self.max_queue:
+                self._stats["rejected"] += 1
+                raise QueueFullError(f"Evaluation queue is full ({self.max_queue} jobs waiting)")
+            self._jobs[job.job_id] = job
+            self._stats["submitted"] += 1
+        self._queue.put((-job.priority, next(self._sequence), job))
+        logger.info(f"Evaluation job {job.job_id} queued ({job.evaluator}, priority {job.priority})")
+        return job
+
+    def get(self, job_id: str) -> Optional[EvaluationJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job: EvaluationJob) -> Optional[int]:
+        """1-based position among waiting jobs, or None once the job has started"""
+        if job.status != "queued":
+            return None
+        with self._queue.mutex:
+            waiting = sorted(entry for entry in self._queue.queue if entry[2] is not None)
+        for position, entry in enumerate(waiting, start=1):
+            if entry[2] is job:
+                return position
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "workers": self.workers,
+                "stored_jobs": len(self._jobs),
+                "wait_time_ms": self._summary(self._wait_times),
+                "run_time_ms": self._summary(self._run_times),
+            }
+
+    def retry_after(self) -> int:
+        """Seconds until a full queue likely has room: the mean run time spread over the workers"""
+        with self._lock:
+            run_times = list(self._run_times)
+        if not run_times:
+            return self.DEFAULT_RETRY_AFTER
+        seconds = sum(run_times) / len(run_times) / 1000 / max(self.workers, 1)
+        return min(max(math.ceil(seconds), 1), self.MAX_RETRY_AFTER)
+
+    @staticmethod
+    def _summary(values: collections.deque) -> Dict[str, Optional[float]]:
+        if not values:
+            return {"mean": None, "p95": None, "max": None}
+        ordered = sorted(values)
+        return {
+            "mean": round(sum(ordered) / len(ordered), 1),
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+        }
+
+    def _work(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            self._run(job)
+
+    def _run(self, job: EvaluationJob) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        with self._lock:
+            self._stats["running"] += 1
+            self._wait_times.append(job.wait_time_ms)
+
+        try:
+            job.result = self.runner(job)
+            job.status = "succeeded"
+        except Exception as e:
+            logger.error(f"Evaluation job {job.job_id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = time.time()
+
+        with self._lock:
+            self._stats["running"] -= 1
+            self._stats[job.status] += 1
+            self._run_times.append(job.run_time_ms)
+        logger.info(f"Evaluation job {job.job_id} {job.status} in {job.run_time_ms} ms")
+
+        if job.callback_url:
+            job.callback_status = "pending"
+            self._callbacks.submit(self._send_callback, job)
+
+    def _send_callback(self, job: EvaluationJob) -> None:
+        # The API checks callback URLs too; checked again here because the host may resolve differently by now
+        try:
+            check_callback_url(job.callback_url)
+        except ValueError as e:
+            logger.warning(f"Callback for job {job.job_id} skipped: {e}")
+            job.callback_status = f"failed: {e}"
+            return
+
+        body = json.dumps(self.describe(job), ensure_ascii=False).encode("utf-8")
+        for attempt in range(self.CALLBACK_ATTEMPTS):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+            try:
+                callback = urllib.request.Request(
+                    job.callback_url, data=body, headers={"Content-Type": "application/json"}, method="POST"
+                )
+                with _callback_opener.open(callback, timeout=self.CALLBACK_TIMEOUT) as response:  # nosec B310
+                    job.callback_status = f"delivered ({response.status})"
+                    return
+            except Exception as e:
+                logger.warning(f"Callback for job {job.job_id} failed (attempt {attempt + 1}): {e}")
+                job.callback_status = f"failed: {e}"
+
+    def describe(self, job: EvaluationJob) -> Dict[str, Any]:
+        """Public JSON view of a job, shared by the polling API and callbacks"""
+        return {
+            "job_id": job.job_id,
+            "status": job.status,
+            "evaluator": job.evaluator,
+            "priority": job.priority,
+            "queue_position": self.queue_position(job),
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "wait_time_ms": job.wait_time_ms,
+            "run_time_ms": job.run_time_ms,
+            "result": {**job.result.model_dump(), "success": True} if job.result is not None else None,
+            "error": job.error,
+            "callback_status": job.callback_status,
+        }
+
+    def _evict_expired(self) -> None:
+        """Drop finished jobs older than the TTL (caller holds the lock)"""
+        if not self.ttl_seconds:
+            return
+        cutoff = time.time() - self.ttl_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
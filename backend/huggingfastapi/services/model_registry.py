@@ -0,0 +1,127 @@
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+from loguru import logger
+import math
+import threading
+import time
+
+from huggingfastapi.core.config import MODEL_LOAD_RETRY_AFTER
+
+
+# Registry names of the models loaded at startup
+AI_DETECTION = "ai_detection"
+TEXT_GENERATION = "text_generation"
+
+
+class ModelNotReadyError(Exception):
+    """Raised when a request needs a model that is still loading or failed to load"""
+
+    def __init__(self, name: str, status: str, retry_after: int):
+        super().__init__(f"Model '{name}' is not ready ({status})")
+        self.name = name
+        self.status = status
+        self.retry_after = retry_after
+
+
+@dataclass
+class ModelLoadState:
+    name: str
+    status: str = "pending"  # pending, loading, ready, failed
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def load_time_s(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return round((self.finished_at or time.time()) - self.started_at, 3)
+
+
+class ModelRegistry:
+    """Loads models on background threads so the server accepts traffic while weights load
+
+    Every registered model loads on its own thread. The optional `prefetch`
+    step (downloading weights) runs fully concurrently; exclusive loaders then
+    instantiate one at a time, because accelerate's empty-weights init patches
+    torch globally and two models built at once can end up on the meta device.
+    Routes ask `check(name)` before touching a model and get a
+    ModelNotReadyError, with a Retry-After estimate, instead of blocking until
+    the load finishes.
+    """
+
+    def __init__(self, retry_after: float = MODEL_LOAD_RETRY_AFTER):
+        self.retry_after = retry_after
+        self._loaders: Dict[str, Tuple[Callable[[], None], Optional[Callable[[], None]], bool]] = {}
+        self._states: Dict[str, ModelLoadState] = {}
+        self._construct_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(models={list(self._states)})"
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], None],
+        prefetch: Optional[Callable[[], None]] = None,
+        exclusive: bool = True,
+    ) -> None:
+        self._loaders[name] = (loader, prefetch, exclusive)
+        self._states[name] = ModelLoadState(name)
+
+    def start(self) -> None:
+        for name, (loader, prefetch, exclusive) in self._loaders.items():
+            threading.Thread(
+                target=self._load, args=(name, loader, prefetch, exclusive), name=f"load-{name}", daemon=True
+            ).start()
+
+    def _load(self, name: str, loader: Callable[[], None], prefetch: Optional[Callable[[], None]], exclusive: bool) -> None:
+        state = self._states[name]
+        state.status = "loading"
+        state.started_at = time.time()
+        logger.info(f"Loading model '{name}' in the background...")
+        try:
+            if prefetch is not None:
+                prefetch()
+            if exclusive:
+                with self._construct_lock:
+                    loader()
+            else:
+                loader()
+            state.status = "ready"
+            logger.info(f"Model '{name}' ready after {state.load_time_s}s")
+        except Exception as e:
+            state.status = "failed"
+            state.error = str(e)
+            logger.error(f"Model '{name}' failed to load: {str(e)}")
+        finally:
+            state.finished_at = time.time()
+            state.done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every model finished loading (or failed); False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for state in self._states.values():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not state.done.wait(remaining):
+                return False
+        return True
+
+    def is_ready(self, name: Optional[str] = None) -> bool:
+        if name is not None:
+            return name in self._states and self._states[name].status == "ready"
+        return all(state.status == "ready" for state in self._states.values())
+
+    def check(self, name: str) -> None:
+        state = self._states.get(name)
+        if state is None:
+            raise ModelNotReadyError(name, "disabled", math.ceil(self.retry_after))
+        if state.status != "ready":
+            raise ModelNotReadyError(name, state.status, math.ceil(self.retry_after))
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {
+            name: {"status": state.status, "load_time_s": state.load_time_s, "error": state.error}
+            for name, state in self._states.items()
+        }
@@ -0,0 +1,342 @@
+"""Single process that owns the model weights for multi-worker deployments
+
+    python -m huggingfastapi.services.model_server
+    MODEL_SERVER_ADDRESS=/tmp/eira-model.sock uvicorn huggingfastapi.main:app --workers 4
+
+The server loads TextGenerationModel once, runs the generation scheduler and
+the GoTo evaluator, and answers calls over a `multiprocessing.connection`
+Unix socket authenticated with MODEL_SERVER_AUTHKEY. API workers started with
+MODEL_SERVER_ADDRESS use the Remote* proxies below instead of loading the
+model, so HTTP parsing and JSON serialization scale across processes while
+the weights stay in one place.
+"""
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Callable, Dict, Iterator, Optional
+from loguru import logger
+import os
+import queue
+import threading
+
+from huggingfastapi.models.payload import TextGenerationPayload
+from huggingfastapi.core.config import (
+    GEN_SCHEDULER_ENABLED,
+    MODEL_SERVER_ADDRESS,
+    MODEL_SERVER_AUTHKEY,
+    MODEL_SERVER_POOL_SIZE,
+)
+
+
+class ModelServer:
+    """Serves one TextGenerationModel, its scheduler and the GoTo evaluator to many API workers
+
+    Every client connection gets its own thread; concurrent generation
+    requests from all workers meet in the scheduler's shared decode batch.
+    Replies are `("ok", value)`, `("error", exception)`, or for streaming
+    calls a run of `("item", value)` ended by `("end", None)`.
+    """
+
+    def __init__(self, address: str = MODEL_SERVER_ADDRESS, authkey: str = MODEL_SERVER_AUTHKEY):
+        if not address:
+            raise ValueError("MODEL_SERVER_ADDRESS must be set to run the model server")
+        self.address = address
+        self.authkey = authkey.encode("utf-8")
+        self._listener: Optional[Listener] = None
+        self._running = False
+
+        from huggingfastapi.services.nlp import GoToPromptEvaluator
+        from huggingfastapi.services.scheduler import GenerationScheduler
+        from huggingfastapi.services.text_generation import TextGenerationModel
+
+        self.text_gen_model = TextGenerationModel()
+        self.scheduler = None
+        if GEN_SCHEDULER_ENABLED:
+            self.scheduler = GenerationScheduler(self.text_gen_model)
+            self.scheduler.start()
+        self.evaluator = GoToPromptEvaluator(self.text_gen_model, scheduler=self.scheduler)
+
+        self._calls: Dict[str, Callable[..., Any]] = {
+            "describe": self.describe,
+            "generate": self.text_gen_model.generate,
+            "generate_batch": self.text_gen_model.generate_batch,
+            "score": self.text_gen_model.score,
+            "delete_session": self.text_gen_model.delete_session,
+            "session_stats": self.text_gen_model.session_stats,
+            "submit": lambda payload, prefix_key=None: self.scheduler.submit(payload, prefix_key=prefix_key).result(),
+            "scheduler_stats": lambda: self.scheduler.stats(),
+            "evaluate_prompt": self.evaluator.evaluate_prompt,
+        }
+        self._streams: Dict[str, Callable[..., Iterator[Any]]] = {
+            "stream": self.text_gen_model.stream,
+            "evaluate_prompt_stream": self.evaluator.evaluate_prompt_stream,
+        }
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(address={self.address})"
+
+    def describe(self) -> Dict[str, Any]:
+        """Static facts the API workers need without a round trip per request"""
+        return {
+            "model_id": self.text_gen_model.model_id,
+            "rubric_version": self.evaluator.rubric_version,
+            "metric_names": list(self.evaluator.metric_functions),
+            "qualitative_names": list(self.evaluator.qualitative_functions),
+            "scheduler": self.scheduler is not None,
+            "draft_model_id": self.text_gen_model.draft_model_id,
+        }
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.address):
+            # A socket left behind by a previous run would make bind fail
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        self._running = True
+        logger.info(f"Model server listening: {self}")
+        try:
+            while self._running:
+                try:
+                    connection = self._listener.accept()
+                except Exception as e:
+                    if self._running:
+                        logger.warning(f"Rejected model server connection: {e}")
+                    continue
+                threading.Thread(target=self._serve, args=(connection,), name="model-server-conn", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._running = False
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.evaluator.close()
+
+    def _serve(self, connection: Connection) -> None:
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method in self._streams:
+                        for item in self._streams[method](*args, **kwargs):
+                            connection.send(("item", item))
+                        connection.send(("end", None))
+                    elif method in self._calls:
+                        connection.send(("ok", self._calls[method](*args, **kwargs)))
+                    else:
+                        connection.send(("error", ValueError(f"Unknown model server call: {method}")))
+                except (EOFError, OSError, BrokenPipeError):
+                    return
+                except Exception as e:
+                    logger.error(f"Model server call {method} failed: {str(e)}")
+                    connection.send(("error", e))
+
+
+class ModelServerClient:
+    """Thread-safe pool of connections to a ModelServer"""
+
+    def __init__(
+        self,
+        address: str = MODEL_SERVER_ADDRESS,
+        authkey: str = MODEL_SERVER_AUTHKEY,
+        pool_size: int = MODEL_SERVER_POOL_SIZE,
+    ):
+        self.address = address
+        self.authkey = authkey.encode("utf-8")
+        self.pool_size = pool_size
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+        # Bounds open connections; a caller waits when all of them are busy
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(address={self.address}, pool_size={self.pool_size})"
+
+    def _acquire(self) -> Connection:
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except Exception:
+                self._slots.release()
+                raise
+
+    def _release(self, connection: Connection, reusable: bool) -> None:
+        if reusable:
+            self._idle.put(connection)
+        else:
+            connection.close()
+        self._slots.release()
+
+    def call(self, method: str, *args, **kwargs) -> Any:
+        connection = self._acquire()
+        reusable = False
+        try:
+            connection.send((method, args, kwargs))
+            status, value = connection.recv()
+            reusable = True
+        finally:
+            self._release(connection, reusable)
+        if status == "error":
+            raise value
+        return value
+
+    def stream(self, method: str, *args, **kwargs) -> Iterator[Any]:
+        connection = self._acquire()
+        finished = False
+        try:
+            connection.send((method, args, kwargs))
+            while True:
+                status, value = connection.recv()
+                if status == "item":
+                    yield value
+                    continue
+                finished = True
+                if status == "error":
+                    raise value
+                return
+        finally:
+            # A stream abandoned half way leaves unread replies, so its connection is dropped
+            self._release(connection, finished)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class RemoteTextGenerationModel:
+    """TextGenerationModel interface backed by a ModelServer"""
+
+    def __init__(self, client: ModelServerClient, description: Dict[str, Any]):
+        self.client = client
+        self.model_id = description["model_id"]
+        self.draft_model_id = description["draft_model_id"]
+
+    def generate(self, payload: TextGenerationPayload, prefix_key: Optional[str] = None):
+        return self.client.call("generate", payload, prefix_key=prefix_key)
+
+    def generate_batch(self, payloads, prefix_keys=None):
+        return self.client.call("generate_batch", payloads, prefix_keys=prefix_keys)
+
+    def score(self, payload: TextGenerationPayload, prefix_key: Optional[str] = None, low: int = 0, high: int = 100):
+        return self.client.call("score", payload, prefix_key=prefix_key, low=low, high=high)
+
+    def stream(
+        self, payload: TextGenerationPayload, cancel: Optional[threading.Event] = None
+    ) -> Iterator[Dict[str, Any]]:
+        # An event cannot cross the process boundary: closing this stream drops its
+        # connection instead, and the server cancels generation at its next token
+        return self.client.stream("stream", payload)
+
+    def delete_session(self, session_id: str) -> bool:
+        return self.client.call("delete_session", session_id)
+
+    def session_stats(self) -> Dict[str, Any]:
+        return self.client.call("session_stats")
+
+
+class RemoteGenerationScheduler:
+    """GenerationScheduler interface backed by a ModelServer"""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+        self._executor = ThreadPoolExecutor(max_workers=client.pool_size, thread_name_prefix="model-server-submit")
+
+    def submit(self, payload: TextGenerationPayload, prefix_key: Optional[str] = None) -> Future:
+        return self._executor.submit(self.client.call, "submit", payload, prefix_key=prefix_key)
+
+    def stats(self) -> Dict[str, int]:
+        return self.client.call("scheduler_stats")
+
+    def stop(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class RemoteGoToPromptEvaluator:
+    """GoToPromptEvaluator interface backed by a ModelServer"""
+
+    def __init__(self, client: ModelServerClient, description: Dict[str, Any]):
+        self.client = client
+        self.rubric_version = description["rubric_version"]
+        # Only the names are used outside the evaluator
+        self.metric_functions = dict.fromkeys(description["metric_names"])
+        self.qualitative_functions = dict.fromkeys(description["qualitative_names"])
+
+    def evaluate_prompt(self, prompt: str, on_complete: Optional[Callable[[str, Any], None]] = None):
+        if on_complete is None:
+            return self.client.call("evaluate_prompt", prompt)
+
+        result = None
+        for event in self.evaluate_prompt_stream(prompt):
+            if event["event"] == "done":
+                result = event["result"]
+            else:
+                on_complete(event["name"], event["value"])
+        return result
+
+    def evaluate_prompt_stream(
+        self,
+        prompt: str,
+        on_done: Optional[Callable[[Optional[Any], Optional[Exception]], None]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Same contract as GoToPromptEvaluator.evaluate_prompt_stream
+
+        With `on_done`, the server's stream is drained on a thread of its own,
+        so the evaluation is still settled when the reader stops early.
+        """
+        if on_done is None:
+            return self.client.stream("evaluate_prompt_stream", prompt)
+        events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+
+        def _run() -> None:
+            done, error = None, None
+            try:
+                for event in self.client.stream("evaluate_prompt_stream", prompt):
+                    if event["event"] == "done":
+                        done = event
+                    else:
+                        events.put(event)
+            except Exception as e:
+                error = e
+            try:
+                on_done(done["result"] if done is not None else None, error)
+            except Exception as e:
+                logger.error(f"Streamed evaluation callback failed: {e}")
+            events.put(done if error is None else {"event": "error", "error": error})
+            events.put(None)
+
+        threading.Thread(target=_run, name="goto-eval-remote-stream", daemon=True).start()
+        return self._drain(events)
+
+    @staticmethod
+    def _drain(events: "queue.Queue[Optional[Dict[str, Any]]]") -> Iterator[Dict[str, Any]]:
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            if event["event"] == "error":
+                raise event["error"]
+            yield event
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def main() -> None:
+    server = ModelServer()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Model server stopped.")
+
+
+if __name__ == "__main__":
+    main()
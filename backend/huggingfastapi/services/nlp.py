@@ -1,9 +1,17 @@
-from typing import Dict, List, Any, TYPE_CHECKING, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Any, TYPE_CHECKING, Optional, Tuple
 from loguru import logger
 import torch
 import torch.nn as nn
+import asyncio
+import itertools
 import os
+import queue
+import random
+import threading
+import time
 import json
+import weakref
 from datetime import datetime
 import re
 
@@ -12,19 +20,37 @@ from transformers import AutoModelForQuestionAnswering, AutoConfig, AutoModel, P
 from transformers import pipeline
 
 from huggingfastapi.models.payload import AIDetectionPayload, TextGenerationPayload
-from huggingfastapi.models.prediction import AIDetectionResult, EvaluationResult
+from huggingfastapi.models.prediction import AIDetectionResult, AIDetectionLongResult, AIDetectionSpan, EvaluationResult
+from huggingfastapi.services import tokenization
+from huggingfastapi.services.task_graph import TaskGraph
 from huggingfastapi.services.utils import ModelLoader
 from huggingfastapi.core.messages import NO_VALID_PAYLOAD
 from huggingfastapi.core.config import (
     DEFAULT_MODEL_PATH,
     AI_DETECTION_MODEL,
-    GEMINI_API_KEY
+    AI_DETECTION_BATCH_SIZE,
+    AI_DETECTION_MAX_BATCH_TOKENS,
+    AI_DETECTION_WINDOW_OVERLAP,
+    AI_DETECTION_BACKEND,
+    AI_DETECTION_ONNX_THREADS,
+    AI_DETECTION_ONNX_TOLERANCE,
+    GEMINI_API_KEY,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_MAX_RETRIES,
+    GEMINI_RETRY_BASE_DELAY,
+    GOTO_EVAL_BATCHED,
+    GOTO_EVAL_PARALLEL,
+    GOTO_PREFIX_CACHE,
+    GOTO_SCORE_MODE
 )
 
 # Additional imports for evaluators
 import google.generativeai as genai
 
+from huggingfastapi.services.text_generation import PREFIX_MARKER
+
 if TYPE_CHECKING:
+    from huggingfastapi.services.scheduler import GenerationScheduler
     from huggingfastapi.services.text_generation import TextGenerationModel
 #Text
 
@@ -70,11 +96,24 @@ class AIDetectionModel(object):
         self.model_name = AI_DETECTION_MODEL
         self.max_len = 768
         self.threshold = 0.5
+        self.batch_size = AI_DETECTION_BATCH_SIZE
+        # Upper bound on padded tokens (rows x longest row) per forward pass
+        self.max_batch_tokens = AI_DETECTION_MAX_BATCH_TOKENS
+        # Tokens shared by consecutive windows in long-document mode
+        self.window_overlap = AI_DETECTION_WINDOW_OVERLAP
+        # Batches per tokenization chunk: larger chunks bucket lengths better, smaller ones overlap sooner
+        self.tokenize_chunk_batches = 4
+        # "torch" or "onnx" (int8 ONNX Runtime, CPU only)
+        self.backend = AI_DETECTION_BACKEND
         self._load_local_model()
 
     def _load_local_model(self):
         logger.info(f"Loading AI detection model: {self.model_name}")
-        
+        self.session = None
+
+        if self.backend == "onnx" and self._load_onnx_session():
+            return
+
         # Use ModelLoader to handle local storage and loading
         tokenizer, model = ModelLoader(
             model_name=self.model_name,
@@ -91,6 +130,60 @@ class AIDetectionModel(object):
         
         logger.info(f"AI detection model loaded on device: {self.device}")
 
+        if self.backend == "onnx":
+            self._build_onnx_session()
+
+    def _load_onnx_session(self) -> bool:
+        """Use an already exported and validated int8 graph, skipping the PyTorch model entirely"""
+        try:
+            from huggingfastapi.services import onnx_detector
+        except ImportError as e:
+            logger.warning(f"ONNX backend unavailable ({str(e)}), using PyTorch")
+            self.backend = "torch"
+            return False
+
+        save_path = ModelLoader.artifact_path(self.model_name, self.path)
+        directory = onnx_detector.onnx_directory(save_path)
+        report = onnx_detector.read_validation(directory)
+        if not report or not (directory / onnx_detector.INT8_FILE).exists():
+            return False
+        if not report["passed"]:
+            logger.warning(f"ONNX detector failed validation earlier ({report}), using PyTorch")
+            self.backend = "torch"
+            return False
+
+        self.tokenizer = AutoTokenizer.from_pretrained(f"{save_path}")
+        self.model = None
+        self.device = torch.device("cpu")
+        self.session = onnx_detector.OnnxDetectorSession(directory / onnx_detector.INT8_FILE, AI_DETECTION_ONNX_THREADS)
+        logger.info(f"AI detection model loaded with ONNX Runtime: {self.session}")
+        return True
+
+    def _build_onnx_session(self) -> None:
+        """Export, quantize and validate the int8 graph; keep PyTorch if it does not match"""
+        from huggingfastapi.services import onnx_detector
+
+        directory = onnx_detector.onnx_directory(ModelLoader.artifact_path(self.model_name, self.path))
+        try:
+            int8_path = onnx_detector.export_int8(self.model, self.tokenizer, directory)
+            session = onnx_detector.OnnxDetectorSession(int8_path, AI_DETECTION_ONNX_THREADS)
+            report = onnx_detector.validate(self.model, session, self.tokenizer, self.max_len, AI_DETECTION_ONNX_TOLERANCE)
+        except Exception as e:
+            logger.error(f"ONNX export of the AI detector failed, using PyTorch: {str(e)}")
+            self.backend = "torch"
+            return
+
+        onnx_detector.write_validation(directory, report)
+        if not report["passed"]:
+            logger.error(f"ONNX detector does not match PyTorch ({report}), using PyTorch")
+            self.backend = "torch"
+            return
+
+        logger.info(f"ONNX detector validated against PyTorch: {report}")
+        self.session = session
+        self.model = None
+        self.device = torch.device("cpu")
+
     def _pre_process(self, payload: AIDetectionPayload) -> str:
         logger.debug("Pre-processing AI detection payload.")
         return payload.text
@@ -110,14 +203,29 @@ class AIDetectionModel(object):
 
     def _predict(self, text: str) -> tuple:
         logger.debug("Predicting AI detection.")
-        
-        encoded = self.tokenizer(
-            text,
-            padding='max_length',
-            truncation=True,
-            max_length=self.max_len,
-            return_tensors='pt'
-        )
+        return self._predict_batch([text])[0]
+
+    def _length_buckets(self, lengths: List[int]) -> List[List[int]]:
+        """Group indices of similar token length so each batch pads as little as possible"""
+        buckets: List[List[int]] = []
+        current: List[int] = []
+        for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            # Sorted ascending, so the newest index is always the longest in its bucket
+            if current and (len(current) >= self.batch_size or (len(current) + 1) * lengths[index] > self.max_batch_tokens):
+                buckets.append(current)
+                current = []
+            current.append(index)
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def _forward(self, encoded) -> List[float]:
+        """Run one padded batch through the model and return AI probabilities"""
+        if self.session is not None:
+            from huggingfastapi.services.onnx_detector import probabilities
+
+            return probabilities(self.session, encoded)
+
         input_ids = encoded['input_ids'].to(self.device)
         attention_mask = encoded['attention_mask'].to(self.device)
 
@@ -125,10 +233,128 @@ class AIDetectionModel(object):
         with torch.no_grad():
             outputs = self.model(input_ids=input_ids, attention_mask=attention_mask)
             logits = outputs["logits"]
-            probability = torch.sigmoid(logits).item()
+            return torch.sigmoid(logits).view(-1).tolist()
+
+    def _predict_batch(self, texts: List[str]) -> List[tuple]:
+        """Predict many texts with dynamic padding and length-bucketed batches
 
-        label = 1 if probability >= self.threshold else 0
-        return probability, label
+        Texts are tokenized in chunks on the tokenizer pool, so the next chunk
+        is encoded while the model runs the current one.
+        """
+        logger.debug(f"Predicting AI detection for {len(texts)} texts.")
+
+        chunk_size = self.batch_size * self.tokenize_chunk_batches
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        probabilities: List[float] = []
+        for sequences in tokenization.prefetched(chunks, self._tokenize):
+            probabilities.extend(self._predict_ids(sequences))
+
+        return [(probability, self._label(probability)) for probability in probabilities]
+
+    def _tokenize(self, texts: List[str]) -> List[List[int]]:
+        # Tokenize without padding; each bucket is padded only to its own longest text
+        return self.tokenizer(texts, truncation=True, max_length=self.max_len)['input_ids']
+
+    def _pad(self, sequences: List[List[int]]):
+        return self.tokenizer.pad(
+            {
+                'input_ids': sequences,
+                'attention_mask': [[1] * len(input_ids) for input_ids in sequences],
+            },
+            padding='longest',
+            return_tensors='pt'
+        )
+
+    def _predict_ids(self, sequences: List[List[int]]) -> List[float]:
+        """Run unpadded token id sequences through the model in length-bucketed batches"""
+        probabilities: List[float] = [0.0] * len(sequences)
+        buckets = self._length_buckets([len(input_ids) for input_ids in sequences])
+        # The next bucket is padded on the tokenizer pool while the model runs this one
+        padded = tokenization.prefetched(buckets, lambda bucket: self._pad([sequences[i] for i in bucket]))
+        for bucket, encoded in zip(buckets, padded):
+            for index, probability in zip(bucket, self._forward(encoded)):
+                probabilities[index] = probability
+        return probabilities
+
+    def _label(self, probability: float) -> int:
+        return 1 if probability >= self.threshold else 0
+
+    def _windows(self, token_count: int) -> Iterator[Tuple[int, int]]:
+        """Yield (start, end) token ranges of overlapping windows covering the whole document"""
+        body = self.max_len - self.tokenizer.num_special_tokens_to_add()
+        stride = max(1, body - self.window_overlap)
+        start = 0
+        while True:
+            end = min(start + body, token_count)
+            # The last window is shifted back so it is as full as every other window
+            yield max(0, end - body), end
+            if end >= token_count:
+                return
+            start += stride
+
+    def predict_long(self, payload: AIDetectionPayload) -> AIDetectionLongResult:
+        """Score a document of any length with overlapping windows instead of truncating it
+
+        Windows are generated lazily and run `windows_per_pass` at a time, so
+        peak memory depends on the batch settings, not the document length.
+        The aggregate probability averages, per token, every window that
+        covers it, so overlaps are not counted twice.
+        """
+        if payload is None:
+            raise ValueError(NO_VALID_PAYLOAD.format(payload))
+
+        text = self._pre_process(payload)
+        encoding = tokenization.submit(
+            self.tokenizer, text, add_special_tokens=False, return_offsets_mapping=True, verbose=False
+        ).result()
+        input_ids, offsets = encoding['input_ids'], encoding['offset_mapping']
+        token_count = len(input_ids)
+
+        windows_per_pass = max(1, min(self.batch_size, self.max_batch_tokens // self.max_len))
+        windows = self._windows(token_count)
+        spans: List[AIDetectionSpan] = []
+        while True:
+            chunk = list(itertools.islice(windows, windows_per_pass))
+            if not chunk:
+                break
+            sequences = [
+                self.tokenizer.build_inputs_with_special_tokens(input_ids[start:end]) for start, end in chunk
+            ]
+            for (start, end), probability in zip(chunk, self._predict_ids(sequences)):
+                spans.append(AIDetectionSpan(
+                    start_token=start,
+                    end_token=end,
+                    start_char=offsets[start][0] if end > start else 0,
+                    end_char=offsets[end - 1][1] if end > start else 0,
+                    probability=probability,
+                    label=self._label(probability),
+                ))
+
+        if token_count:
+            coverage = [0] * token_count
+            for span in spans:
+                for token in range(span.start_token, span.end_token):
+                    coverage[token] += 1
+            probability = sum(
+                span.probability * sum(1 / coverage[token] for token in range(span.start_token, span.end_token))
+                for span in spans
+            ) / token_count
+        else:
+            probability = spans[0].probability
+
+        label = self._label(probability)
+        logger.info(
+            f"AI Detection (long) - Probability: {probability:.4f}, Label: {label}, "
+            f"{len(spans)} windows over {token_count} tokens"
+        )
+        result = self._post_process(probability, label)
+        return AIDetectionLongResult(
+            **result.model_dump(),
+            max_probability=max(span.probability for span in spans),
+            token_count=token_count,
+            window_count=len(spans),
+            spans=spans,
+        )
 
     def predict(self, payload: AIDetectionPayload):
         if payload is None:
@@ -140,14 +366,40 @@ class AIDetectionModel(object):
         post_processed_result = self._post_process(probability, label)
 
         return post_processed_result
+
+    def predict_batch(self, payloads: List[AIDetectionPayload]) -> List[AIDetectionResult]:
+        if not payloads or any(payload is None for payload in payloads):
+            raise ValueError(NO_VALID_PAYLOAD.format(payloads))
+
+        texts = [self._pre_process(payload) for payload in payloads]
+        predictions = self._predict_batch(texts)
+        logger.info(f"AI Detection - Batch of {len(predictions)} texts predicted.")
+
+        return [self._post_process(probability, label) for probability, label in predictions]
     
 
 class GeminiPromptEvaluator:
     """Advanced prompt evaluator using Gemini 2.5 Pro with few-shot learning"""
+
+    # Bump whenever the evaluation context, few-shot examples or weights change
+    RUBRIC_VERSION = "1"
+    # Upper bound for a single backoff sleep, in seconds
+    MAX_RETRY_DELAY = 30.0
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: int = GEMINI_MAX_CONCURRENCY):
         """Initialize the evaluator with Gemini API"""
         self.api_key = api_key or GEMINI_API_KEY
+        self.model_name = "gemini-2.5-pro"
+        self.rubric_version = self.RUBRIC_VERSION
+        self.max_retries = GEMINI_MAX_RETRIES
+        self.retry_base_delay = GEMINI_RETRY_BASE_DELAY
+        self.max_concurrency = max_concurrency
+        # Bounds async calls in flight; the GenerativeModel keeps one async client for all of them.
+        # An asyncio.Semaphore binds to the loop that first waits on it, so there is one per event loop.
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.in_flight = 0
         self.model = None
         self.setup_gemini()
         
@@ -193,7 +445,7 @@ class GeminiPromptEvaluator:
             ]
             
             self.model = genai.GenerativeModel(
-                model_name="gemini-2.5-pro",
+                model_name=self.model_name,
                 generation_config=generation_config,
                 safety_settings=safety_settings
             )
@@ -323,6 +575,30 @@ Return only a valid JSON object with exactly this structure (no additional text)
 
     def evaluate_prompt(self, prompt: str) -> EvaluationResult:
         """Evaluate a prompt with advanced prompting techniques synchronously"""
+        prompt = self._validate_prompt(prompt)
+
+        try:
+            # Generate evaluation using Gemini
+            response = self._generate_with_retry(self._build_evaluation_prompt(prompt))
+            return self._build_result(prompt, response)
+
+        except Exception as e:
+            logger.error(f"Evaluation failed: {e}")
+            raise Exception(f"Evaluation failed: {str(e)}")
+
+    async def evaluate_prompt_async(self, prompt: str) -> EvaluationResult:
+        """Evaluate a prompt without holding a worker thread while Gemini responds"""
+        prompt = self._validate_prompt(prompt)
+
+        try:
+            response = await self._generate_with_retry_async(self._build_evaluation_prompt(prompt))
+            return self._build_result(prompt, response)
+
+        except Exception as e:
+            logger.error(f"Evaluation failed: {e}")
+            raise Exception(f"Evaluation failed: {str(e)}")
+
+    def _validate_prompt(self, prompt: str) -> str:
         if not prompt or not prompt.strip():
             raise ValueError("Prompt cannot be empty")
 
@@ -331,10 +607,11 @@ Return only a valid JSON object with exactly this structure (no additional text)
 
         prompt = prompt.strip()
         logger.info(f"Evaluating prompt: {prompt[:50]}...")
+        return prompt
 
-        try:
-            # Construct the evaluation prompt with context and few-shot examples
-            evaluation_prompt = f"""
+    def _build_evaluation_prompt(self, prompt: str) -> str:
+        """Construct the evaluation prompt with context and few-shot examples"""
+        return f"""
 {self.create_evaluation_context()}
 
 {self.create_few_shot_examples()}
@@ -344,50 +621,51 @@ INPUT PROMPT: "{prompt}"
 EVALUATION:
 """
 
-            # Generate evaluation using Gemini
-            response = self._generate_with_retry(evaluation_prompt)
-            
-            # Extract text from response properly
-            response_text = self._extract_response_text(response)
-            logger.info(f"Received evaluation response from Gemini: {response_text[:200]}...")
-            
-            # Parse the JSON response
-            evaluation_data = self._parse_evaluation_response(response_text)
-            
-            # Calculate overall score using research-backed weights
-            overall_score = self._calculate_overall_score(evaluation_data)
-            
-            # Create evaluation result
-            result = EvaluationResult(
-                overall_score=round(overall_score, 1),
-                clarity=evaluation_data.get('clarity', 0),
-                specificity=evaluation_data.get('specificity', 0),
-                ethics=evaluation_data.get('ethics', 0),
-                effectiveness=evaluation_data.get('effectiveness', 0),
-                bias_risk=evaluation_data.get('bias_risk', 0),
-                suggestions=evaluation_data.get('suggestions', []),
-                strengths=evaluation_data.get('strengths', []),
-                weaknesses=evaluation_data.get('weaknesses', []),
-                improved_prompt=evaluation_data.get('improved_prompt', ''),
-                evaluation_details={
-                    'word_count': len(prompt.split()),
-                    'character_count': len(prompt),
-                    'model_used': 'gemini-2.5-pro',
-                    'evaluation_method': 'few_shot_learning'
-                },
-                sources_used=self.sources,
-                timestamp=datetime.now().isoformat()
-            )
-            
-            logger.info(f"Evaluation completed. Overall score: {result.overall_score}")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Evaluation failed: {e}")
-            raise Exception(f"Evaluation failed: {str(e)}")
+    def _build_result(self, prompt: str, response) -> EvaluationResult:
+        # Extract text from response properly
+        response_text = self._extract_response_text(response)
+        logger.info(f"Received evaluation response from Gemini: {response_text[:200]}...")
+        
+        # Parse the JSON response
+        evaluation_data = self._parse_evaluation_response(response_text)
+        degraded = bool(evaluation_data.pop('_partial', False))
+        
+        # Calculate overall score using research-backed weights
+        overall_score = self._calculate_overall_score(evaluation_data)
+        
+        # Create evaluation result
+        result = EvaluationResult(
+            overall_score=round(overall_score, 1),
+            clarity=evaluation_data.get('clarity', 0),
+            specificity=evaluation_data.get('specificity', 0),
+            ethics=evaluation_data.get('ethics', 0),
+            effectiveness=evaluation_data.get('effectiveness', 0),
+            bias_risk=evaluation_data.get('bias_risk', 0),
+            suggestions=evaluation_data.get('suggestions', []),
+            strengths=evaluation_data.get('strengths', []),
+            weaknesses=evaluation_data.get('weaknesses', []),
+            improved_prompt=evaluation_data.get('improved_prompt', ''),
+            evaluation_details={
+                'word_count': len(prompt.split()),
+                'character_count': len(prompt),
+                'model_used': self.model_name,
+                'evaluation_method': 'few_shot_learning'
+            },
+            sources_used=self.sources,
+            timestamp=datetime.now().isoformat(),
+            degraded=degraded
+        )
+        
+        logger.info(f"Evaluation completed. Overall score: {result.overall_score}")
+        return result
 
-    def _generate_with_retry(self, prompt: str, max_retries: int = 3):
+    def _retry_delay(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so retries from many requests do not arrive in lockstep"""
+        return random.uniform(0, min(self.MAX_RETRY_DELAY, self.retry_base_delay * 2 ** attempt))
+
+    def _generate_with_retry(self, prompt: str, max_retries: Optional[int] = None):
         """Generate response with retry logic"""
+        max_retries = max_retries or self.max_retries
         for attempt in range(max_retries):
             try:
                 response = self.model.generate_content(prompt)
@@ -396,8 +674,34 @@ EVALUATION:
                 if attempt == max_retries - 1:
                     raise e
                 logger.warning(f"Attempt {attempt + 1} failed, retrying: {e}")
-                import time
-                time.sleep(1)
+                time.sleep(self._retry_delay(attempt))
+
+    def _loop_semaphore(self) -> asyncio.Semaphore:
+        """Concurrency semaphore of the running event loop"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores.setdefault(loop, asyncio.Semaphore(self.max_concurrency))
+        return semaphore
+
+    async def _generate_with_retry_async(self, prompt: str, max_retries: Optional[int] = None):
+        """Async counterpart of _generate_with_retry, bounded by the concurrency semaphore"""
+        max_retries = max_retries or self.max_retries
+        semaphore = self._loop_semaphore()
+        for attempt in range(max_retries):
+            try:
+                async with semaphore:
+                    self.in_flight += 1
+                    try:
+                        return await self.model.generate_content_async(prompt)
+                    finally:
+                        self.in_flight -= 1
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise e
+                logger.warning(f"Attempt {attempt + 1} failed, retrying: {e}")
+                # Sleep outside the semaphore so waiting retries do not block other requests
+                await asyncio.sleep(self._retry_delay(attempt))
 
     def _extract_response_text(self, response) -> str:
         """Extract text from Gemini response safely"""
@@ -527,6 +831,8 @@ EVALUATION:
                 logger.warning(f"Missing field {key}, using default value")
 
         logger.info(f"Berhasil mengekstrak {len(extracted_data)} field secara parsial.")
+        # Hasil dari respons yang terpotong ditandai agar tidak di-cache
+        extracted_data['_partial'] = True
         return extracted_data
 
     def _calculate_overall_score(self, evaluation_data: Dict) -> float:
@@ -547,11 +853,54 @@ EVALUATION:
 
 class GoToPromptEvaluator:
     """Evaluator for prompts using GoToCompany/gemma2-9b-cpt-sahabatai-v1-instruct model"""
+
+    # Bump whenever a rubric template, weight or parsing rule changes
+    RUBRIC_VERSION = "1"
+    SCORE_MODES = ("logits", "generate")
+    # In parallel "logits" mode the five scores are one sub-task read with score_batch
+    LOGIT_SCORES_TASK = "scores"
     
-    
-    def __init__(self, text_gen_model: 'TextGenerationModel'):
+    def __init__(
+        self,
+        text_gen_model: 'TextGenerationModel',
+        batched: Optional[bool] = None,
+        prefix_cache: Optional[bool] = None,
+        score_mode: Optional[str] = None,
+        parallel: Optional[bool] = None,
+        scheduler: Optional['GenerationScheduler'] = None,
+    ):
         """Initialize the evaluator with text generation model"""
         self.text_gen_model = text_gen_model
+        # Parallel mode submits all nine sub-tasks at once instead of stage by stage
+        self.parallel = GOTO_EVAL_PARALLEL if parallel is None else parallel
+        # Generation sub-tasks go to the continuous-batching scheduler when one is running
+        self.scheduler = scheduler
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Batched mode sends each stage's prompts to the model as one padded batch
+        self.batched = GOTO_EVAL_BATCHED if batched is None else batched
+        # Prefix cache reuses the KV values of each template's static preamble
+        self.prefix_cache = GOTO_PREFIX_CACHE if prefix_cache is None else prefix_cache
+        # "logits" reads scores from one forward pass, "generate" samples and parses text
+        self.score_mode = score_mode or GOTO_SCORE_MODE
+        if self.score_mode not in self.SCORE_MODES:
+            raise ValueError(f"GOTO_SCORE_MODE tidak dikenal: '{self.score_mode}' (pilihan: {', '.join(self.SCORE_MODES)})")
+        # Score mode changes the numbers produced, so it is part of the rubric identity
+        self.rubric_version = f"{self.RUBRIC_VERSION}-{self.score_mode}"
+
+        # Templates per metric; qualitative entries also carry (is_list, max_new_tokens)
+        self.metric_functions = {
+            "clarity": self.create_clarity_prompt, "specificity": self.create_specificity_prompt,
+            "ethics": self.create_ethics_prompt, "effectiveness": self.create_effectiveness_prompt,
+            "bias_risk": self.create_bias_risk_prompt,
+        }
+        self.qualitative_functions = {
+            "strengths": (self.create_strengths_prompt, True, 64),
+            "weaknesses": (self.create_weaknesses_prompt, True, 64),
+            "suggestions": (self.create_suggestions_prompt, True, 96),
+            "improved_prompt": (self.create_improved_prompt, False, 256),
+        }
+        self.score_system_message = "Anda adalah evaluator prompt AI yang ahli dan objektif."
+        self.qualitative_system_message = "Anda adalah seorang ahli prompt engineering yang analitis dan kreatif."
         
         # Research-backed evaluation criteria weights (same as Gemini)
         self.criteria_weights = {
@@ -569,6 +918,44 @@ class GoToPromptEvaluator:
             "Microsoft Responsible AI Guidelines",
             "DAIR.AI Prompting Guide"
         ]
+
+        if self.prefix_cache and self.text_gen_model is not None:
+            self._register_prefixes()
+        if self.parallel:
+            self._executor = ThreadPoolExecutor(
+                max_workers=len(self.metric_functions) + len(self.qualitative_functions),
+                thread_name_prefix="goto-eval",
+            )
+
+    def close(self) -> None:
+        """Menghentikan thread pool sub-tugas."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _prefix_key(self, metric_name: str) -> str:
+        return f"goto:{metric_name}"
+
+    def _build_payload(self, metric_name: str, prompt: str) -> TextGenerationPayload:
+        """Membuat payload generasi untuk satu metrik kuantitatif atau kualitatif."""
+        if metric_name in self.metric_functions:
+            return TextGenerationPayload(text=self.metric_functions[metric_name](prompt), max_new_tokens=8, temperature=0.1, system_message=self.score_system_message)
+        create_prompt_func, _, max_tokens = self.qualitative_functions[metric_name]
+        return TextGenerationPayload(text=create_prompt_func(prompt), max_new_tokens=max_tokens, temperature=0.3, system_message=self.qualitative_system_message)
+
+    def _register_prefixes(self) -> None:
+        """Menghitung KV cache bagian statis (preamble dan contoh) setiap template sekali saat startup."""
+        for metric_name in [*self.metric_functions, *self.qualitative_functions]:
+            template_payload = self._build_payload(metric_name, PREFIX_MARKER)
+            static_prefix = template_payload.text.split(PREFIX_MARKER)[0]
+            try:
+                self.text_gen_model.register_prefix(
+                    self._prefix_key(metric_name),
+                    template_payload.model_copy(update={"text": static_prefix}),
+                )
+            except Exception as e:
+                logger.warning(f"Gagal menyiapkan prefix cache untuk '{metric_name}': {e}")
+        logger.info("Prefix cache untuk template evaluator GoTo siap.")
     
     def create_clarity_prompt(self, user_prompt: str) -> str:
         """Menciptakan prompt untuk mengevaluasi CLARITY (Kejelasan) saja."""
@@ -823,6 +1210,12 @@ Tulis ulang PROMPT INPUT di bawah ini menjadi versi yang jauh lebih jelas, spesi
 PROMPT INPUT: "{user_prompt}"
 EVALUASI:"""
 
+    def _default_value(self, metric_name: str) -> Any:
+        """Nilai pengganti untuk metrik yang sub-tugasnya gagal."""
+        if metric_name in self.metric_functions:
+            return 0
+        return [] if self.qualitative_functions[metric_name][1] else ""
+
     def _parse_qualitative_response(self, response_text: str, is_list: bool = True) -> Any:
         """Helper untuk mem-parsing respons kualitatif."""
         if not is_list:
@@ -838,60 +1231,249 @@ EVALUASI:"""
             logger.warning(f"Gagal mem-parsing JSON dari respons: '{response_text}'. Mengembalikan list kosong.")
             return []
 
-    def evaluate_prompt(self, prompt: str) -> EvaluationResult:
-        """Mengevaluasi sebuah prompt secara kuantitatif dan kualitatif lalu mengembalikan EvaluationResult."""
-        if not prompt or not prompt.strip():
-            raise ValueError("Prompt tidak boleh kosong")
-        if not self.text_gen_model:
-            raise Exception("Model generasi teks belum diinisialisasi")
+    def _generate_stage(
+        self, payloads: Dict[str, TextGenerationPayload], stage: str
+    ) -> Tuple[Dict[str, Optional[str]], bool]:
+        """Menjalankan semua prompt dalam satu tahap dan mengembalikan (teks hasil per metrik, batched).
 
-        prompt = prompt.strip()
-        logger.info(f"Mengevaluasi prompt: {prompt[:80]}...")
+        Dalam mode batched, semua payload dikirim sebagai satu batch ke model.
+        Jika batch gagal, atau mode batched dimatikan, payload dijalankan satu per satu.
+        `batched` menyatakan apakah tahap ini benar-benar berjalan sebagai satu batch.
+        Dengan prefix cache, hanya bagian prompt pengguna yang di-prefill.
+        Metrik yang gagal bernilai None.
+        """
+        prefix_keys = {
+            metric_name: self._prefix_key(metric_name) if self.prefix_cache else None for metric_name in payloads
+        }
+        if self.batched:
+            try:
+                responses = self.text_gen_model.generate_batch(list(payloads.values()), prefix_keys=list(prefix_keys.values()))
+                return {
+                    metric_name: response.generated_text
+                    for metric_name, response in zip(payloads.keys(), responses)
+                }, True
+            except Exception as e:
+                logger.warning(f"Evaluasi {stage} secara batch gagal, beralih ke mode sekuensial: {e}")
 
-        # --- TAHAP 1: EVALUASI KUANTITATIF ---
-        scores: Dict[str, int] = {}
-        metric_functions = {
-            "clarity": self.create_clarity_prompt, "specificity": self.create_specificity_prompt,
-            "ethics": self.create_ethics_prompt, "effectiveness": self.create_effectiveness_prompt,
-            "bias_risk": self.create_bias_risk_prompt,
+        generated_texts: Dict[str, Optional[str]] = {}
+        for metric_name, payload in payloads.items():
+            try:
+                generated_texts[metric_name] = self.text_gen_model.generate(payload, prefix_key=prefix_keys[metric_name]).generated_text
+            except Exception as e:
+                logger.error(f"Evaluasi {stage} untuk '{metric_name}' gagal: {e}")
+                generated_texts[metric_name] = None
+        return generated_texts, False
+
+    def _logit_scores(self, prompt: str) -> Tuple[Dict[str, Any], bool]:
+        """Membaca skor logit semua metrik kuantitatif; mengembalikan (hasil per metrik, batched).
+
+        Dalam mode batched, kelima prompt di-prefill sebagai satu batch. Jika batch gagal,
+        atau mode batched dimatikan, metrik dinilai satu per satu. Metrik yang gagal tidak
+        dimasukkan ke hasil.
+        """
+        payloads = {metric_name: self._build_payload(metric_name, prompt) for metric_name in self.metric_functions}
+        prefix_keys = {
+            metric_name: self._prefix_key(metric_name) if self.prefix_cache else None for metric_name in payloads
         }
-        for metric_name, create_prompt_func in metric_functions.items():
+        if self.batched:
+            try:
+                results = self.text_gen_model.score_batch(
+                    list(payloads.values()), prefix_keys=list(prefix_keys.values())
+                )
+                return dict(zip(payloads.keys(), results)), True
+            except Exception as e:
+                logger.warning(f"Evaluasi kuantitatif secara batch gagal, beralih ke mode sekuensial: {e}")
+
+        results: Dict[str, Any] = {}
+        for metric_name, payload in payloads.items():
             try:
-                # ... (logika loop kuantitatif Anda)
-                evaluation_prompt = create_prompt_func(prompt)
-                payload = TextGenerationPayload(text=evaluation_prompt, max_new_tokens=8, temperature=0.1, system_message="Anda adalah evaluator prompt AI yang ahli dan objektif.")
-                response = self.text_gen_model.generate(payload)
-                match = re.search(r'\d+', response.generated_text.strip())
-                scores[metric_name] = int(match.group(0)) if match else 0
+                results[metric_name] = self.text_gen_model.score(payload, prefix_key=prefix_keys[metric_name])
             except Exception as e:
                 logger.error(f"Evaluasi kuantitatif untuk '{metric_name}' gagal: {e}")
-                scores[metric_name] = 0
+        return results, False
+
+    def _score_stage(self, prompt: str) -> Tuple[Dict[str, int], Dict[str, float], bool]:
+        """Menghitung skor semua metrik kuantitatif beserta tingkat keyakinannya, dan apakah tahap ini di-batch.
+
+        Mode "logits" membaca distribusi token angka 0-100 dari satu forward pass
+        dan memakai nilai harapannya. Mode "generate" mengambil sampel teks lalu
+        mencari angka pertama dengan regex (keyakinan tidak tersedia).
+        Metrik yang gagal atau tanpa angka tidak dimasukkan ke `scores`.
+        """
+        scores: Dict[str, int] = {}
+        confidences: Dict[str, float] = {}
+        if self.score_mode == "logits":
+            score_results, batched = self._logit_scores(prompt)
+            for metric_name, score in score_results.items():
+                scores[metric_name] = int(round(score.expected_score))
+                confidences[metric_name] = score.confidence
+            return scores, confidences, batched
+
+        metric_payloads = {
+            metric_name: self._build_payload(metric_name, prompt) for metric_name in self.metric_functions
+        }
+        generated_texts, batched = self._generate_stage(metric_payloads, stage="kuantitatif")
+        for metric_name, generated_text in generated_texts.items():
+            match = re.search(r'\d+', generated_text.strip()) if generated_text is not None else None
+            if match:
+                scores[metric_name] = int(match.group(0))
+        return scores, confidences, batched
+
+    def _subtask_names(self) -> List[str]:
+        """Nama sub-tugas dalam mode paralel; skor logit dibaca sebagai satu sub-tugas."""
+        if self.score_mode == "logits":
+            return [self.LOGIT_SCORES_TASK, *self.qualitative_functions]
+        return [*self.metric_functions, *self.qualitative_functions]
+
+    def _generation_backend(self, metric_name: str) -> str:
+        """Backend yang menjalankan sub-tugas sebuah metrik: "scheduler" atau "model"."""
+        if not self.parallel or self.scheduler is None:
+            return "model"
+        if metric_name in self.metric_functions and self.score_mode == "logits":
+            return "model"
+        return "scheduler"
+
+    def _submit_subtask(self, name: str, prompt: str) -> Future:
+        """Mengirim satu sub-tugas ke backend generasi tanpa menunggu hasilnya."""
+        if name == self.LOGIT_SCORES_TASK:
+            return self._executor.submit(self._logit_scores, prompt)
+        payload = self._build_payload(name, prompt)
+        prefix_key = self._prefix_key(name) if self.prefix_cache else None
+        if self.scheduler is not None:
+            return self.scheduler.submit(payload, prefix_key=prefix_key)
+        return self._executor.submit(self.text_gen_model.generate, payload, prefix_key=prefix_key)
+
+    def _parse_subtask(self, name: str, output: Any) -> Dict[str, Tuple[Any, Optional[float]]]:
+        """Mengubah keluaran mentah satu sub-tugas menjadi {metrik: (nilai, keyakinan)}; nilai None jika gagal."""
+        metric_names = list(self.metric_functions) if name == self.LOGIT_SCORES_TASK else [name]
+        if isinstance(output, BaseException):
+            logger.error(f"Sub-tugas '{name}' gagal: {output}")
+            return {metric_name: (None, None) for metric_name in metric_names}
+
+        if name == self.LOGIT_SCORES_TASK:
+            # Satu hasil score_batch dibagikan ke kelima metrik; metrik yang gagal tidak ada di hasil
+            parsed: Dict[str, Tuple[Any, Optional[float]]] = {metric_name: (None, None) for metric_name in metric_names}
+            for metric_name, score in output[0].items():
+                parsed[metric_name] = int(round(score.expected_score)), score.confidence
+            return parsed
+        if name in self.metric_functions:
+            match = re.search(r'\d+', output.generated_text.strip())
+            return {name: ((int(match.group(0)) if match else None), None)}
+
+        is_list = self.qualitative_functions[name][1]
+        return {name: (self._parse_qualitative_response(output.generated_text, is_list=is_list), None)}
+
+    def _run_parallel(
+        self,
+        prompt: str,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+    ) -> Tuple[Dict[str, int], Dict[str, float], Dict[str, Any], Dict[str, float], bool]:
+        """Menjalankan semua sub-tugas sekaligus sebagai satu graf tugas.
+
+        Semua sub-tugas saling independen, jadi semuanya dikirim bersamaan dan
+        latensi total mendekati sub-tugas paling lambat (improved_prompt).
+        Dalam mode "logits" kelima skor dibaca sebagai satu sub-tugas score_batch.
+        `on_complete(metric_name, nilai)` dipanggil begitu sub-tugas metrik itu selesai.
+        Nilai terakhir bernilai True jika skor logit benar-benar dibaca sebagai satu batch.
+        """
+        graph = TaskGraph()
+        for name in self._subtask_names():
+            graph.add(name, lambda _, name=name: self._submit_subtask(name, prompt))
+
+        def parse_and_notify(name: str, output: Any) -> None:
+            if on_complete is not None:
+                for metric_name, (value, _) in self._parse_subtask(name, output).items():
+                    on_complete(metric_name, self._default_value(metric_name) if value is None else value)
+
+        outputs, durations = graph.run(on_complete=parse_and_notify)
+
+        scores: Dict[str, int] = {}
+        confidences: Dict[str, float] = {}
+        qualitative_results: Dict[str, Any] = {}
+        for name, output in outputs.items():
+            for metric_name, (value, confidence) in self._parse_subtask(name, output).items():
+                if value is None:
+                    continue
+                if metric_name in self.metric_functions:
+                    scores[metric_name] = value
+                    if confidence is not None:
+                        confidences[metric_name] = confidence
+                else:
+                    qualitative_results[metric_name] = value
+        scores_output = outputs.get(self.LOGIT_SCORES_TASK)
+        batched = isinstance(scores_output, tuple) and scores_output[1]
+        return scores, confidences, qualitative_results, durations, batched
+
+    def _run_staged(
+        self,
+        prompt: str,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+    ) -> Tuple[Dict[str, int], Dict[str, float], Dict[str, Any], bool]:
+        """Menjalankan tahap kuantitatif lalu tahap kualitatif secara berurutan.
+
+        Nilai terakhir bernilai True hanya jika kedua tahap berjalan sebagai batch.
+        """
+        # --- TAHAP 1: EVALUASI KUANTITATIF ---
+        scores, confidences, scores_batched = self._score_stage(prompt)
 
         logger.info(f"Evaluasi kuantitatif selesai. Skor: {scores}")
+        if on_complete is not None:
+            for metric_name in self.metric_functions:
+                on_complete(metric_name, scores.get(metric_name, 0))
 
         # --- TAHAP 2: EVALUASI KUALITATIF ---
         qualitative_results: Dict[str, Any] = {}
-        qualitative_functions = {
-            "strengths": (self.create_strengths_prompt, True, 64),
-            "weaknesses": (self.create_weaknesses_prompt, True, 64),
-            "suggestions": (self.create_suggestions_prompt, True, 96),
-            "improved_prompt": (self.create_improved_prompt, False, 256),
+        qualitative_payloads = {
+            metric_name: self._build_payload(metric_name, prompt) for metric_name in self.qualitative_functions
         }
-        for metric_name, (create_prompt_func, is_list, max_tokens) in qualitative_functions.items():
-            try:
-                # ... (logika loop kualitatif Anda)
-                evaluation_prompt = create_prompt_func(prompt)
-                payload = TextGenerationPayload(text=evaluation_prompt, max_new_tokens=max_tokens, temperature=0.3, system_message="Anda adalah seorang ahli prompt engineering yang analitis dan kreatif.")
-                response = self.text_gen_model.generate(payload)
-                qualitative_results[metric_name] = self._parse_qualitative_response(response.generated_text, is_list=is_list)
-            except Exception as e:
-                logger.error(f"Evaluasi kualitatif untuk '{metric_name}' gagal: {e}")
-                qualitative_results[metric_name] = [] if is_list else ""
+        generated_texts, qualitative_batched = self._generate_stage(qualitative_payloads, stage="kualitatif")
+        for metric_name, generated_text in generated_texts.items():
+            is_list = self.qualitative_functions[metric_name][1]
+            if generated_text is not None:
+                qualitative_results[metric_name] = self._parse_qualitative_response(generated_text, is_list=is_list)
+            if on_complete is not None:
+                on_complete(metric_name, qualitative_results.get(metric_name, self._default_value(metric_name)))
         
         logger.info("Evaluasi kualitatif selesai.")
+        return scores, confidences, qualitative_results, scores_batched and qualitative_batched
+
+    def evaluate_prompt(
+        self,
+        prompt: str,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+    ) -> EvaluationResult:
+        """Mengevaluasi sebuah prompt secara kuantitatif dan kualitatif lalu mengembalikan EvaluationResult.
+
+        `on_complete(metric_name, nilai)` dipanggil untuk setiap metrik begitu
+        nilainya tersedia (per sub-tugas dalam mode paralel, per tahap jika tidak).
+        """
+        if not prompt or not prompt.strip():
+            raise ValueError("Prompt tidak boleh kosong")
+        if not self.text_gen_model:
+            raise Exception("Model generasi teks belum diinisialisasi")
+
+        prompt = prompt.strip()
+        logger.info(f"Mengevaluasi prompt: {prompt[:80]}...")
+        started = time.perf_counter()
+
+        subtask_timings: Dict[str, float] = {}
+        if self.parallel:
+            # Sub-tugas generasi dikirim satu per satu; batching-nya terjadi di scheduler
+            scores, confidences, qualitative_results, subtask_timings, batched = self._run_parallel(prompt, on_complete)
+            logger.info(f"Evaluasi paralel selesai. Skor: {scores}")
+        else:
+            scores, confidences, qualitative_results, batched = self._run_staged(prompt, on_complete)
 
         # --- TAHAP 3: HITUNG SKOR DAN BUAT OBJEK RETURN ---
 
+        # Metrik tanpa nilai berasal dari sub-tugas yang gagal dan memakai nilai pengganti
+        failed_subtasks = [
+            metric_name for metric_name in [*self.metric_functions, *self.qualitative_functions]
+            if metric_name not in scores and metric_name not in qualitative_results
+        ]
+        if failed_subtasks:
+            logger.warning(f"Sub-tugas gagal, hasil evaluasi tidak lengkap: {failed_subtasks}")
+
         # 1. Hitung skor keseluruhan berdasarkan bobot
         overall_score = 0.0
         for criterion, weight in self.criteria_weights.items():
@@ -902,7 +1484,19 @@ EVALUASI:"""
             'word_count': len(prompt.split()),
             'character_count': len(prompt),
             'model_used': 'GoToCompany/gemma2-9b-cpt-sahabatai-v1-instruct',
-            'evaluation_method': 'local_llm_evaluation'
+            'evaluation_method': 'local_llm_evaluation',
+            'batched': batched,
+            'prefix_cache': self.prefix_cache,
+            'scoring_method': self.score_mode,
+            'score_confidence': confidences,
+            'parallel': self.parallel,
+            'generation_backend': {
+                metric_name: self._generation_backend(metric_name)
+                for metric_name in [*self.metric_functions, *self.qualitative_functions]
+            },
+            'subtask_timings_ms': subtask_timings,
+            'failed_subtasks': failed_subtasks,
+            'total_time_ms': round((time.perf_counter() - started) * 1000, 1)
         }
 
         # 3. Buat dan kembalikan objek EvaluationResult
@@ -919,8 +1513,77 @@ EVALUASI:"""
             improved_prompt=qualitative_results.get('improved_prompt', ''),
             evaluation_details=evaluation_details,
             sources_used=[],  # Sesuai permintaan, dikosongkan
-            timestamp=datetime.now().isoformat()
+            timestamp=datetime.now().isoformat(),
+            degraded=bool(failed_subtasks)
         )
         
         logger.info(f"Evaluasi lengkap selesai. Skor Keseluruhan: {result.overall_score}")
-        return result
\ No newline at end of file
+        return result
+
+    @staticmethod
+    def _notify_stream_done(
+        on_done: Optional[Callable[[Optional[EvaluationResult], Optional[Exception]], None]],
+        result: Optional[EvaluationResult],
+        error: Optional[Exception],
+    ) -> None:
+        """Memanggil `on_done` tanpa membiarkan galatnya menghentikan stream"""
+        if on_done is None:
+            return
+        try:
+            on_done(result, error)
+        except Exception as e:
+            logger.error(f"Callback akhir evaluasi streaming gagal: {e}")
+
+    def evaluate_prompt_stream(
+        self,
+        prompt: str,
+        on_done: Optional[Callable[[Optional[EvaluationResult], Optional[Exception]], None]] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """Mengevaluasi prompt dan menghasilkan setiap metrik begitu selesai.
+
+        Menghasilkan `{"event": "score", ...}` untuk setiap skor dan
+        `{"event": "field", ...}` untuk setiap bidang kualitatif, masing-masing
+        dengan `name`, `value` dan `elapsed_ms`, lalu satu `{"event": "done"}`
+        yang membawa EvaluationResult lengkap.
+
+        Evaluasi berjalan di thread sendiri sampai selesai, juga jika pembaca
+        berhenti lebih awal (klien terputus). `on_done(hasil, galat)` dipanggil
+        dari thread itu saat evaluasi selesai, sebelum event terakhir dikirim.
+        """
+        events: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        started = time.perf_counter()
+
+        def elapsed_ms() -> float:
+            return round((time.perf_counter() - started) * 1000, 1)
+
+        def on_complete(metric_name: str, value: Any) -> None:
+            if metric_name in self.metric_functions:
+                # Sama seperti EvaluationResult, skor dikirim sebagai float
+                events.put({"event": "score", "name": metric_name, "value": float(value), "elapsed_ms": elapsed_ms()})
+            else:
+                events.put({"event": "field", "name": metric_name, "value": value, "elapsed_ms": elapsed_ms()})
+
+        def _run():
+            result, error = None, None
+            try:
+                result = self.evaluate_prompt(prompt, on_complete=on_complete)
+            except Exception as e:
+                logger.error(f"Evaluasi streaming gagal: {e}")
+                error = e
+            self._notify_stream_done(on_done, result, error)
+            events.put(
+                {"event": "done", "result": result, "elapsed_ms": elapsed_ms()}
+                if error is None
+                else {"event": "error", "error": error}
+            )
+            events.put(None)
+
+        threading.Thread(target=_run, name="goto-eval-stream", daemon=True).start()
+
+        while True:
+            event = events.get()
+            if event is None:
+                return
+            if event["event"] == "error":
+                raise event["error"]
+            yield event
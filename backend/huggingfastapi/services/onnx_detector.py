@@ -0,0 +1,159 @@
+"""ONNX Runtime backend for the AI detector on CPU-only nodes
+
+The PyTorch model (encoder, mean pooling and classifier head) is exported
+once to `<model dir>/onnx/model.onnx`, dynamically quantized to int8, and
+checked against the PyTorch probabilities on a fixed set of texts. The
+result of that check is stored next to the graphs, so later starts load
+the int8 session directly without building the PyTorch model at all.
+Needs `onnxruntime` and `onnx` (pip install onnxruntime onnx).
+"""
+from pathlib import Path
+from typing import Any, Dict, List
+from loguru import logger
+import inspect
+import json
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+ONNX_DIRECTORY = "onnx"
+FP32_FILE = "model.onnx"
+INT8_FILE = "model.int8.onnx"
+VALIDATION_FILE = "validation.json"
+
+# Mixed lengths and languages so both short and long padded batches are compared
+VALIDATION_TEXTS = [
+    "Halo, apa kabar?",
+    "Pemerintah kota mengumumkan jadwal baru transportasi umum yang akan berlaku mulai bulan depan.",
+    "The quick brown fox jumps over the lazy dog while the rain keeps falling on the quiet town.",
+    "Sebagai model bahasa, saya dapat membantu Anda menyusun ringkasan yang jelas dan terstruktur. "
+    "Berikut adalah beberapa poin penting yang perlu diperhatikan dalam menulis esai argumentatif "
+    "yang baik, mulai dari pendahuluan, isi, hingga kesimpulan yang kuat dan meyakinkan.",
+    "kmrn aku ke pasar beli sayur, trs ketemu temen lama. seru bgt ngobrolnya sampe lupa waktu",
+    "In conclusion, it is important to note that technology has both advantages and disadvantages. "
+    "On one hand, it improves efficiency and communication. On the other hand, it may reduce "
+    "face-to-face interaction and create new challenges for privacy and security in society.",
+]
+
+
+class _LogitsOnly(nn.Module):
+    """Exposes the detector's logits as a plain tensor output for export"""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids: torch.Tensor, attention_mask: torch.Tensor) -> torch.Tensor:
+        return self.model(input_ids=input_ids, attention_mask=attention_mask)["logits"]
+
+
+def onnx_directory(save_path: Path) -> Path:
+    return Path(save_path) / ONNX_DIRECTORY
+
+
+def export_int8(model: nn.Module, tokenizer: Any, directory: Path, opset: int = 17) -> Path:
+    """Export the detector to ONNX and quantize its weights to int8; returns the int8 graph path"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    directory.mkdir(parents=True, exist_ok=True)
+    fp32_path, int8_path = directory / FP32_FILE, directory / INT8_FILE
+
+    sample = tokenizer(VALIDATION_TEXTS[:2], padding=True, return_tensors="pt")
+    export_kwargs = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles the dynamic batch and sequence axes of the encoder
+        export_kwargs["dynamo"] = False
+
+    started = time.perf_counter()
+    model = model.to("cpu").eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            (sample["input_ids"], sample["attention_mask"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=opset,
+            **export_kwargs,
+        )
+    quantize_dynamic(str(fp32_path), str(int8_path), weight_type=QuantType.QInt8)
+    logger.info(f"Exported AI detector to {int8_path} in {time.perf_counter() - started:.1f}s")
+    return int8_path
+
+
+class OnnxDetectorSession:
+    """int8 ONNX Runtime session with the same inputs and logits as DesklibAIDetectionModel"""
+
+    def __init__(self, path: Path, threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # One large request uses every core; concurrent requests queue instead of oversubscribing
+        options.intra_op_num_threads = threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = path
+        self.threads = options.intra_op_num_threads
+        self.session = ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(path={self.path}, threads={self.threads})"
+
+    def logits(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        (logits,) = self.session.run(
+            ["logits"],
+            {"input_ids": input_ids.astype(np.int64), "attention_mask": attention_mask.astype(np.int64)},
+        )
+        return logits
+
+
+def validate(model: nn.Module, session: OnnxDetectorSession, tokenizer: Any, max_len: int, tolerance: float) -> Dict[str, Any]:
+    """Compare ONNX and PyTorch probabilities on VALIDATION_TEXTS and time both"""
+    encoded = tokenizer(VALIDATION_TEXTS, padding=True, truncation=True, max_length=max_len, return_tensors="pt")
+    model = model.to("cpu").eval()
+
+    started = time.perf_counter()
+    with torch.no_grad():
+        expected = torch.sigmoid(model(input_ids=encoded["input_ids"], attention_mask=encoded["attention_mask"])["logits"])
+    torch_ms = (time.perf_counter() - started) * 1000
+    expected = expected.view(-1).numpy()
+
+    started = time.perf_counter()
+    actual = 1 / (1 + np.exp(-session.logits(encoded["input_ids"].numpy(), encoded["attention_mask"].numpy())))
+    onnx_ms = (time.perf_counter() - started) * 1000
+    actual = actual.reshape(-1)
+
+    max_abs_diff = float(np.max(np.abs(actual - expected)))
+    labels_match = bool(np.array_equal(actual >= 0.5, expected >= 0.5))
+    return {
+        "max_abs_diff": round(max_abs_diff, 6),
+        "labels_match": labels_match,
+        "tolerance": tolerance,
+        "passed": labels_match and max_abs_diff <= tolerance,
+        "torch_ms": round(torch_ms, 2),
+        "onnx_ms": round(onnx_ms, 2),
+    }
+
+
+def read_validation(directory: Path) -> Dict[str, Any]:
+    path = directory / VALIDATION_FILE
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def write_validation(directory: Path, report: Dict[str, Any]) -> None:
+    (directory / VALIDATION_FILE).write_text(json.dumps(report, indent=2))
+
+
+def probabilities(session: OnnxDetectorSession, encoded: Dict[str, torch.Tensor]) -> List[float]:
+    logits = session.logits(encoded["input_ids"].numpy(), encoded["attention_mask"].numpy())
+    return (1 / (1 + np.exp(-logits))).reshape(-1).tolist()
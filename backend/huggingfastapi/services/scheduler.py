@@ -0,0 +1,374 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from loguru import logger
+import collections
+import threading
+import torch
+from transformers import DynamicCache
+
+from huggingfastapi.models.payload import TextGenerationPayload
+from huggingfastapi.models.prediction import TextGenerationResult
+from huggingfastapi.services import tokenization
+from huggingfastapi.services.text_generation import TextGenerationModel
+from huggingfastapi.services.utils import concat_kv_caches, pad_kv_cache_left, trim_kv_cache_left
+from huggingfastapi.core.messages import NO_VALID_PAYLOAD
+from huggingfastapi.core.config import GEN_MAX_BATCH_SIZE, GEN_TOKEN_BUDGET
+
+
+@dataclass
+class _Sequence:
+    """One queued or running generation request"""
+    # Prompt messages and token ids after the history budget, prepared on the tokenizer pool
+    encoding: Future
+    max_new_tokens: int
+    temperature: float
+    prefix_key: Optional[str]
+    future: Future
+    generated: List[int] = field(default_factory=list)
+
+    @property
+    def messages(self) -> List[Dict[str, str]]:
+        return self.encoding.result().messages
+
+    @property
+    def input_ids(self) -> torch.Tensor:
+        return self.encoding.result().input_ids
+
+    @property
+    def token_cost(self) -> int:
+        return self.input_ids.shape[0] + self.max_new_tokens
+
+    def context_ids(self) -> torch.Tensor:
+        """Prompt ids followed by the tokens generated so far"""
+        generated = torch.tensor(self.generated, dtype=self.input_ids.dtype, device=self.input_ids.device)
+        return torch.cat([self.input_ids, generated])
+
+
+class GenerationScheduler:
+    """Continuous-batching scheduler in front of a TextGenerationModel
+
+    Requests are queued and a single background thread runs them in one
+    shared decode batch. At every decode step, waiting requests are prefilled
+    and merged into the batch, and finished ones are removed. Admission is
+    bounded by `max_batch_size` running sequences and by `token_budget`, the
+    summed prompt plus `max_new_tokens` of everything in the batch. Prompts
+    are tokenized on the tokenizer pool, so new requests are encoded while
+    the batch keeps decoding and are admitted once their ids are ready.
+
+    Failures stay with the request that caused them: a sequence whose
+    prefill fails is rejected alone, and if a shared decode step fails the
+    batch is rebuilt by prefilling each running sequence with the tokens it
+    has generated so far, so only the sequences that fail again are lost.
+    """
+
+    def __init__(
+        self,
+        text_gen_model: TextGenerationModel,
+        max_batch_size: int = GEN_MAX_BATCH_SIZE,
+        token_budget: int = GEN_TOKEN_BUDGET,
+    ):
+        self.text_gen_model = text_gen_model
+        self.max_batch_size = max_batch_size
+        self.token_budget = token_budget
+
+        self._waiting: collections.deque = collections.deque()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        # History summaries run the model, so they stay off the tokenizer pool
+        self._summaries = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+        # Running batch state, rows aligned with self._active
+        self._active: List[_Sequence] = []
+        self._cache = None
+        self._attention_mask: Optional[torch.Tensor] = None
+        self._positions: Optional[torch.Tensor] = None
+        self._next_tokens: Optional[torch.Tensor] = None
+
+        self._stats = {"completed": 0, "failed": 0, "decode_steps": 0, "generated_tokens": 0, "max_batch_size_seen": 0}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(max_batch_size={self.max_batch_size}, token_budget={self.token_budget})"
+
+    def start(self) -> None:
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name="generation-scheduler", daemon=True)
+        self._thread.start()
+        logger.info(f"Generation scheduler started: {self}")
+        if self.text_gen_model.draft_model is not None:
+            logger.warning(
+                "Speculative decoding is single-sequence only; "
+                "requests batched by the scheduler decode without the draft model"
+            )
+
+    def stop(self) -> None:
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self._fail_all(RuntimeError("Generation scheduler stopped"))
+        self._summaries.shutdown(wait=False)
+        logger.info("Generation scheduler stopped.")
+
+    def submit(self, payload: TextGenerationPayload, prefix_key: Optional[str] = None) -> Future:
+        """Queue a payload and return a Future resolving to its TextGenerationResult"""
+        if payload is None:
+            raise ValueError(NO_VALID_PAYLOAD.format(payload))
+
+        sequence = _Sequence(
+            encoding=self._prepare(payload),
+            max_new_tokens=payload.max_new_tokens,
+            temperature=payload.temperature,
+            prefix_key=prefix_key,
+            future=Future(),
+        )
+        with self._condition:
+            if not self._running:
+                raise RuntimeError("Generation scheduler is not running")
+            self._waiting.append(sequence)
+        # Wake the loop once the prompt is tokenized
+        sequence.encoding.add_done_callback(self._wake)
+        return sequence.future
+
+    def _prepare(self, payload: TextGenerationPayload) -> Future:
+        """Fit the history on the tokenizer pool; a summary of dropped turns is then written on its own thread"""
+        encoding: Future = Future()
+
+        def summarize(prompt, dropped) -> None:
+            try:
+                encoding.set_result(self.text_gen_model._add_summary(prompt, dropped))
+            except Exception as e:
+                encoding.set_exception(e)
+
+        def fitted(fitting: Future) -> None:
+            if fitting.exception() is not None:
+                encoding.set_exception(fitting.exception())
+                return
+            prompt, dropped = fitting.result()
+            if dropped:
+                self._summaries.submit(summarize, prompt, dropped)
+            else:
+                encoding.set_result(prompt)
+
+        tokenization.submit(self.text_gen_model._fit_history, payload).add_done_callback(fitted)
+        return encoding
+
+    def _wake(self, _: Future) -> None:
+        with self._condition:
+            self._condition.notify()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self._stats, "waiting": len(self._waiting), "running": len(self._active)}
+
+    def _loop(self) -> None:
+        while True:
+            with self._condition:
+                while self._running and not self._active and not any(s.encoding.done() for s in self._waiting):
+                    self._condition.wait()
+                if not self._running:
+                    return
+                admitted = self._admit()
+
+            for sequence in admitted:
+                try:
+                    self._prefill(sequence)
+                except Exception as e:
+                    logger.error(f"Generation scheduler prefill failed: {str(e)}")
+                    self._fail(sequence, e)
+            if self._active:
+                try:
+                    self._decode_step()
+                except Exception as e:
+                    logger.error(f"Generation scheduler decode step failed, rebuilding the batch: {str(e)}")
+                    self._rebuild()
+
+    def _admit(self) -> List[_Sequence]:
+        """Pop tokenized waiting sequences that fit the batch size and token budget (FIFO, caller holds the lock)"""
+        admitted, failed = [], []
+        used = sum(sequence.token_cost for sequence in self._active)
+        for sequence in self._waiting:
+            if len(self._active) + len(admitted) >= self.max_batch_size:
+                break
+            if not sequence.encoding.done():
+                # Still tokenizing; ready requests behind it go first
+                continue
+            if sequence.encoding.exception() is not None:
+                failed.append(sequence)
+                continue
+            # An oversized request is still admitted alone so it cannot starve
+            if used + sequence.token_cost > self.token_budget and (self._active or admitted):
+                break
+            admitted.append(sequence)
+            used += sequence.token_cost
+
+        for sequence in admitted + failed:
+            self._waiting.remove(sequence)
+        for sequence in failed:
+            sequence.future.set_exception(sequence.encoding.exception())
+            self._stats["failed"] += 1
+        return admitted
+
+    def _prefill(self, sequence: _Sequence) -> None:
+        """Prefill one sequence, sample its next token and merge it into the running batch
+
+        The batch state is only replaced once everything succeeded, so a failure leaves it untouched.
+        """
+        model = self.text_gen_model.model
+        input_ids = sequence.context_ids()
+        reuse, cache = self.text_gen_model._reusable_prefix(input_ids, sequence.prefix_key)
+
+        with torch.no_grad():
+            # Without an explicit cache, Gemma 2 may build its HybridCache, which the batch cache helpers cannot merge
+            outputs = model(
+                input_ids=input_ids[None, reuse:],
+                past_key_values=cache if cache is not None else DynamicCache(),
+                use_cache=True,
+            )
+        cache = outputs.past_key_values
+        first_token = self._sample(outputs.logits[:, -1], [sequence.temperature])
+
+        length = input_ids.shape[0]
+        mask = torch.ones((1, length), dtype=torch.long, device=input_ids.device)
+        position = torch.tensor([length], device=input_ids.device)
+
+        next_tokens = first_token
+        if self._active:
+            total_length = max(self._attention_mask.shape[1], length)
+            cache = concat_kv_caches([
+                pad_kv_cache_left(self._cache, total_length),
+                pad_kv_cache_left(cache, total_length),
+            ])
+            mask = torch.cat([
+                torch.nn.functional.pad(self._attention_mask, (total_length - self._attention_mask.shape[1], 0)),
+                torch.nn.functional.pad(mask, (total_length - length, 0)),
+            ])
+            position = torch.cat([self._positions, position])
+            next_tokens = torch.cat([self._next_tokens, first_token])
+        self._cache, self._attention_mask, self._positions, self._next_tokens = cache, mask, position, next_tokens
+        with self._condition:
+            self._active.append(sequence)
+            self._stats["max_batch_size_seen"] = max(self._stats["max_batch_size_seen"], len(self._active))
+
+        self._record_tokens(first_token)
+
+    def _decode_step(self) -> None:
+        """Feed every running sequence its last token and sample the next one"""
+        self._attention_mask = torch.nn.functional.pad(self._attention_mask, (0, 1), value=1)
+        with torch.no_grad():
+            outputs = self.text_gen_model.model(
+                input_ids=self._next_tokens,
+                attention_mask=self._attention_mask,
+                position_ids=self._positions[:, None],
+                past_key_values=self._cache,
+                use_cache=True,
+            )
+        self._cache = outputs.past_key_values
+        self._positions = self._positions + 1
+        self._next_tokens = self._sample(outputs.logits[:, -1], [sequence.temperature for sequence in self._active])
+        with self._condition:
+            self._stats["decode_steps"] += 1
+
+        self._record_tokens(self._next_tokens)
+
+    def _record_tokens(self, tokens: torch.Tensor) -> None:
+        """Append freshly sampled tokens (rows at the end of the batch) and retire finished sequences"""
+        terminators = set(self.text_gen_model.terminators)
+        offset = len(self._active) - tokens.shape[0]
+        finished, generated = [], 0
+        for row, token in enumerate(tokens[:, 0].tolist()):
+            sequence = self._active[offset + row]
+            if token in terminators:
+                finished.append(offset + row)
+                continue
+            sequence.generated.append(token)
+            generated += 1
+            if len(sequence.generated) >= sequence.max_new_tokens:
+                finished.append(offset + row)
+
+        with self._condition:
+            self._stats["generated_tokens"] += generated
+        if finished:
+            self._retire(finished)
+
+    def _retire(self, rows: List[int]) -> None:
+        """Resolve finished sequences and drop their rows from the batch"""
+        for row in rows:
+            sequence = self._active[row]
+            try:
+                sequence.future.set_result(self._result(sequence))
+            except Exception as e:
+                logger.error(f"Generation scheduler post-processing failed: {str(e)}")
+                self._fail(sequence, e)
+                continue
+            with self._condition:
+                self._stats["completed"] += 1
+
+        retired = set(rows)
+        keep = [row for row in range(len(self._active)) if row not in retired]
+        with self._condition:
+            self._active = [self._active[row] for row in keep]
+        if not keep:
+            self._cache = self._attention_mask = self._positions = self._next_tokens = None
+            return
+
+        self._cache.batch_select_indices(torch.tensor(keep, device=self._attention_mask.device))
+        self._attention_mask = self._attention_mask[keep]
+        self._positions = self._positions[keep]
+        self._next_tokens = self._next_tokens[keep]
+
+        # Reclaim left padding that only the retired rows needed
+        unused = int((self._attention_mask.sum(dim=0) == 0).long().cumprod(dim=0).sum())
+        if unused:
+            self._cache = trim_kv_cache_left(self._cache, unused)
+            self._attention_mask = self._attention_mask[:, unused:]
+
+    def _result(self, sequence: _Sequence) -> TextGenerationResult:
+        generated_text = self.text_gen_model.tokenizer.decode(sequence.generated, skip_special_tokens=True).strip()
+        outputs = self.text_gen_model._as_pipeline_output(sequence.messages, generated_text)
+        result: TextGenerationResult = self.text_gen_model._post_process(outputs, sequence.messages)
+        return result.model_copy(update=sequence.encoding.result().usage)
+
+    def _sample(self, logits: torch.Tensor, temperatures: List[float]) -> torch.Tensor:
+        """Sample one token per row with its own temperature (greedy when the temperature is 0)"""
+        logits = logits.float()
+        temperature = torch.tensor(temperatures, device=logits.device, dtype=logits.dtype)[:, None]
+        greedy = logits.argmax(dim=-1, keepdim=True)
+        probabilities = torch.softmax(logits / temperature.clamp(min=1e-5), dim=-1)
+        sampled = torch.multinomial(probabilities, num_samples=1)
+        return torch.where(temperature > 0, sampled, greedy)
+
+    def _rebuild(self) -> None:
+        """Drop the shared batch and prefill each running sequence again on its own"""
+        with self._condition:
+            sequences, self._active = self._active, []
+        self._cache = self._attention_mask = self._positions = self._next_tokens = None
+        for sequence in sequences:
+            try:
+                self._prefill(sequence)
+            except Exception as e:
+                logger.error(f"Generation scheduler could not resume a sequence: {str(e)}")
+                self._fail(sequence, e)
+
+    def _fail_all(self, error: Exception) -> None:
+        with self._condition:
+            sequences = list(self._active)
+            if not self._running:
+                sequences += list(self._waiting)
+                self._waiting.clear()
+            self._active = []
+        self._cache = self._attention_mask = self._positions = self._next_tokens = None
+        for sequence in sequences:
+            self._fail(sequence, error)
+
+    def _fail(self, sequence: _Sequence, error: Exception) -> None:
+        if sequence.future.done():
+            return
+        sequence.future.set_exception(error)
+        with self._condition:
+            self._stats["failed"] += 1
@@ -0,0 +1,178 @@
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+from loguru import logger
+import collections
+import threading
+import time
+
+import torch
+from transformers import DynamicCache
+
+from huggingfastapi.core.config import CHAT_SESSION_MEMORY_MB, CHAT_SESSION_OFFLOAD_MB, CHAT_SESSION_TTL
+
+
+MB = 1024 * 1024
+
+
+def kv_cache_nbytes(cache: Optional[DynamicCache]) -> int:
+    if cache is None:
+        return 0
+    return sum(key.numel() * key.element_size() + value.numel() * value.element_size() for key, value in cache)
+
+
+def move_kv_cache(cache: DynamicCache, device) -> DynamicCache:
+    return DynamicCache.from_legacy_cache(tuple(
+        (key.to(device, non_blocking=True), value.to(device, non_blocking=True)) for key, value in cache
+    ))
+
+
+@dataclass
+class ChatSession:
+    session_id: str
+    # Conversation so far (user and assistant turns, without the system message)
+    history: List[Dict[str, str]] = field(default_factory=list)
+    # Summary of turns the history budget already dropped from `history`
+    summary: Optional[str] = None
+    # Token ids the KV cache covers, on CPU; cache and ids are None once the KV values are evicted
+    token_ids: Optional[torch.Tensor] = None
+    cache: Optional[DynamicCache] = None
+    offloaded: bool = False
+    nbytes: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionStore:
+    """KV caches of multi-turn chat conversations, keyed by session id
+
+    A turn checks its session out, reuses the cached KV values for the part
+    of the prompt it shares with the previous turn, and checks the extended
+    cache back in. Caches live on the model device up to `memory_budget_mb`;
+    beyond that the least recently used ones are copied to CPU memory (up to
+    `offload_budget_mb`, 0 disables offload) and finally dropped. A dropped
+    cache keeps its session's history, so the next turn only pays a full
+    prefill. Sessions idle for `ttl_seconds` are removed entirely.
+    """
+
+    def __init__(
+        self,
+        memory_budget_mb: float = CHAT_SESSION_MEMORY_MB,
+        offload_budget_mb: float = CHAT_SESSION_OFFLOAD_MB,
+        ttl_seconds: float = CHAT_SESSION_TTL,
+    ):
+        self.memory_budget = int(memory_budget_mb * MB)
+        self.offload_budget = int(offload_budget_mb * MB)
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._sessions: "collections.OrderedDict[str, ChatSession]" = collections.OrderedDict()
+        self._device_bytes = 0
+        self._offloaded_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "offload_hits": 0, "offloads": 0, "evictions": 0}
+
+    def __repr__(self):
+        return (f"{self.__class__.__name__}(memory_budget_mb={self.memory_budget // MB}, "
+                f"offload_budget_mb={self.offload_budget // MB}, ttl_seconds={self.ttl_seconds})")
+
+    def checkout(self, session_id: str, device=None) -> Optional[ChatSession]:
+        """Take a session's KV cache for one turn; the stored session keeps only its history meanwhile
+
+        Returns None for an unknown session. A concurrent turn on the same
+        session gets the history without a cache.
+        """
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._stats["misses"] += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            session.last_used = time.monotonic()
+            taken = replace(session, history=list(session.history))
+            self._release(session)
+            if taken.cache is not None:
+                self._stats["hits"] += 1
+                self._stats["offload_hits"] += int(taken.offloaded)
+            else:
+                self._stats["misses"] += 1
+
+        if taken.cache is not None and taken.offloaded and device is not None:
+            taken.cache = move_kv_cache(taken.cache, device)
+            taken.offloaded = False
+        return taken
+
+    def checkin(self, session: ChatSession) -> None:
+        session.nbytes = kv_cache_nbytes(session.cache)
+        session.offloaded = False
+        session.last_used = time.monotonic()
+        with self._lock:
+            previous = self._sessions.pop(session.session_id, None)
+            if previous is not None:
+                self._release(previous)
+            self._sessions[session.session_id] = session
+            self._device_bytes += session.nbytes
+            self._enforce_budgets()
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._release(session)
+            return session is not None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._expire()
+            return {
+                **self._stats,
+                "sessions": len(self._sessions),
+                "cached_sessions": sum(session.cache is not None for session in self._sessions.values()),
+                "device_mb": round(self._device_bytes / MB, 2),
+                "offloaded_mb": round(self._offloaded_bytes / MB, 2),
+                "memory_budget_mb": round(self.memory_budget / MB, 2),
+                "offload_budget_mb": round(self.offload_budget / MB, 2),
+            }
+
+    def _release(self, session: ChatSession) -> None:
+        """Drop a session's KV values and their accounting (caller holds the lock)"""
+        if session.offloaded:
+            self._offloaded_bytes -= session.nbytes
+        else:
+            self._device_bytes -= session.nbytes
+        session.cache = None
+        session.token_ids = None
+        session.offloaded = False
+        session.nbytes = 0
+
+    def _enforce_budgets(self) -> None:
+        """Offload, then drop, least recently used caches until both tiers fit (caller holds the lock)"""
+        for session in list(self._sessions.values()):
+            if self._device_bytes <= self.memory_budget:
+                break
+            if session.cache is None or session.offloaded:
+                continue
+            if self.offload_budget and session.nbytes <= self.offload_budget:
+                session.cache = move_kv_cache(session.cache, "cpu")
+                session.offloaded = True
+                self._device_bytes -= session.nbytes
+                self._offloaded_bytes += session.nbytes
+                self._stats["offloads"] += 1
+            else:
+                self._release(session)
+                self._stats["evictions"] += 1
+
+        for session in list(self._sessions.values()):
+            if self._offloaded_bytes <= self.offload_budget:
+                break
+            if session.offloaded:
+                self._release(session)
+                self._stats["evictions"] += 1
+
+    def _expire(self) -> None:
+        if not self.ttl_seconds:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        expired = [session_id for session_id, session in self._sessions.items() if session.last_used < deadline]
+        for session_id in expired:
+            self._release(self._sessions.pop(session_id))
+        if expired:
+            logger.info(f"Expired {len(expired)} idle chat sessions")
@@ -0,0 +1,91 @@
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from loguru import logger
+import asyncio
+import threading
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key into one execution
+
+    The first caller for a key runs the work; callers that arrive while it is
+    still running wait for the same result (or exception) instead of starting
+    their own. Nothing is kept after the call finishes, so this complements
+    EvaluationCache rather than replacing it.
+
+    `do` serves threads (sync routes run in the threadpool) and `do_async`
+    serves coroutines on the event loop; the two keep separate in-flight maps.
+    `claim` and `resolve` expose the thread side to callers that cannot wrap
+    their work in one function, such as a streamed evaluation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._tasks: Dict[str, asyncio.Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(in_flight={len(self._calls) + len(self._tasks)})"
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        future, leader = self.claim(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.resolve(key, future, error=e)
+            raise
+        self.resolve(key, future, result=result)
+        return result
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """Return the in-flight Future for `key` and whether the caller now leads it
+
+        A leader must hand its outcome to `resolve`; followers wait on the Future.
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._calls.get(key)
+            if future is None:
+                future = self._calls[key] = Future()
+                self._stats["executions"] += 1
+                return future, True
+            self._stats["coalesced"] += 1
+        logger.info(f"Coalesced with in-flight call: {key[:12]}")
+        return future, False
+
+    def resolve(self, key: str, future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        """Finish a claimed call: later callers start a new one, waiting followers get the outcome"""
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with self._lock:
+            self._stats["calls"] += 1
+            task = self._tasks.get(key)
+            if task is None:
+                # A task rather than a bare await, so one cancelled caller cannot cancel the shared work
+                task = asyncio.ensure_future(fn())
+                self._tasks[key] = task
+                task.add_done_callback(lambda _: self._forget(key))
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+                logger.info(f"Coalesced with in-flight call: {key[:12]}")
+
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls) + len(self._tasks)}
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._tasks.pop(key, None)
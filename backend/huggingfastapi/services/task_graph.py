@@ -0,0 +1,107 @@
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import threading
+import time
+
+
+class TaskGraph:
+    """Runs a small DAG of tasks as soon as their dependencies finish
+
+    Each task is a `submit` callable that receives the results of its
+    dependencies and returns a Future, so it can hand work to any backend
+    (the generation scheduler, a thread pool) without blocking. All tasks
+    without pending dependencies are submitted at once, and a task whose
+    dependency failed fails with the same exception.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, Tuple[Callable[[Dict[str, Any]], Future], Tuple[str, ...]]] = {}
+
+    def add(self, name: str, submit: Callable[[Dict[str, Any]], Future], deps: Iterable[str] = ()) -> None:
+        deps = tuple(deps)
+        missing = [dep for dep in deps if dep not in self._tasks]
+        if missing:
+            raise ValueError(f"Task '{name}' depends on unknown tasks: {missing}")
+        self._tasks[name] = (submit, deps)
+
+    def run(
+        self,
+        on_complete: Optional[Callable[[str, Any], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Run every task and return (results, durations in ms)
+
+        A failed task's result is its exception. `on_complete(name, result)`
+        is called from the thread that finished the task.
+        """
+        run = _GraphRun(self._tasks, on_complete)
+        run.start_ready()
+        return run.wait(timeout)
+
+
+class _GraphRun:
+    """Bookkeeping of one TaskGraph.run: results so far and dependency counts"""
+
+    def __init__(
+        self,
+        tasks: Dict[str, Tuple[Callable[[Dict[str, Any]], Future], Tuple[str, ...]]],
+        on_complete: Optional[Callable[[str, Any], None]],
+    ):
+        self.tasks = tasks
+        self.on_complete = on_complete
+        self.results: Dict[str, Any] = {}
+        self.durations: Dict[str, float] = {}
+        self.condition = threading.Condition()
+        self.dependants: Dict[str, List[str]] = {name: [] for name in tasks}
+        self.pending = {name: len(deps) for name, (_, deps) in tasks.items()}
+        for name, (_, deps) in tasks.items():
+            for dep in deps:
+                self.dependants[dep].append(name)
+
+    def start_ready(self) -> None:
+        for name in [name for name, count in self.pending.items() if count == 0]:
+            self.start(name)
+
+    def start(self, name: str) -> None:
+        submit, deps = self.tasks[name]
+        started = time.perf_counter()
+        failed = next((self.results[dep] for dep in deps if isinstance(self.results[dep], BaseException)), None)
+        if failed is not None:
+            self.finish(name, failed, started)
+            return
+        try:
+            future = submit({dep: self.results[dep] for dep in deps})
+        except Exception as e:
+            self.finish(name, e, started)
+            return
+
+        def done(future: Future) -> None:
+            error = future.exception()
+            self.finish(name, error if error is not None else future.result(), started)
+
+        future.add_done_callback(done)
+
+    def finish(self, name: str, result: Any, started: float) -> None:
+        with self.condition:
+            self.results[name] = result
+            self.durations[name] = round((time.perf_counter() - started) * 1000, 1)
+            ready = []
+            for dependant in self.dependants[name]:
+                self.pending[dependant] -= 1
+                if self.pending[dependant] == 0:
+                    ready.append(dependant)
+            self.condition.notify_all()
+        if self.on_complete is not None:
+            self.on_complete(name, result)
+        for dependant in ready:
+            self.start(dependant)
+
+    def wait(self, timeout: Optional[float]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while len(self.results) < len(self.tasks):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"Task graph did not finish within {timeout}s")
+                self.condition.wait(remaining)
+            return dict(self.results), dict(self.durations)
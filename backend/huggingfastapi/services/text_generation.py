@@ -1,21 +1,195 @@
-from typing import Dict, List, Optional
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import math
 from loguru import logger
+import collections
+import copy
+import os
+import statistics
+import threading
+import time
 import torch
 import transformers
-from transformers import BitsAndBytesConfig
+from transformers import (
+    AutoModelForCausalLM,
+    AutoTokenizer,
+    BitsAndBytesConfig,
+    DynamicCache,
+    StoppingCriteria,
+    StoppingCriteriaList,
+    TextIteratorStreamer,
+)
 
 from huggingfastapi.models.payload import TextGenerationPayload
-from huggingfastapi.models.prediction import TextGenerationResult
+from huggingfastapi.models.prediction import TextGenerationResult, TextScoreResult
+from huggingfastapi.services.session_store import ChatSession, SessionStore
+from huggingfastapi.services.utils import ModelLoader, common_prefix_length, stack_kv_caches
 from huggingfastapi.core.messages import NO_VALID_PAYLOAD
-from huggingfastapi.core.config import TEXT_GENERATION_MODEL
+from huggingfastapi.core.config import (
+    CHAT_SESSIONS_ENABLED,
+    DEFAULT_MODEL_PATH,
+    GEN_DRAFT_MODEL,
+    GEN_DRAFT_TOKENS,
+    GEN_HISTORY_POLICY,
+    GEN_PROMPT_TOKEN_BUDGET,
+    GEN_SUMMARY_MAX_TOKENS,
+    TEXT_GENERATION_MODEL,
+    SCORE_MIN_BRANCH_PROB,
+)
+
+
+def download_model_files(model_id: Optional[str] = None) -> None:
+    """Fetch the model's files into the Hugging Face cache without instantiating it"""
+    model_id = model_id or TEXT_GENERATION_MODEL
+    if os.path.isdir(model_id) or ModelLoader.is_complete(model_id, DEFAULT_MODEL_PATH, "int8"):
+        return
+    from huggingface_hub import snapshot_download
+
+    logger.info(f"Downloading text generation model files: {model_id}")
+    # Prefetches the same ref ModelLoader loads next; that copy is then frozen into the verified local artifact
+    snapshot_download(model_id)  # nosec B615
+
+
+# Private-use character marking where the variable part of a prompt template starts
+PREFIX_MARKER = "\ue000"
+
+SUMMARY_INSTRUCTION = (
+    "Ringkas percakapan berikut dalam beberapa kalimat singkat. "
+    "Pertahankan fakta, nama, dan permintaan penting dari pengguna.\n\n{transcript}"
+)
+SUMMARY_HEADER = "Ringkasan percakapan sebelumnya: "
+
+
+@dataclass
+class _Prompt:
+    """A payload's chat messages after the history budget, their token ids and what was kept"""
+    payload: TextGenerationPayload
+    messages: List[Dict[str, str]]
+    input_ids: torch.Tensor
+    usage: Dict[str, Any]
+    # Summary of dropped turns carried in the system message, if any
+    summary: Optional[str] = None
+
+
+class _TimedTextStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer that also records when each new token arrives"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.token_times: List[float] = []
+
+    def put(self, value):
+        # The first call carries the prompt, which skip_prompt discards
+        if not self.next_tokens_are_prompt:
+            self.token_times.extend([time.perf_counter()] * value.numel())
+        super().put(value)
+
+
+class _ForwardCounter:
+    """Counts forward calls of named models made by the current thread inside `counting()`
+
+    Hooks stay registered for the life of the models; calls from other
+    threads (concurrent requests) are ignored.
+    """
+
+    def __init__(self, **models: torch.nn.Module):
+        self._local = threading.local()
+        for name, model in models.items():
+            model.register_forward_hook(self._hook(name))
+
+    def _hook(self, name: str):
+        def hook(module, args, output):
+            counts = getattr(self._local, "counts", None)
+            if counts is not None:
+                counts[name] += 1
+        return hook
+
+    @contextmanager
+    def counting(self) -> Iterator[collections.Counter]:
+        self._local.counts = collections.Counter()
+        try:
+            yield self._local.counts
+        finally:
+            self._local.counts = None
+
+
+class _RowTokenLimits(StoppingCriteria):
+    """Stops each row of a batch after its own number of new tokens
+
+    Rows of a left-padded batch all start generating at the same position,
+    so one counter serves every row. Finished rows are padded by generate()
+    until the longest row is done.
+    """
+
+    def __init__(self, limits: List[int]):
+        self.limits = torch.tensor(limits)
+        self._prompt_length: Optional[int] = None
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor, **kwargs) -> torch.BoolTensor:
+        # The first check runs right after the first new token
+        if self._prompt_length is None:
+            self._prompt_length = input_ids.shape[1] - 1
+        return (input_ids.shape[1] - self._prompt_length) >= self.limits.to(input_ids.device)
+
+
+class _Cancelled(StoppingCriteria):
+    """Stops every row once `event` is set, e.g. when a stream's reader went away"""
+
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+class _SessionTurn:
+    """Checks an unfinished streamed chat turn's session back in once the turn is over
+
+    A stream has two parties, the generation thread and the reader, and the
+    session cache may only be cropped once generate() no longer extends it,
+    so whichever stops last restores the session. A saved turn is left alone.
+    """
+
+    def __init__(self, restore: Callable[[], None]):
+        self.saved = False
+        self._restore = restore
+        self._running = 2
+        self._lock = threading.Lock()
+
+    def stop(self) -> None:
+        with self._lock:
+            self._running -= 1
+            restore = self._running == 0 and not self.saved
+        if restore:
+            self._restore()
 
 
 class TextGenerationModel:
     def __init__(self, model_id: Optional[str] = None):
         self.model_id = model_id or TEXT_GENERATION_MODEL
         self.pipeline = None
+        self.model = None
+        self.tokenizer = None
         self.terminators = None
+        # prefix key -> (prefix token ids, past_key_values of the prefix)
+        self._prefix_cache: Dict[str, Tuple[torch.Tensor, DynamicCache]] = {}
+        # score value -> token ids of its decimal string, built on first use
+        self._score_candidates: Dict[int, Tuple[int, ...]] = {}
+        # session id -> KV cache and history of a multi-turn chat
+        self.sessions: Optional[SessionStore] = SessionStore() if CHAT_SESSIONS_ENABLED else None
+        # Prompt tokens allowed per request (0 = unlimited) and how older history is cut
+        self.prompt_token_budget = GEN_PROMPT_TOKEN_BUDGET
+        self.history_policy = GEN_HISTORY_POLICY
+        # Template tokens around one chat message, measured on first use
+        self._message_overhead: Optional[int] = None
+        # Small same-tokenizer model proposing tokens for speculative decoding
+        self.draft_model = None
+        self.draft_model_id: Optional[str] = None
+        self._forward_counter: Optional[_ForwardCounter] = None
         self._load_model()
+        if GEN_DRAFT_MODEL:
+            self._load_draft_model(GEN_DRAFT_MODEL)
 
     def _load_model(self):
         """Load the model with 8-bit quantization"""
@@ -27,17 +201,29 @@ class TextGenerationModel:
                 load_in_8bit=True,
             )
             
-            # Create the pipeline with 8-bit quantization
-            self.pipeline = transformers.pipeline(
-                "text-generation",
-                model=self.model_id,
+            # Quantized once and saved as safetensors; later starts memory-map the saved 8-bit weights
+            tokenizer, model = ModelLoader(
+                model_name=self.model_id,
+                model_directory=DEFAULT_MODEL_PATH,
+                tokenizer_loader=AutoTokenizer,
+                model_loader=AutoModelForCausalLM,
                 model_kwargs={
                     "torch_dtype": torch.float16,
                     "quantization_config": quantization_config,
+                    "device_map": "auto",
                 },
-                device_map="auto",
-            )
-            
+                variant="int8",
+            ).retrieve()
+            self.pipeline = transformers.pipeline("text-generation", model=model, tokenizer=tokenizer)
+
+            # Batched generation needs a pad token and left padding for decoder-only models
+            if self.pipeline.tokenizer.pad_token_id is None:
+                self.pipeline.tokenizer.pad_token = self.pipeline.tokenizer.eos_token
+            self.pipeline.tokenizer.padding_side = "left"
+
+            self.model = self.pipeline.model
+            self.tokenizer = self.pipeline.tokenizer
+
             # Set up terminators
             self.terminators = [
                 self.pipeline.tokenizer.eos_token_id,
@@ -50,6 +236,32 @@ class TextGenerationModel:
             logger.error(f"Failed to load text generation model: {str(e)}")
             raise
 
+    def _load_draft_model(self, draft_model_id: str) -> None:
+        """Load the draft model for speculative decoding; generation falls back to plain decoding if it does not fit"""
+        logger.info(f"Loading draft model for speculative decoding: {draft_model_id}")
+        try:
+            draft_tokenizer, draft_model = ModelLoader(
+                model_name=draft_model_id,
+                model_directory=DEFAULT_MODEL_PATH,
+                tokenizer_loader=AutoTokenizer,
+                model_loader=AutoModelForCausalLM,
+                model_kwargs={"torch_dtype": torch.float16, "device_map": "auto"},
+            ).retrieve()
+        except Exception as e:
+            logger.error(f"Failed to load draft model, speculative decoding disabled: {str(e)}")
+            return
+
+        # Draft tokens are verified by id, so both models must share one vocabulary
+        if draft_tokenizer.get_vocab() != self.tokenizer.get_vocab():
+            logger.warning(f"Draft model {draft_model_id} does not share the tokenizer of {self.model_id}; speculative decoding disabled")
+            return
+
+        draft_model.generation_config.num_assistant_tokens = GEN_DRAFT_TOKENS
+        self.draft_model = draft_model.eval()
+        self.draft_model_id = draft_model_id
+        self._forward_counter = _ForwardCounter(target=self.model, draft=self.draft_model)
+        logger.info(f"Speculative decoding enabled with {draft_model_id} ({GEN_DRAFT_TOKENS} draft tokens per step)")
+
     def _pre_process(self, payload: TextGenerationPayload) -> List[Dict[str, str]]:
         """Prepare the input messages for text generation"""
         logger.debug("Pre-processing text generation payload.")
@@ -104,9 +316,20 @@ class TextGenerationModel:
                 output_length=len(raw_output)
             )
 
-    def _generate(self, messages: List[Dict[str, str]], max_new_tokens: int = 256, temperature: float = 0.7) -> List[Dict]:
-        """Generate text using the loaded model"""
-        logger.debug("Generating text with model.")
+    def _generate(
+        self,
+        messages: List,
+        max_new_tokens: int = 256,
+        temperature: float = 0.7,
+        batch_size: int = 1,
+        stopping_criteria: Optional[StoppingCriteriaList] = None,
+    ) -> List:
+        """Generate text using the loaded model.
+
+        `messages` is either a single conversation or, when `batch_size` > 1,
+        a list of conversations that the pipeline pads and runs as one batch.
+        """
+        logger.debug(f"Generating text with model (batch_size={batch_size}).")
         
         try:
             outputs = self.pipeline(
@@ -115,7 +338,9 @@ class TextGenerationModel:
                 eos_token_id=self.terminators,
                 temperature=temperature,
                 do_sample=True,
-                pad_token_id=self.pipeline.tokenizer.eos_token_id,
+                pad_token_id=self.pipeline.tokenizer.pad_token_id,
+                batch_size=batch_size,
+                stopping_criteria=stopping_criteria,
             )
             
             return outputs
@@ -124,23 +349,762 @@ class TextGenerationModel:
             logger.error(f"Error during text generation: {str(e)}")
             raise
 
-    def generate(self, payload: TextGenerationPayload) -> TextGenerationResult:
-        """Main method to generate text based on payload"""
+    def _render_prompt(self, messages: List[Dict[str, str]]) -> str:
+        """Apply the chat template exactly as the pipeline does, without tokenizing"""
+        return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+    def _encode(self, messages: List[Dict[str, str]]) -> torch.Tensor:
+        """Token ids (1-D, on the model device) of the rendered chat prompt"""
+        return self.tokenizer(self._render_prompt(messages), add_special_tokens=False, return_tensors="pt").input_ids[0].to(self.model.device)
+
+    @staticmethod
+    def _as_pipeline_output(messages: List[Dict[str, str]], generated_text: str) -> List[Dict]:
+        """Wrap a generated reply in the chat pipeline's output format for `_post_process`"""
+        return [{"generated_text": messages + [{"role": "assistant", "content": generated_text}]}]
+
+    def _run_generate(
+        self,
+        input_ids: torch.Tensor,
+        attention_mask: torch.Tensor,
+        past_key_values: Optional[DynamicCache] = None,
+        max_new_tokens: int = 256,
+        temperature: float = 0.7,
+        streamer: Optional[TextIteratorStreamer] = None,
+        stopping_criteria: Optional[StoppingCriteriaList] = None,
+    ) -> Tuple[torch.Tensor, Dict[str, Any]]:
+        """Sample with `model.generate`; single sequences are drafted by the draft model when one is loaded
+
+        Returns the output ids and, for speculative runs, `draft_model`,
+        `acceptance_rate` (accepted / proposed draft tokens) and
+        `tokens_per_second` (new tokens over the whole call, prefill included).
+        """
+        speculative = self.draft_model is not None and input_ids.shape[0] == 1
+        kwargs: Dict[str, Any] = {}
+        if speculative:
+            # Assisted decoding needs a dynamic cache instead of Gemma 2's default hybrid one
+            kwargs["assistant_model"] = self.draft_model
+            past_key_values = past_key_values if past_key_values is not None else DynamicCache()
+        if past_key_values is not None:
+            # generate() rejects a cache object alongside the cache_implementation of the
+            # generation config (Gemma 2 ships "hybrid"); the cache passed in wins
+            kwargs["cache_implementation"] = None
+
+        started = time.perf_counter()
+        with torch.no_grad(), (self._forward_counter.counting() if speculative else nullcontext()) as counts:
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                past_key_values=past_key_values,
+                streamer=streamer,
+                max_new_tokens=max_new_tokens,
+                eos_token_id=self.terminators,
+                temperature=temperature,
+                do_sample=True,
+                pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=stopping_criteria,
+                **kwargs,
+            )
+        if not speculative:
+            return output_ids, {}
+
+        elapsed = time.perf_counter() - started
+        new_tokens = output_ids.shape[1] - input_ids.shape[1]
+        # Every target forward verifies one draft block and adds one token of its own
+        accepted = max(new_tokens - counts["target"], 0)
+        proposed = counts["draft"]
+        return output_ids, {
+            "draft_model": self.draft_model_id,
+            "acceptance_rate": round(min(accepted / proposed, 1.0), 4) if proposed else 0.0,
+            "tokens_per_second": round(new_tokens / elapsed, 2) if elapsed > 0 else None,
+        }
+
+    def _history_token_counts(self, history: List[Dict[str, str]]) -> List[int]:
+        """Approximate prompt tokens of each history message, including its chat template markup"""
+        if self._message_overhead is None:
+            one = self._encode([{"role": "user", "content": "a"}]).shape[0]
+            three = self._encode([
+                {"role": "user", "content": "a"},
+                {"role": "assistant", "content": "a"},
+                {"role": "user", "content": "a"},
+            ]).shape[0]
+            content = len(self.tokenizer("a", add_special_tokens=False).input_ids)
+            self._message_overhead = max((three - one) // 2 - content, 0)
+
+        contents = [message.get("content", "") for message in history]
+        encoded = self.tokenizer(contents, add_special_tokens=False).input_ids
+        return [len(ids) + self._message_overhead for ids in encoded]
+
+    def _summarize(self, history: List[Dict[str, str]], previous: Optional[str] = None) -> str:
+        """Summarize dropped turns with the model itself (greedy, at most GEN_SUMMARY_MAX_TOKENS)
+
+        `previous` is the summary of even older turns; the new summary covers both.
+        """
+        transcript = "\n".join(f"{message.get('role', 'user')}: {message.get('content', '')}" for message in history)
+        if previous:
+            transcript = f"{SUMMARY_HEADER}{previous}\n{transcript}"
+        if self.prompt_token_budget:
+            # Keep the summarization prompt itself within the budget, favouring the most recent turns
+            transcript_ids = self.tokenizer(transcript, add_special_tokens=False).input_ids
+            transcript = self.tokenizer.decode(transcript_ids[-self.prompt_token_budget:])
+
+        input_ids = self._encode([{"role": "user", "content": SUMMARY_INSTRUCTION.format(transcript=transcript)}])[None]
+        with torch.no_grad():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=GEN_SUMMARY_MAX_TOKENS,
+                eos_token_id=self.terminators,
+                do_sample=False,
+                pad_token_id=self.tokenizer.pad_token_id,
+            )
+        return self.tokenizer.decode(output_ids[0, input_ids.shape[1]:], skip_special_tokens=True).strip()
+
+    @staticmethod
+    def _with_summary(payload: TextGenerationPayload, summary: Optional[str]) -> TextGenerationPayload:
+        """The payload with the summary of earlier turns appended to its system message"""
+        if not summary:
+            return payload
+        summary = SUMMARY_HEADER + summary
+        return payload.model_copy(update={
+            "system_message": f"{payload.system_message}\n\n{summary}" if payload.system_message else summary
+        })
+
+    def _fit_history(
+        self, payload: TextGenerationPayload, summary: Optional[str] = None
+    ) -> Tuple[_Prompt, List[Dict[str, str]]]:
+        """Tokenizer-only part of `_prepare`: drop the oldest turns until the prompt fits the budget
+
+        `summary` covers turns before the payload's history. Returns the fitted
+        prompt and, with the `summarize` policy, the dropped messages still to
+        be summarized; room for that summary is already left in the budget.
+        """
+        history = list(payload.conversation_history or [])
+        costs = self._history_token_counts(history) if history else []
+        budget = self.prompt_token_budget
+        summarize = self.history_policy == "summarize"
+
+        fitted = self._with_summary(payload, summary)
+        messages = self._pre_process(fitted)
+        input_ids = self._encode(messages)
+        drop = 0
+        if budget and history and input_ids.shape[0] > budget:
+            # A new summary replaces any earlier one, so fit the turns without it and keep room for its maximum size
+            limit = budget
+            if summarize:
+                limit -= GEN_SUMMARY_MAX_TOKENS + len(self.tokenizer(SUMMARY_HEADER, add_special_tokens=False).input_ids)
+                if summary:
+                    input_ids = self._encode(self._pre_process(payload))
+            excess = input_ids.shape[0] - limit
+            while drop < len(history) and (excess > 0 or history[drop].get("role") != "user"):
+                excess -= costs[drop]
+                drop += 1
+
+            # Estimates can be off by a few tokens; re-encode and drop further until the prompt fits
+            while True:
+                fitted = payload.model_copy(update={"conversation_history": history[drop:]})
+                messages = self._pre_process(fitted)
+                input_ids = self._encode(messages)
+                if input_ids.shape[0] <= limit or drop >= len(history):
+                    break
+                drop += 1
+                while drop < len(history) and history[drop].get("role") != "user":
+                    drop += 1
+
+            if input_ids.shape[0] > limit:
+                logger.warning(f"Prompt still has {input_ids.shape[0]} tokens after dropping all history (budget {budget})")
+            logger.info(f"Dropped {drop} history messages ({sum(costs[:drop])} tokens) to fit the prompt budget of {budget}")
+
+        usage = {
+            "prompt_tokens": int(input_ids.shape[0]),
+            "history_tokens_kept": sum(costs[drop:]),
+            "history_tokens_dropped": sum(costs[:drop]),
+            "history_messages_dropped": drop,
+            "history_summarized": summarize and drop > 0,
+        }
+        prompt = _Prompt(fitted, messages, input_ids, usage, summary=None if drop else summary)
+        return prompt, (history[:drop] if summarize else [])
+
+    def _add_summary(self, prompt: _Prompt, dropped: List[Dict[str, str]], previous: Optional[str] = None) -> _Prompt:
+        """Summarize the turns `_fit_history` dropped (once) and rebuild the prompt around the summary"""
+        summary = self._summarize(dropped, previous)
+        payload = self._with_summary(prompt.payload, summary)
+        messages = self._pre_process(payload)
+        input_ids = self._encode(messages)
+        usage = {**prompt.usage, "prompt_tokens": int(input_ids.shape[0])}
+        return _Prompt(payload, messages, input_ids, usage, summary=summary)
+
+    def _prepare(self, payload: TextGenerationPayload, summary: Optional[str] = None) -> _Prompt:
+        """Build and encode the prompt, fitting the conversation history into the prompt token budget
+
+        Over budget, the oldest turns are dropped until the prompt fits,
+        always cutting before a user message so roles keep alternating. With
+        the `summarize` policy the dropped turns (and `summary`, the summary of
+        turns dropped earlier) are replaced by one short model-written summary
+        appended to the system message. The current message itself is never cut.
+        """
+        prompt, dropped = self._fit_history(payload, summary)
+        return self._add_summary(prompt, dropped, summary) if dropped else prompt
+
+    def register_prefix(self, key: str, payload: TextGenerationPayload) -> int:
+        """Precompute and store the KV cache of a static prompt prefix.
+
+        `payload.text` holds the fixed start of the user message; everything a
+        later call appends after it is prefilled per request. Returns the
+        number of cached prefix tokens.
+        """
+        messages = self._pre_process(payload.model_copy(update={"text": payload.text + PREFIX_MARKER}))
+        prefix_text = self._render_prompt(messages).split(PREFIX_MARKER)[0]
+        prefix_ids = self.tokenizer(prefix_text, add_special_tokens=False, return_tensors="pt").input_ids.to(self.model.device)
+
+        prefix_cache = DynamicCache()
+        with torch.no_grad():
+            self.model(input_ids=prefix_ids, past_key_values=prefix_cache, use_cache=True)
+
+        self._prefix_cache[key] = (prefix_ids[0], prefix_cache)
+        logger.debug(f"Cached {prefix_ids.shape[1]} prefix tokens for '{key}'.")
+        return prefix_ids.shape[1]
+
+    def _reusable_prefix(self, input_ids: torch.Tensor, prefix_key: Optional[str]) -> Tuple[int, Optional[DynamicCache]]:
+        """Return how many leading tokens of `input_ids` a cached prefix covers, and a private copy of that cache"""
+        if prefix_key not in self._prefix_cache:
+            return 0, None
+
+        prefix_ids, prefix_cache = self._prefix_cache[prefix_key]
+        # Keep at least one token to prefill so the model produces next-token logits
+        reuse = min(common_prefix_length(prefix_ids, input_ids), input_ids.shape[-1] - 1)
+        if reuse <= 0:
+            return 0, None
+
+        cache = copy.deepcopy(prefix_cache)
+        cache.crop(reuse)
+        return reuse, cache
+
+    def _prefix_batch(
+        self,
+        batch_messages: List[List[Dict[str, str]]],
+        prefix_keys: List[Optional[str]],
+    ) -> Tuple[torch.Tensor, torch.Tensor, Optional[DynamicCache], int]:
+        """Encode conversations as one batch that reuses their cached prefixes.
+
+        Each row is laid out as [pad][cached prefix][pad][uncached suffix] so
+        the cached parts line up as one left-padded batch cache and every row
+        ends at the same position. Returns the input ids, the attention mask,
+        the stacked prefix cache (None when no row has one) and the length
+        that cache covers; only `input_ids[:, cached_length:]` needs a prefill.
+        """
+        device = self.model.device
+        rows = []
+        for messages, prefix_key in zip(batch_messages, prefix_keys):
+            input_ids = self._encode(messages)
+            reuse, cache = self._reusable_prefix(input_ids, prefix_key)
+            rows.append((input_ids, reuse, cache))
+
+        cached_length = max(reuse for _, reuse, _ in rows)
+        suffix_length = max(input_ids.shape[0] - reuse for input_ids, reuse, _ in rows)
+        total_length = cached_length + suffix_length
+
+        input_ids = torch.full((len(rows), total_length), self.tokenizer.pad_token_id, dtype=torch.long, device=device)
+        attention_mask = torch.zeros((len(rows), total_length), dtype=torch.long, device=device)
+        for row, (row_ids, reuse, _) in enumerate(rows):
+            suffix = row_ids.shape[0] - reuse
+            input_ids[row, cached_length - reuse:cached_length] = row_ids[:reuse]
+            attention_mask[row, cached_length - reuse:cached_length] = 1
+            input_ids[row, total_length - suffix:] = row_ids[reuse:]
+            attention_mask[row, total_length - suffix:] = 1
+
+        return input_ids, attention_mask, stack_kv_caches([cache for _, _, cache in rows], cached_length), cached_length
+
+    def _generate_with_prefixes(
+        self,
+        batch_messages: List[List[Dict[str, str]]],
+        prefix_keys: List[Optional[str]],
+        max_new_tokens: int = 256,
+        temperature: float = 0.7,
+        stopping_criteria: Optional[StoppingCriteriaList] = None,
+    ) -> List:
+        """Generate for one or more conversations, reusing cached prefixes.
+
+        Rows are laid out by `_prefix_batch`. Outputs mimic the chat pipeline format.
+        """
+        logger.debug(f"Generating text with cached prefixes (batch_size={len(batch_messages)}).")
+        input_ids, attention_mask, past_key_values, _ = self._prefix_batch(batch_messages, prefix_keys)
+        total_length = input_ids.shape[1]
+
+        try:
+            output_ids, speculation = self._run_generate(
+                input_ids,
+                attention_mask,
+                past_key_values=past_key_values,
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                stopping_criteria=stopping_criteria,
+            )
+        except Exception as e:
+            if past_key_values is None:
+                logger.error(f"Error during text generation: {str(e)}")
+                raise
+            # A cached prefix only saves prefill work; generate the plain way instead of failing the request
+            logger.warning(f"Generation with cached prefixes failed, retrying without them: {str(e)}")
+            return self._generate(
+                batch_messages,
+                max_new_tokens=max_new_tokens,
+                temperature=temperature,
+                batch_size=len(batch_messages),
+                stopping_criteria=stopping_criteria,
+            )
+
+        outputs = []
+        for messages, generated_ids in zip(batch_messages, output_ids[:, total_length:]):
+            generated_text = self.tokenizer.decode(generated_ids, skip_special_tokens=True).strip()
+            outputs.append(self._as_pipeline_output(messages, generated_text))
+        if speculation:
+            outputs[0][0]["speculation"] = speculation
+        return outputs
+
+    def _open_session(
+        self, payload: TextGenerationPayload
+    ) -> Tuple[TextGenerationPayload, Optional[ChatSession], Optional[str]]:
+        """Check out the payload's chat session
+
+        Its stored history, and the summary of turns dropped from it, are used
+        when the payload carries no history of its own.
+        """
+        session = self.sessions.checkout(payload.session_id, self.model.device)
+        if session is None or payload.conversation_history is not None:
+            return payload, session, None
+        return payload.model_copy(update={"conversation_history": session.history}), session, session.summary
+
+    @staticmethod
+    def _session_cache(session: Optional[ChatSession], input_ids: torch.Tensor) -> Tuple[int, DynamicCache]:
+        """Crop the session's cache to the part of `input_ids` it already covers; a fresh cache otherwise"""
+        if session is None or session.cache is None:
+            return 0, DynamicCache()
+        # Keep at least one token to prefill so the model produces next-token logits
+        reuse = min(common_prefix_length(session.token_ids, input_ids), input_ids.shape[-1] - 1)
+        if reuse <= 0:
+            return 0, DynamicCache()
+        session.cache.crop(reuse)
+        return reuse, session.cache
+
+    def _save_session(
+        self,
+        payload: TextGenerationPayload,
+        generated_text: str,
+        sequence: torch.Tensor,
+        cache: DynamicCache,
+        summary: Optional[str] = None,
+    ) -> None:
+        """Store the turn's history, summary and extended cache, which covers every token of `sequence` but the last"""
+        history = list(payload.conversation_history or []) + [
+            {"role": "user", "content": payload.text},
+            {"role": "assistant", "content": generated_text},
+        ]
+        self.sessions.checkin(ChatSession(
+            session_id=payload.session_id,
+            history=history,
+            summary=summary,
+            token_ids=sequence[:cache.get_seq_length()].cpu(),
+            cache=cache,
+        ))
+
+    def _restore_session(
+        self, session: Optional[ChatSession], reuse: int = 0, cache: Optional[DynamicCache] = None
+    ) -> None:
+        """Check a session back in unchanged after a turn that did not finish
+
+        A cache the turn reused is cropped back to the `reuse` tokens it
+        shared with the session; the generation that extended it must be over.
+        """
+        if session is None:
+            return
+        if reuse > 0:
+            cache.crop(reuse)
+            session.cache, session.token_ids = cache, session.token_ids[:reuse]
+        self.sessions.checkin(session)
+
+    def _prepare_turn(
+        self, payload: TextGenerationPayload, in_session: bool
+    ) -> Tuple[_Prompt, Optional[ChatSession], int, Optional[DynamicCache]]:
+        """Check out the payload's chat session when `in_session`, then build its prompt and cache
+
+        Returns (prompt, session, reused cache tokens, cache); the session is
+        checked back in if the prompt cannot be built.
+        """
+        session, summary = None, None
+        if in_session:
+            payload, session, summary = self._open_session(payload)
+        try:
+            prompt = self._prepare(payload, summary)
+            reuse, cache = self._session_cache(session, prompt.input_ids) if in_session else (0, None)
+        except Exception:
+            self._restore_session(session)
+            raise
+        return prompt, session, reuse, cache
+
+    def _generate_in_session(self, payload: TextGenerationPayload) -> TextGenerationResult:
+        """Generate one chat turn, prefilling only the tokens the session's cache does not cover"""
+        prompt, session, reuse, cache = self._prepare_turn(payload, in_session=True)
+        payload, messages, input_ids = prompt.payload, prompt.messages, prompt.input_ids
+        try:
+            output_ids, speculation = self._run_generate(
+                input_ids[None],
+                torch.ones_like(input_ids[None]),
+                past_key_values=cache,
+                max_new_tokens=payload.max_new_tokens,
+                temperature=payload.temperature,
+            )
+        except Exception as e:
+            logger.error(f"Error during session text generation: {str(e)}")
+            self._restore_session(session, reuse, cache)
+            raise
+
+        generated_text = self.tokenizer.decode(output_ids[0, input_ids.shape[0]:], skip_special_tokens=True).strip()
+        self._save_session(payload, generated_text, output_ids[0], cache, prompt.summary)
+
+        result = self._post_process(self._as_pipeline_output(messages, generated_text), messages)
+        result = result.model_copy(update={**prompt.usage, **speculation})
+        result.session_id = payload.session_id
+        result.cached_tokens = reuse
+        result.prefill_tokens = input_ids.shape[0] - reuse
+        logger.info(f"Session text generation completed. Reused {reuse} cached tokens, prefilled {result.prefill_tokens}")
+        return result
+
+    def delete_session(self, session_id: str) -> bool:
+        return self.sessions is not None and self.sessions.delete(session_id)
+
+    def session_stats(self) -> Dict[str, Any]:
+        return {"enabled": self.sessions is not None, **(self.sessions.stats() if self.sessions is not None else {})}
+
+    def generate(self, payload: TextGenerationPayload, prefix_key: Optional[str] = None) -> TextGenerationResult:
+        """Main method to generate text based on payload.
+
+        When `prefix_key` names a prefix registered with `register_prefix`,
+        its cached KV values are reused and only the rest of the prompt is prefilled.
+        A payload with a `session_id` continues that chat session instead.
+        """
         if payload is None:
             raise ValueError(NO_VALID_PAYLOAD.format(payload))
 
-        # Pre-process the input
-        messages = self._pre_process(payload)
+        if payload.session_id and self.sessions is not None:
+            return self._generate_in_session(payload)
+
+        # Pre-process the input, keeping the conversation history within the prompt token budget
+        prompt = self._prepare(payload)
+        payload, messages = prompt.payload, prompt.messages
         
-        # Generate text
-        outputs = self._generate(
-            messages, 
-            max_new_tokens=payload.max_new_tokens,
-            temperature=payload.temperature
-        )
+        # Generate text; the draft model needs the direct generate path
+        if prefix_key in self._prefix_cache or self.draft_model is not None:
+            outputs = self._generate_with_prefixes(
+                [messages],
+                [prefix_key],
+                max_new_tokens=payload.max_new_tokens,
+                temperature=payload.temperature
+            )[0]
+        else:
+            outputs = self._generate(
+                messages, 
+                max_new_tokens=payload.max_new_tokens,
+                temperature=payload.temperature
+            )
         
         # Post-process and return result
-        result = self._post_process(outputs, messages)
+        result = self._post_process(outputs, messages).model_copy(update={**prompt.usage, **outputs[0].get("speculation", {})})
         
         logger.info(f"Text generation completed. Output length: {result.output_length}")
         return result
+
+    def generate_batch(
+        self,
+        payloads: List[TextGenerationPayload],
+        prefix_keys: Optional[List[Optional[str]]] = None,
+    ) -> List[TextGenerationResult]:
+        """Generate text for several payloads in a single padded forward batch.
+
+        Each payload stops at its own `max_new_tokens` (or a terminator); the
+        batch runs until the longest one is done. All payloads share the
+        temperature of the first payload. `prefix_keys` optionally names a
+        registered prefix per payload.
+        """
+        if not payloads or any(payload is None for payload in payloads):
+            raise ValueError(NO_VALID_PAYLOAD.format(payloads))
+
+        prompts = [self._prepare(payload) for payload in payloads]
+        batch_messages = [prompt.messages for prompt in prompts]
+        limits = [payload.max_new_tokens for payload in payloads]
+        max_new_tokens = max(limits)
+        stopping_criteria = StoppingCriteriaList([_RowTokenLimits(limits)]) if len(set(limits)) > 1 else None
+
+        if prefix_keys and any(key in self._prefix_cache for key in prefix_keys):
+            outputs = self._generate_with_prefixes(
+                batch_messages,
+                prefix_keys,
+                max_new_tokens=max_new_tokens,
+                temperature=payloads[0].temperature,
+                stopping_criteria=stopping_criteria,
+            )
+        else:
+            outputs = self._generate(
+                batch_messages,
+                max_new_tokens=max_new_tokens,
+                temperature=payloads[0].temperature,
+                batch_size=len(batch_messages),
+                stopping_criteria=stopping_criteria,
+            )
+
+        results = [
+            self._post_process(output, prompt.messages).model_copy(update=prompt.usage)
+            for output, prompt in zip(outputs, prompts)
+        ]
+
+        logger.info(f"Batched text generation completed for {len(results)} payloads.")
+        return results
+
+    def _candidate_ids(self, low: int, high: int) -> Dict[int, Tuple[int, ...]]:
+        """Token ids of every integer answer in [low, high]"""
+        for value in range(low, high + 1):
+            if value not in self._score_candidates:
+                self._score_candidates[value] = tuple(self.tokenizer(str(value), add_special_tokens=False).input_ids)
+        return {value: self._score_candidates[value] for value in range(low, high + 1)}
+
+    def _branch_paths(
+        self, candidates: Dict[int, Tuple[int, ...]], first_log_probs: torch.Tensor
+    ) -> List[Tuple[int, ...]]:
+        """Token paths to extend with a branch forward, for one row's first-token distribution
+
+        Paths that are proper prefixes of a longer answer need their own
+        distribution; one row per longest such path covers all of its
+        prefixes. Paths whose first token is below SCORE_MIN_BRANCH_PROB are
+        pruned, except the most likely one.
+        """
+        internal_paths = {ids[:i] for ids in candidates.values() for i in range(1, len(ids))}
+        maximal_paths = [
+            path for path in internal_paths
+            if not any(other != path and other[:len(path)] == path for other in internal_paths)
+        ]
+        first_token_log_probs = {path[0]: first_log_probs[path[0]].item() for path in maximal_paths}
+        kept_first_tokens = {
+            token for token, log_prob in first_token_log_probs.items() if log_prob >= math.log(SCORE_MIN_BRANCH_PROB)
+        }
+        if first_token_log_probs:
+            kept_first_tokens.add(max(first_token_log_probs, key=first_token_log_probs.get))
+        return sorted(path for path in maximal_paths if path[0] in kept_first_tokens)
+
+    def _score_branches(
+        self,
+        branches: List[Tuple[int, Tuple[int, ...]]],
+        distributions: List[Dict[Tuple[int, ...], torch.Tensor]],
+        cache: DynamicCache,
+        attention_mask: torch.Tensor,
+        last_positions: torch.Tensor,
+    ) -> None:
+        """Run every (row, path) branch in one forward and record the distribution after each path prefix"""
+        device = self.model.device
+        width = max(len(path) for _, path in branches)
+        rows = torch.tensor([row for row, _ in branches], device=device)
+        branch_ids = torch.full((len(branches), width), self.tokenizer.pad_token_id, dtype=torch.long, device=device)
+        for index, (_, path) in enumerate(branches):
+            branch_ids[index, :len(path)] = torch.tensor(path, device=device)
+
+        # Right padding only follows the real tokens, so causal attention never sees it
+        cache.batch_select_indices(rows)
+        logits = self.model(
+            input_ids=branch_ids,
+            attention_mask=torch.cat([attention_mask[rows], torch.ones_like(branch_ids)], dim=1),
+            position_ids=last_positions[rows, None] + 1 + torch.arange(width, device=device),
+            past_key_values=cache,
+            use_cache=True,
+        ).logits.float()
+        for index, (row, path) in enumerate(branches):
+            for i in range(len(path)):
+                distributions[row][path[:i + 1]] = torch.log_softmax(logits[index, i], dim=-1).cpu()
+
+    def _score_result(
+        self, candidates: Dict[int, Tuple[int, ...]], distributions: Dict[Tuple[int, ...], torch.Tensor]
+    ) -> TextScoreResult:
+        """Turn one row's token-path distributions into a TextScoreResult"""
+        log_probs: Dict[int, float] = {}
+        for value, ids in candidates.items():
+            if any(ids[:i] not in distributions for i in range(len(ids))):
+                log_probs[value] = -math.inf
+                continue
+            log_prob = sum(distributions[ids[:i]][ids[i]].item() for i in range(len(ids)))
+            extensions = {
+                other[len(ids)] for other in candidates.values() if len(other) > len(ids) and other[:len(ids)] == ids
+            }
+            if extensions and ids in distributions:
+                extension_mass = torch.logsumexp(distributions[ids][list(extensions)], dim=0).exp().item()
+                log_prob += math.log(max(1.0 - extension_mass, 1e-12))
+            log_probs[value] = log_prob
+
+        values = torch.tensor(list(log_probs.keys()), dtype=torch.float)
+        weights = torch.tensor(list(log_probs.values()), dtype=torch.float)
+        valid_mass = torch.logsumexp(weights, dim=0).exp().item()
+        probabilities = torch.softmax(weights, dim=0)
+        best = int(torch.argmax(probabilities))
+
+        return TextScoreResult(
+            expected_score=round(float((probabilities * values).sum()), 2),
+            most_likely_score=int(values[best]),
+            confidence=round(float(probabilities[best]), 4),
+            valid_mass=round(valid_mass, 4),
+            model=self.model_id,
+        )
+
+    def score(
+        self,
+        payload: TextGenerationPayload,
+        prefix_key: Optional[str] = None,
+        low: int = 0,
+        high: int = 100,
+    ) -> TextScoreResult:
+        """Score a prompt from the model's distribution over numeric answers.
+
+        The prompt is prefilled once and the next-token distribution is read
+        instead of sampling text. Answers spanning several tokens (Gemma
+        splits numbers into digits) are completed with one extra batched
+        forward over the continuation paths of the likely first tokens. An
+        answer's probability includes the chance that it is not extended into
+        a longer in-range number. Probabilities are renormalized over
+        [low, high].
+        """
+        if payload is None:
+            raise ValueError(NO_VALID_PAYLOAD.format(payload))
+        return self.score_batch([payload], [prefix_key], low=low, high=high)[0]
+
+    def score_batch(
+        self,
+        payloads: List[TextGenerationPayload],
+        prefix_keys: Optional[List[Optional[str]]] = None,
+        low: int = 0,
+        high: int = 100,
+    ) -> List[TextScoreResult]:
+        """Score several prompts as in `score` with one padded prefill and one branch forward for all of them.
+
+        `prefix_keys` optionally names a registered prefix per payload; rows
+        are laid out by `_prefix_batch`.
+        """
+        if not payloads or any(payload is None for payload in payloads):
+            raise ValueError(NO_VALID_PAYLOAD.format(payloads))
+
+        candidates = self._candidate_ids(low, high)
+        batch_messages = [self._pre_process(payload) for payload in payloads]
+        input_ids, attention_mask, cache, cached_length = self._prefix_batch(
+            batch_messages, prefix_keys or [None] * len(payloads)
+        )
+        cache = cache if cache is not None else DynamicCache()
+        # Positions skip the padding, so every row sees the positions it would have alone
+        positions = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+
+        with torch.no_grad():
+            logits = self.model(
+                input_ids=input_ids[:, cached_length:],
+                attention_mask=attention_mask,
+                position_ids=positions[:, cached_length:],
+                past_key_values=cache,
+                use_cache=True,
+            ).logits
+            # Per row: token path -> log-probabilities of the token that follows it
+            first_log_probs = torch.log_softmax(logits[:, -1].float(), dim=-1).cpu()
+            distributions = [{(): row_log_probs} for row_log_probs in first_log_probs]
+            branches = [
+                (row, path)
+                for row, row_log_probs in enumerate(first_log_probs)
+                for path in self._branch_paths(candidates, row_log_probs)
+            ]
+            if branches:
+                self._score_branches(branches, distributions, cache, attention_mask, positions[:, -1])
+
+        results = [self._score_result(candidates, row_distributions) for row_distributions in distributions]
+        expected_scores = [result.expected_score for result in results]
+        logger.info(f"Logit scoring completed for {len(results)} prompts. Expected scores: {expected_scores}")
+        return results
+
+    @staticmethod
+    def _stream_metrics(token_times: List[float], started: float) -> Dict[str, Any]:
+        """Time to first token and inter-token latencies of a stream, from its per-token arrival times"""
+        gaps = [later - earlier for earlier, later in zip(token_times, token_times[1:])]
+        return {
+            "time_to_first_token_ms": round((token_times[0] - started) * 1000, 2) if token_times else None,
+            "mean_inter_token_latency_ms": round(statistics.mean(gaps) * 1000, 2) if gaps else None,
+            "max_inter_token_latency_ms": round(max(gaps) * 1000, 2) if gaps else None,
+            "generated_tokens": len(token_times),
+            "total_time_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def stream(
+        self, payload: TextGenerationPayload, cancel: Optional[threading.Event] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """Generate text and yield it incrementally.
+
+        Yields `{"event": "token", "text": ...}` chunks as the streamer decodes
+        them, then one `{"event": "done", ...}` event carrying the full
+        TextGenerationResult and latency metrics: time to first token and
+        inter-token latency, measured per generated token. A payload with a
+        `session_id` continues that chat session as in `generate`.
+        Generation stops at the next token once `cancel` is set or the
+        stream is closed.
+        """
+        if payload is None:
+            raise ValueError(NO_VALID_PAYLOAD.format(payload))
+
+        in_session = bool(payload.session_id) and self.sessions is not None
+        prompt, session, reuse, cache = self._prepare_turn(payload, in_session)
+        payload, messages, input_ids = prompt.payload, prompt.messages, prompt.input_ids[None]
+        streamer = _TimedTextStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        errors: List[Exception] = []
+        # (output ids, speculation metrics) of the generate call
+        generated: List[Tuple[torch.Tensor, Dict[str, Any]]] = []
+        turn = _SessionTurn(lambda: self._restore_session(session, reuse, cache))
+        cancel = cancel if cancel is not None else threading.Event()
+
+        def _run():
+            try:
+                generated.append(self._run_generate(
+                    input_ids,
+                    torch.ones_like(input_ids),
+                    past_key_values=cache,
+                    max_new_tokens=payload.max_new_tokens,
+                    temperature=payload.temperature,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_Cancelled(cancel)]),
+                ))
+            except Exception as e:
+                logger.error(f"Error during streamed text generation: {str(e)}")
+                errors.append(e)
+                streamer.end()
+            finally:
+                turn.stop()
+
+        started = time.perf_counter()
+        thread = threading.Thread(target=_run, name="text-generation-stream", daemon=True)
+        thread.start()
+
+        try:
+            chunks = []
+            for text in streamer:
+                if text:
+                    chunks.append(text)
+                    yield {"event": "token", "text": text}
+            thread.join()
+            if errors:
+                raise errors[0]
+
+            output_ids, speculation = generated[0]
+            metrics = {**self._stream_metrics(streamer.token_times, started), **speculation}
+            generated_text = "".join(chunks).strip()
+            result = self._post_process(self._as_pipeline_output(messages, generated_text), messages)
+            result = result.model_copy(update={**prompt.usage, **speculation})
+            if in_session:
+                self._save_session(payload, generated_text, output_ids[0], cache, prompt.summary)
+                turn.saved = True
+                result.session_id = payload.session_id
+                result.cached_tokens = reuse
+                result.prefill_tokens = input_ids.shape[1] - reuse
+        finally:
+            # Also reached when the reader stops early (client disconnect)
+            cancel.set()
+            turn.stop()
+
+        logger.info(f"Streamed text generation completed. TTFT: {metrics['time_to_first_token_ms']} ms, "
+                    f"mean ITL: {metrics['mean_inter_token_latency_ms']} ms")
+        yield {"event": "done", "result": result.model_dump(), "metrics": metrics}
@@ -0,0 +1,52 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+import collections
+import threading
+
+from huggingfastapi.core.config import TOKENIZER_PREFETCH, TOKENIZER_THREADS
+
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_tokenizer_pool() -> ThreadPoolExecutor:
+    """Process-wide pool for tokenization and padding
+
+    Fast (Rust) tokenizers release the GIL while batch encoding, and torch
+    releases it while a forward pass runs, so work submitted here overlaps
+    with model execution on the request and scheduler threads.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=TOKENIZER_THREADS, thread_name_prefix="tokenizer")
+        return _pool
+
+
+def submit(fn: Callable[..., R], *args, **kwargs) -> Future:
+    return get_tokenizer_pool().submit(fn, *args, **kwargs)
+
+
+def prefetched(items: Iterable[T], prepare: Callable[[T], R], depth: int = TOKENIZER_PREFETCH) -> Iterator[R]:
+    """Yield `prepare(item)` in order, preparing up to `depth` items ahead on the tokenizer pool
+
+    While the caller runs the model on one prepared item, the next ones are
+    tokenized in the background. Pending work is cancelled if the caller
+    stops early.
+    """
+    pending: collections.deque = collections.deque()
+    items = iter(items)
+    try:
+        for item in items:
+            pending.append(submit(prepare, item))
+            if len(pending) > depth:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,10 +1,18 @@
 import typing as t
+from concurrent.futures import ThreadPoolExecutor
 from loguru import logger
 from pathlib import Path
+import hashlib
+import json
+import shutil
+import time
 import torch
+from transformers import DynamicCache
 from transformers import PreTrainedModel
 from transformers import PreTrainedTokenizer
 
+from huggingfastapi.core.config import MODEL_ARTIFACT_VERIFY
+
 
 class ModelLoader:
     """ModelLoader
@@ -12,26 +20,44 @@ class ModelLoader:
        Download occurs only when model is not located in the local model directory
        If model exists in local directory, load.
 
+    The local copy is a safetensors artifact, so later loads memory-map it.
+    With `model_kwargs` (e.g. a quantization config) the model is converted
+    once while downloading and the converted weights are what gets saved,
+    under a `-<variant>` directory. A manifest of file sizes, mtimes and
+    sha256 hashes, written last, marks the artifact complete and is checked
+    on every load; a damaged artifact is rebuilt. `verify="size"` only
+    re-hashes files whose mtime changed, `"hash"` re-hashes every file.
     """
 
+    MANIFEST = "manifest.json"
+
     def __init__(
         self,
         model_name: str,
         model_directory: str,
         tokenizer_loader: PreTrainedTokenizer,
         model_loader: PreTrainedModel,
+        model_kwargs: t.Optional[t.Dict[str, t.Any]] = None,
+        variant: t.Optional[str] = None,
+        verify: str = MODEL_ARTIFACT_VERIFY,
     ):
 
         self.model_name = Path(model_name)
         self.model_directory = Path(model_directory)
         self.model_loader = model_loader
         self.tokenizer_loader = tokenizer_loader
+        self.model_kwargs = model_kwargs or {}
+        self.variant = variant
+        self.verify = verify
 
-        self.save_path = self.model_directory / self.model_name
+        self.save_path = self.artifact_path(model_name, model_directory, variant)
 
         if not self.save_path.exists():
             logger.debug(f"[+] {self.save_path} does not exit!")
-            self.save_path.mkdir(parents=True, exist_ok=True)
+            self.__download_model()
+        elif not self.__verify_artifact():
+            logger.warning(f"[+] {self.save_path} failed verification, rebuilding it")
+            shutil.rmtree(self.save_path)
             self.__download_model()
 
         self.tokenizer, self.model = self.__load_model()
@@ -39,29 +65,105 @@ class ModelLoader:
     def __repr__(self):
         return f"{self.__class__.__name__}(model={self.save_path})"
 
+    @staticmethod
+    def artifact_path(model_name: str, model_directory: str, variant: t.Optional[str] = None) -> Path:
+        if variant is None:
+            return Path(model_directory) / Path(model_name)
+        # Absolute source paths are kept under the model directory too
+        return Path(model_directory) / f"{str(model_name).lstrip('/')}-{variant}"
+
+    @classmethod
+    def is_complete(cls, model_name: str, model_directory: str, variant: t.Optional[str] = None) -> bool:
+        return (cls.artifact_path(model_name, model_directory, variant) / cls.MANIFEST).exists()
+
     # Download model from HuggingFace
     def __download_model(self) -> None:
 
         logger.debug(f"[+] Downloading {self.model_name}")
         tokenizer = self.tokenizer_loader.from_pretrained(f"{self.model_name}")
-        model = self.model_loader.from_pretrained(f"{self.model_name}")
+        model = self.model_loader.from_pretrained(f"{self.model_name}", **self.model_kwargs)
+
+        # Written next to the final path and renamed into place, so a crash never leaves a partial artifact
+        staging = self.save_path.with_name(self.save_path.name + ".partial")
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
 
         logger.debug(f"[+] Saving {self.model_name} to {self.save_path}")
-        tokenizer.save_pretrained(f"{self.save_path}")
-        model.save_pretrained(f"{self.save_path}")
+        tokenizer.save_pretrained(f"{staging}")
+        model.save_pretrained(f"{staging}", safe_serialization=True)
+        self.__write_manifest(staging)
+        staging.rename(self.save_path)
 
         logger.debug("[+] Process completed")
 
+    def __write_manifest(self, directory: Path) -> None:
+        files = sorted(path for path in directory.rglob("*") if path.is_file() and path.name != self.MANIFEST)
+        with ThreadPoolExecutor(max_workers=min(8, len(files) or 1)) as pool:
+            hashes = list(pool.map(_sha256, files))
+        manifest = {
+            "model_name": str(self.model_name),
+            "variant": self.variant,
+            "files": {
+                str(path.relative_to(directory)): {
+                    "size": path.stat().st_size, "mtime_ns": path.stat().st_mtime_ns, "sha256": digest
+                }
+                for path, digest in zip(files, hashes)
+            },
+        }
+        (directory / self.MANIFEST).write_text(json.dumps(manifest, indent=2))
+
+    def __verify_artifact(self) -> bool:
+        manifest_path = self.save_path / self.MANIFEST
+        if not manifest_path.exists():
+            if not any(self.save_path.iterdir()):
+                return False
+            # Copies saved before manifests existed are trusted once and hashed from now on
+            logger.info(f"[+] Writing manifest for existing {self.save_path}")
+            self.__write_manifest(self.save_path)
+            return True
+        if self.verify == "off":
+            return True
+
+        manifest = json.loads(manifest_path.read_text())
+        files = {self.save_path / name: entry for name, entry in manifest["files"].items()}
+        if any(not path.is_file() or path.stat().st_size != entry["size"] for path, entry in files.items()):
+            return False
+        if self.verify == "size":
+            # Files untouched since their hash was recorded are trusted; only changed ones are hashed again
+            files = {path: entry for path, entry in files.items() if path.stat().st_mtime_ns != entry.get("mtime_ns")}
+            if not files:
+                return True
+
+        started = time.perf_counter()
+        # hashlib releases the GIL on large buffers, so shards hash in parallel
+        with ThreadPoolExecutor(max_workers=min(8, len(files) or 1)) as pool:
+            hashes = list(pool.map(_sha256, files))
+        logger.debug(f"[+] Verified {len(files)} files in {time.perf_counter() - started:.1f}s")
+        if not all(digest == entry["sha256"] for digest, entry in zip(hashes, files.values())):
+            return False
+        # Record the mtimes the hashes were verified at, so the next load can skip them
+        for path, entry in files.items():
+            entry["mtime_ns"] = path.stat().st_mtime_ns
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+        return True
+
     # Load model
     def __load_model(self) -> t.Tuple:
 
         logger.debug(f"[+] Loading model from {self.save_path}")
         tokenizer = self.tokenizer_loader.from_pretrained(f"{self.save_path}")
-        # Check if GPU is available
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(device)
-        logger.info(f"[+] Model loaded in {device} complete")
-        model = self.model_loader.from_pretrained(f"{self.save_path}").to(device)
+        # Quantization settings are stored in the saved config; only placement options apply on load
+        load_kwargs = {key: value for key, value in self.model_kwargs.items() if key != "quantization_config"}
+        if "device_map" in load_kwargs:
+            model = self.model_loader.from_pretrained(f"{self.save_path}", **load_kwargs)
+            logger.info(f"[+] Model loaded with device_map={load_kwargs['device_map']}")
+        else:
+            # Check if GPU is available
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(device)
+            logger.info(f"[+] Model loaded in {device} complete")
+            model = self.model_loader.from_pretrained(f"{self.save_path}", **load_kwargs).to(device)
 
         logger.debug("[+] Loading completed")
         return tokenizer, model
@@ -74,3 +176,85 @@ class ModelLoader:
             Tuple: tokenizer, model
         """
         return self.tokenizer, self.model
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(8 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def common_prefix_length(first: torch.Tensor, second: torch.Tensor) -> int:
+    """Number of leading token ids shared by two 1-D id tensors"""
+    length = min(first.shape[-1], second.shape[-1])
+    if length == 0:
+        return 0
+    mismatch = (first[:length].to(second.device) != second[:length]).nonzero()
+    return int(mismatch[0]) if len(mismatch) else length
+
+
+def stack_kv_caches(caches: t.List[t.Optional[DynamicCache]], total_length: int) -> t.Optional[DynamicCache]:
+    """Stack single-sequence KV caches into one batch cache
+
+    Each cache is left-padded with zeros up to `total_length`; callers must
+    mask the padded positions out with the attention mask. Rows without a
+    cache are fully padded. Returns None when no row has a cache.
+    """
+    reference = next((cache for cache in caches if cache is not None and cache.get_seq_length() > 0), None)
+    if reference is None or total_length == 0:
+        return None
+    if len(caches) == 1 and reference.get_seq_length() == total_length:
+        return reference
+
+    stacked = []
+    for layer_idx in range(len(reference)):
+        ref_key, ref_value = reference[layer_idx]
+        keys, values = [], []
+        for cache in caches:
+            key = ref_key.new_zeros((1, ref_key.shape[1], total_length, ref_key.shape[3]))
+            value = ref_value.new_zeros((1, ref_value.shape[1], total_length, ref_value.shape[3]))
+            length = cache.get_seq_length() if cache is not None else 0
+            if length:
+                key[:, :, total_length - length:] = cache[layer_idx][0]
+                value[:, :, total_length - length:] = cache[layer_idx][1]
+            keys.append(key)
+            values.append(value)
+        stacked.append((torch.cat(keys, dim=0), torch.cat(values, dim=0)))
+
+    return DynamicCache.from_legacy_cache(tuple(stacked))
+
+
+def pad_kv_cache_left(cache: DynamicCache, total_length: int) -> DynamicCache:
+    """Left-pad every layer of a (batched) KV cache with zeros up to `total_length`"""
+    padding = total_length - cache.get_seq_length()
+    if padding <= 0:
+        return cache
+
+    padded = []
+    for key, value in cache:
+        key_pad = key.new_zeros((key.shape[0], key.shape[1], padding, key.shape[3]))
+        value_pad = value.new_zeros((value.shape[0], value.shape[1], padding, value.shape[3]))
+        padded.append((torch.cat([key_pad, key], dim=2), torch.cat([value_pad, value], dim=2)))
+    return DynamicCache.from_legacy_cache(tuple(padded))
+
+
+def concat_kv_caches(caches: t.List[DynamicCache]) -> DynamicCache:
+    """Concatenate KV caches of equal length along the batch dimension"""
+    if len(caches) == 1:
+        return caches[0]
+    layers = zip(*[list(cache) for cache in caches])
+    return DynamicCache.from_legacy_cache(tuple(
+        (torch.cat([key for key, _ in layer], dim=0), torch.cat([value for _, value in layer], dim=0))
+        for layer in layers
+    ))
+
+
+def trim_kv_cache_left(cache: DynamicCache, length: int) -> DynamicCache:
+    """Drop the first `length` positions of every layer, e.g. padding no row attends to anymore"""
+    if length <= 0:
+        return cache
+    return DynamicCache.from_legacy_cache(tuple(
+        (key[:, :, length:].contiguous(), value[:, :, length:].contiguous()) for key, value in cache
+    ))
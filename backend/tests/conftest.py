@@ -1,4 +1,7 @@
+import string
+
 import pytest
+import torch
 from starlette.config import environ
 from starlette.testclient import TestClient
 
@@ -13,4 +16,53 @@ from huggingfastapi.main import get_app  # noqa: E402
 def test_client():
     app = get_app()
     with TestClient(app) as test_client:
+        # Models load in the background; tests exercise them once loaded
+        app.state.model_registry.wait()
         yield test_client
+
+
+@pytest.fixture()
+def tiny_text_generation_model(monkeypatch):
+    """TextGenerationModel around a random two-layer Gemma 2 and a character-level tokenizer
+
+    The generation config keeps Gemma 2's default "hybrid" cache
+    implementation, so tests see the same generate() behaviour as the real
+    checkpoint.
+    """
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+    from transformers import Gemma2Config, Gemma2ForCausalLM, PreTrainedTokenizerFast
+
+    from huggingfastapi.services import text_generation
+
+    specials = ["<pad>", "<eos>", "<bos>", "<unk>", "<start_of_turn>", "<end_of_turn>", "<|eot_id|>"]
+    vocab = {token: i for i, token in enumerate(specials + list(string.printable))}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex("."), "isolated")
+    backend.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, bos_token="<bos>", eos_token="<eos>", pad_token="<pad>", unk_token="<unk>",
+        additional_special_tokens=specials[4:],
+    )
+    tokenizer.chat_template = (
+        "{{ bos_token }}{% for m in messages %}<start_of_turn>{{ 'model' if m['role'] == 'assistant' else m['role'] }}\n"
+        "{{ m['content'] }}<end_of_turn>\n"
+        "{% endfor %}{% if add_generation_prompt %}<start_of_turn>model\n{% endif %}"
+    )
+
+    torch.manual_seed(0)
+    model = Gemma2ForCausalLM(Gemma2Config(
+        vocab_size=len(vocab), hidden_size=32, intermediate_size=64, num_hidden_layers=2, num_attention_heads=2,
+        num_key_value_heads=1, head_dim=16, sliding_window=4096, pad_token_id=0, eos_token_id=1, bos_token_id=2,
+    )).eval()
+    model.generation_config.cache_implementation = "hybrid"
+
+    class _Loader:
+        def __init__(self, **kwargs):
+            pass
+
+        def retrieve(self):
+            return tokenizer, model
+
+    monkeypatch.setattr(text_generation, "ModelLoader", _Loader)
+    monkeypatch.setattr(text_generation, "BitsAndBytesConfig", lambda **kwargs: None)
+    return text_generation.TextGenerationModel("tiny-gemma2")
@@ -0,0 +1,80 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+from huggingfastapi.api.routes import bulk_evaluation
+from huggingfastapi.models.prediction import EvaluationResult
+
+
+class _Evaluator:
+    rubric_version = "test"
+
+    def __init__(self):
+        self.threads = set()
+
+    def evaluate_prompt(self, prompt: str) -> EvaluationResult:
+        self.threads.add(threading.current_thread().name)
+        return EvaluationResult(
+            overall_score=50.0,
+            clarity=50.0,
+            specificity=50.0,
+            ethics=50.0,
+            effectiveness=50.0,
+            bias_risk=10.0,
+            suggestions=[],
+            strengths=[],
+            weaknesses=[],
+            improved_prompt=prompt,
+            evaluation_details={},
+            sources_used=[],
+            timestamp="2025-07-25T10:30:00",
+        )
+
+
+@pytest.fixture()
+def bulk_client(monkeypatch):
+    monkeypatch.setattr(bulk_evaluation, "BULK_EVAL_WINDOW", 4)
+    app = FastAPI()
+    app.include_router(bulk_evaluation.router, prefix="/api/v1")
+    # No model registry, cache or single flight: every prompt goes straight to the evaluator
+    app.state.goto_prompt_evaluator = _Evaluator()
+    app.state.text_goto_model = SimpleNamespace(model_id="tiny")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_rows_read_before_an_undecodable_byte_are_still_reported(bulk_client, monkeypatch) -> None:
+    parse = bulk_evaluation.iter_records
+
+    def iter_records(stream, fmt):
+        # The decoder reads ahead, so make the bad byte surface right after row 9
+        for record in parse(stream, fmt):
+            yield record
+            if record.index == 9:
+                raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    monkeypatch.setattr(bulk_evaluation, "iter_records", iter_records)
+    body = "".join(json.dumps({"id": i, "prompt": f"Tulis puisi nomor {i}"}) + "\n" for i in range(20))
+
+    response = bulk_client.post("/api/v1/evaluate-bulk", content=body.encode("utf-8"), headers={"token": "example_key"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == 200
+    assert [line["index"] for line in lines[:-2]] == list(range(10))
+    assert all(line["success"] for line in lines[:-2])
+    assert lines[-2]["success"] is False and "invalid start byte" in lines[-2]["error"]
+    assert lines[-1]["summary"]["total"] == lines[-1]["summary"]["succeeded"] == 10
+
+
+def test_goto_evaluations_run_on_the_bulk_executor(bulk_client) -> None:
+    body = "".join(json.dumps({"prompt": f"Tulis puisi nomor {i}"}) + "\n" for i in range(6))
+
+    response = bulk_client.post("/api/v1/evaluate-bulk", content=body.encode("utf-8"), headers={"token": "example_key"})
+
+    assert json.loads(response.text.splitlines()[-1])["summary"]["succeeded"] == 6
+    threads = bulk_client.app.state.goto_prompt_evaluator.threads
+    assert threads and all(name.startswith("bulk-goto") for name in threads)
@@ -39,3 +39,35 @@ def test_ai_detection(test_client) -> None:
     assert isinstance(data["probability"], float)
     assert data["label"] in [0, 1]
     assert data["prediction"] in ["AI Generated", "Human Generated"]
+
+
+def test_ai_detection_batch(test_client) -> None:
+    texts = ["Short text.", "A somewhat longer text to check if it's AI generated or human written."]
+    response = test_client.post(
+        "/api/v1/detect-ai/batch",
+        json={"items": [{"text": text} for text in texts]},
+        headers={"token": "example_key"},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(texts)
+    for data in results:
+        assert isinstance(data["probability"], float)
+        assert data["label"] in [0, 1]
+        assert data["model"] == "desklib/ai-text-detector-v1.01"
+
+
+def test_ai_detection_long(test_client) -> None:
+    text = "This essay is long enough to need more than one detection window. " * 200
+    response = test_client.post(
+        "/api/v1/detect-ai/long",
+        json={"text": text},
+        headers={"token": "example_key"},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["window_count"] > 1
+    assert len(data["spans"]) == data["window_count"]
+    assert data["spans"][0]["start_char"] == 0
+    assert data["spans"][-1]["end_char"] == len(text.rstrip())
+    assert data["probability"] <= data["max_probability"]
@@ -0,0 +1,209 @@
+import json
+from concurrent.futures import Future
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from starlette.datastructures import State
+from starlette.testclient import TestClient
+
+from huggingfastapi.api.routes import prompt_evaluation, text_generation
+from huggingfastapi.models.prediction import TextGenerationResult
+from huggingfastapi.services.evaluation_cache import EvaluationCache
+from huggingfastapi.services.nlp import GoToPromptEvaluator
+from huggingfastapi.services.single_flight import SingleFlight
+
+HEADERS = {"token": "example_key"}
+
+
+class _StreamingModel:
+    """Text model whose stream yields two tokens; evaluator sub-tasks answer "80" or a one-item list"""
+
+    model_id = "fake-goto"
+
+    def __init__(self, fail=False, release=None):
+        self.fail = fail
+        self.release = release
+        self.payloads = []
+        self.generate_calls = 0
+
+    def stream(self, payload, cancel=None):
+        self.payloads.append(payload)
+        self.cancel = cancel
+        yield {"event": "token", "text": "Halo"}
+        if self.fail:
+            raise RuntimeError("CUDA out of memory")
+        yield {"event": "token", "text": " dunia"}
+        yield {"event": "done", "result": {"generated_text": "Halo dunia"}, "generated_tokens": 2}
+
+    def generate(self, payload, prefix_key=None):
+        self.generate_calls += 1
+        if self.release is not None:
+            self.release.wait(5)
+        return SimpleNamespace(generated_text="80" if payload.max_new_tokens <= 8 else '["poin"]')
+
+
+def _done(value) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def _evaluator(model) -> GoToPromptEvaluator:
+    return GoToPromptEvaluator(model, batched=False, prefix_cache=False, score_mode="generate", parallel=False)
+
+
+@pytest.fixture()
+def app():
+    app = FastAPI()
+    app.include_router(text_generation.router, prefix="/api/v1")
+    app.include_router(prompt_evaluation.router, prefix="/api/v1")
+    app.state.text_goto_model = _StreamingModel()
+    app.state.goto_prompt_evaluator = _evaluator(app.state.text_goto_model)
+    app.state.evaluation_cache = EvaluationCache(db_path=None)
+    app.state.single_flight = SingleFlight()
+    return app
+
+
+@pytest.mark.parametrize("path", ["/api/v1/generate-text/stream", "/api/v1/chat/stream"])
+def test_text_stream_emits_tokens_then_done(app, path) -> None:
+    with TestClient(app) as client:
+        response = client.post(path, json={"text": "Apa kabar?"}, headers=HEADERS)
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [name for name, _ in _events(response.text)] == ["token", "token", "done"]
+    assert _events(response.text)[-1][1]["generated_tokens"] == 2
+    system_message = app.state.text_goto_model.payloads[0].system_message
+    assert (system_message == text_generation.CHAT_SYSTEM_MESSAGE) is path.endswith("/chat/stream")
+
+
+def test_text_stream_cancels_generation_when_the_client_disconnects() -> None:
+    model = _StreamingModel()
+    events = text_generation._sse_events(model, text_generation.TextGenerationPayload(text="Apa kabar?"))
+
+    assert next(events).startswith("event: token")
+    assert not model.cancel.is_set()
+    events.close()
+    assert model.cancel.is_set()
+
+
+@pytest.mark.parametrize("draft_model_id,path", [(None, "scheduler"), ("tiny-draft", "model")])
+def test_generate_text_bypasses_the_scheduler_when_a_draft_model_is_loaded(app, draft_model_id, path) -> None:
+    def generate(payload):
+        taken.append("model")
+        return TextGenerationResult(
+            generated_text="Halo", full_conversation=[], model="fake", input_length=1, output_length=1
+        )
+
+    def submit(payload):
+        taken.append("scheduler")
+        return _done(generate(payload))
+
+    taken = []
+    app.state.text_goto_model = SimpleNamespace(draft_model_id=draft_model_id, generate=generate)
+    app.state.generation_scheduler = SimpleNamespace(submit=submit)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/generate-text", json={"text": "Apa kabar?"}, headers=HEADERS)
+
+    assert response.json()["generated_text"] == "Halo"
+    assert taken[0] == path
+
+
+def test_text_stream_failure_ends_with_an_error_event(app) -> None:
+    app.state.text_goto_model.fail = True
+    with TestClient(app) as client:
+        response = client.post("/api/v1/generate-text/stream", json={"text": "Apa kabar?"}, headers=HEADERS)
+
+    events = _events(response.text)
+    assert [name for name, _ in events] == ["token", "error"]
+    assert "CUDA out of memory" in events[-1][1]["detail"]
+
+
+def test_goto_stream_emits_scores_fields_then_done_and_replays_from_cache(app) -> None:
+    path = "/api/v1/evaluate-goto/stream"
+    with TestClient(app) as client:
+        live = _events(client.post(path, json={"prompt": "Tulis puisi"}, headers=HEADERS).text)
+        replay = _events(client.post(path, json={"prompt": "Tulis  puisi"}, headers=HEADERS).text)
+
+    assert [name for name, _ in live] == ["score"] * 5 + ["field"] * 4 + ["done"]
+    assert [data["name"] for _, data in live[:5]] == ["clarity", "specificity", "ethics", "effectiveness", "bias_risk"]
+    assert live[-1][1]["cached"] is False and live[-1][1]["result"]["success"] is True
+    assert [name for name, _ in replay] == [name for name, _ in live]
+    assert replay[-1][1]["cached"] is True
+    assert replay[-1][1]["result"]["overall_score"] == live[-1][1]["result"]["overall_score"]
+
+
+def test_identical_goto_streams_share_one_evaluation() -> None:
+    release = threading.Event()
+    model = _StreamingModel(release=release)
+    evaluator = _evaluator(model)
+    state = State({"evaluation_cache": None, "single_flight": SingleFlight()})
+    key = EvaluationCache.make_key("Tulis puisi", "goto", model.model_id, evaluator.rubric_version)
+    bodies = [None, None]
+
+    def stream(slot: int) -> None:
+        bodies[slot] = "".join(prompt_evaluation._goto_sse_events(state, key, evaluator, "Tulis puisi"))
+
+    leader = threading.Thread(target=stream, args=(0,))
+    leader.start()
+    while model.generate_calls == 0:
+        time.sleep(0.01)
+    follower = threading.Thread(target=stream, args=(1,))
+    follower.start()
+    while state.single_flight.stats()["coalesced"] == 0:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    live, coalesced = _events(bodies[0]), _events(bodies[1])
+    assert model.generate_calls == 9
+    assert [name for name, _ in coalesced] == [name for name, _ in live]
+    assert coalesced[-1][1]["coalesced"] is True
+    assert coalesced[-1][1]["result"]["overall_score"] == live[-1][1]["result"]["overall_score"]
+
+
+class _SlowFieldsModel(_StreamingModel):
+    """Answers the scores at once and holds the qualitative fields until released"""
+
+    def generate(self, payload, prefix_key=None):
+        if payload.max_new_tokens > 8:
+            return super().generate(payload, prefix_key)
+        self.generate_calls += 1
+        return SimpleNamespace(generated_text="80")
+
+
+def test_goto_stream_settles_followers_and_cache_after_the_leader_disconnects() -> None:
+    release = threading.Event()
+    model = _SlowFieldsModel(release=release)
+    evaluator = _evaluator(model)
+    state = State({"evaluation_cache": EvaluationCache(db_path=None), "single_flight": SingleFlight()})
+    key = EvaluationCache.make_key("Tulis puisi", "goto", model.model_id, evaluator.rubric_version)
+    bodies = []
+
+    leader = prompt_evaluation._goto_sse_events(state, key, evaluator, "Tulis puisi")
+    assert next(leader).startswith("event: score")
+    follower = threading.Thread(
+        target=lambda: bodies.append("".join(prompt_evaluation._goto_sse_events(state, key, evaluator, "Tulis puisi")))
+    )
+    follower.start()
+    while state.single_flight.stats()["coalesced"] == 0:
+        time.sleep(0.01)
+    leader.close()
+    release.set()
+    follower.join(5)
+
+    coalesced = _events(bodies[0])
+    assert [name for name, _ in coalesced][-1] == "done"
+    assert coalesced[-1][1]["coalesced"] is True
+    assert state.evaluation_cache.get(key) is not None
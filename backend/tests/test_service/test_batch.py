@@ -0,0 +1,32 @@
+import json
+
+from huggingfastapi.batch import completed_indices, iter_rows, merge_parts
+
+
+def test_completed_indices_drops_torn_last_line(tmp_path) -> None:
+    part = tmp_path / "part-000.jsonl"
+    part.write_text('{"index": 0}\n{"index": 2}\n{"index": 4, "res')
+
+    assert completed_indices(part) == {0, 2}
+    assert part.read_text() == '{"index": 0}\n{"index": 2}\n'
+
+
+def test_merge_parts_restores_input_order(tmp_path) -> None:
+    parts = [tmp_path / "part-000.jsonl", tmp_path / "part-001.jsonl"]
+    parts[0].write_text("".join(json.dumps({"index": i}) + "\n" for i in (0, 2, 4)))
+    parts[1].write_text("".join(json.dumps({"index": i}) + "\n" for i in (1, 3)))
+    output = tmp_path / "out.jsonl"
+
+    assert merge_parts(parts, output) == 5
+    assert [json.loads(line)["index"] for line in output.read_text().splitlines()] == [0, 1, 2, 3, 4]
+
+
+def test_iter_rows_reads_jsonl_fields(tmp_path) -> None:
+    source = tmp_path / "in.jsonl"
+    source.write_text('{"id": 7, "prompt": "Tulis puisi"}\n\n{"prompt": "Tanpa id"}\nnot json\n')
+
+    assert list(iter_rows(source, "prompt", "id")) == [
+        (0, "7", "Tulis puisi"),
+        (1, None, "Tanpa id"),
+        (2, None, None),
+    ]
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+
+from huggingfastapi.services.bulk import iter_records
+
+
+def test_ndjson_records_keep_input_order_and_flag_bad_lines() -> None:
+    data = b'{"id": 1, "prompt": " Tulis puisi "}\n\nnot json\n{"prompt": ""}\n["prompt"]\n'
+    records = list(iter_records(io.BytesIO(data), "ndjson"))
+
+    assert [record.index for record in records] == [0, 1, 2, 3]
+    assert records[0].record_id == "1"
+    assert records[0].prompt == "Tulis puisi"
+    assert records[1].error.startswith("Invalid JSON")
+    assert records[2].error == "Prompt is required"
+    assert records[3].error is not None
+
+
+def test_csv_records_support_quoted_newlines() -> None:
+    data = 'id,prompt\na,"Baris satu,\nbaris dua"\nb,' + "x" * 3001 + "\n"
+    records = list(iter_records(io.BytesIO(data.encode("utf-8")), "csv"))
+
+    assert records[0].prompt == "Baris satu,\nbaris dua"
+    assert records[1].record_id == "b"
+    assert records[1].error.startswith("Prompt too long")
+
+
+def test_csv_without_prompt_column_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        list(iter_records(io.BytesIO(b"a,b\n1,2\n"), "csv"))
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+
+from huggingfastapi.models.prediction import EvaluationResult
+from huggingfastapi.services.evaluation_cache import EvaluationCache
+
+
+def _result(score: float = 80.0) -> EvaluationResult:
+    return EvaluationResult(
+        overall_score=score,
+        clarity=score,
+        specificity=score,
+        ethics=score,
+        effectiveness=score,
+        bias_risk=10.0,
+        suggestions=["Add an audience"],
+        strengths=["Clear goal"],
+        weaknesses=[],
+        improved_prompt="Improved prompt",
+        evaluation_details={"model_used": "test-model"},
+        sources_used=[],
+        timestamp="2025-07-25T10:30:00",
+    )
+
+
+def test_key_normalizes_whitespace_but_not_evaluator() -> None:
+    key = EvaluationCache.make_key("Tulis  sesuatu\n tentang AI ", "goto", "model", "1")
+    assert key == EvaluationCache.make_key("Tulis sesuatu tentang AI", "goto", "model", "1")
+    assert key != EvaluationCache.make_key("Tulis sesuatu tentang AI", "gemini", "model", "1")
+    assert key != EvaluationCache.make_key("Tulis sesuatu tentang AI", "goto", "model", "2")
+
+
+def test_get_or_compute_counts_hits_and_misses() -> None:
+    cache = EvaluationCache(max_entries=4, db_path=None, ttl_seconds=0)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _result()
+
+    first = cache.get_or_compute("key", compute)
+    second = cache.get_or_compute("key", compute)
+
+    assert first == second
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_evicts_least_recently_used() -> None:
+    cache = EvaluationCache(max_entries=2, db_path=None, ttl_seconds=0)
+    cache.put("a", _result(1))
+    cache.put("b", _result(2))
+    cache.get("a")
+    cache.put("c", _result(3))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_sqlite_tier_survives_restart_and_expires(tmp_path) -> None:
+    db_path = tmp_path / "evaluations.sqlite"
+    EvaluationCache(max_entries=2, db_path=str(db_path), ttl_seconds=60).put("key", _result(42))
+
+    restarted = EvaluationCache(max_entries=2, db_path=str(db_path), ttl_seconds=60)
+    assert restarted.get("key").overall_score == 42
+    assert restarted.stats()["disk_hits"] == 1
+
+    expiring = EvaluationCache(max_entries=2, db_path=str(db_path), ttl_seconds=0.01)
+    time.sleep(0.05)
+    assert expiring.get("key") is None
+
+
+def test_degraded_results_are_not_stored() -> None:
+    cache = EvaluationCache(max_entries=4, db_path=None, ttl_seconds=0)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return _result().model_copy(update={"degraded": True})
+
+    cache.get_or_compute("key", compute)
+    cache.get_or_compute("key", compute)
+
+    assert len(calls) == 2
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_async_lookups_and_stores_run_off_the_event_loop(tmp_path) -> None:
+    cache = EvaluationCache(db_path=str(tmp_path / "cache.db"))
+    get, put, threads = cache.get, cache.put, []
+    cache.get = lambda key: threads.append(threading.current_thread()) or get(key)
+    cache.put = lambda key, result: threads.append(threading.current_thread()) or put(key, result)
+
+    async def compute() -> EvaluationResult:
+        return _result()
+
+    first = asyncio.run(cache.get_or_compute_async("k", compute))
+    second = asyncio.run(cache.get_or_compute_async("k", compute))
+
+    assert first == second
+    assert len(threads) == 3
+    assert threading.main_thread() not in threads
@@ -0,0 +1,38 @@
+import threading
+
+import pytest
+import torch
+
+from huggingfastapi.models.payload import TextGenerationPayload
+
+
+@pytest.mark.parametrize("prefix_key", [None, "rubrik"])
+def test_each_row_stops_at_its_own_max_new_tokens(tiny_text_generation_model, prefix_key) -> None:
+    model = tiny_text_generation_model
+    # Never emit a terminator, so every row runs to its limit
+    model.terminators = [model.tokenizer.pad_token_id]
+    model.register_prefix("rubrik", TextGenerationPayload(text="Nilai: "))
+    torch.manual_seed(0)
+
+    short, long = model.generate_batch(
+        [TextGenerationPayload(text="Nilai: a", max_new_tokens=2), TextGenerationPayload(text="Nilai: b", max_new_tokens=12)],
+        prefix_keys=[prefix_key, prefix_key],
+    )
+
+    # The character-level tokenizer decodes one character per token
+    assert 0 < len(short.generated_text) <= 2
+    assert len(long.generated_text) > 2
+
+
+def test_cancelled_stream_stops_generating(tiny_text_generation_model) -> None:
+    model = tiny_text_generation_model
+    model.terminators = [model.tokenizer.pad_token_id]
+    cancel = threading.Event()
+
+    events = model.stream(TextGenerationPayload(text="Halo", max_new_tokens=200), cancel=cancel)
+    assert next(events)["event"] == "token"
+    cancel.set()
+    done = list(events)[-1]
+
+    assert done["event"] == "done"
+    assert done["metrics"]["generated_tokens"] < 200
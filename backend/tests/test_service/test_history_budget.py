@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+import torch
+
+from huggingfastapi.models.payload import TextGenerationPayload
+from huggingfastapi.services.text_generation import TextGenerationModel
+
+
+class _WordTokenizer:
+    """Word-level stand-in for the Gemma tokenizer and its chat template"""
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=True):
+        turns = [f"<turn> {message['role']} {message['content']} </turn>" for message in messages]
+        return " ".join(turns) + (" <turn> model" if add_generation_prompt else "")
+
+    def __call__(self, text, add_special_tokens=False, return_tensors=None):
+        if isinstance(text, list):
+            return SimpleNamespace(input_ids=[[1] * len(item.split()) for item in text])
+        ids = [1] * len(text.split())
+        return SimpleNamespace(input_ids=torch.tensor([ids]) if return_tensors == "pt" else ids)
+
+
+def _model(budget: int, policy: str = "sliding_window") -> TextGenerationModel:
+    model = TextGenerationModel.__new__(TextGenerationModel)
+    model.tokenizer = _WordTokenizer()
+    model.model = SimpleNamespace(device="cpu")
+    model.prompt_token_budget = budget
+    model.history_policy = policy
+    model._message_overhead = None
+    return model
+
+
+def _payload(turns: int = 10) -> TextGenerationPayload:
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"pertanyaan {turn} " + "kata " * 8})
+        history.append({"role": "assistant", "content": f"jawaban {turn} " + "kata " * 8})
+    return TextGenerationPayload(text="pesan terbaru", system_message="Anda asisten.", conversation_history=history)
+
+
+def test_prompt_within_budget_is_untouched() -> None:
+    prompt = _model(budget=0)._prepare(_payload())
+
+    assert prompt.usage["history_messages_dropped"] == 0
+    assert prompt.usage["history_tokens_dropped"] == 0
+    assert prompt.usage["prompt_tokens"] == prompt.input_ids.shape[0]
+    assert len(prompt.messages) == 22
+
+
+def test_sliding_window_drops_oldest_turns_at_a_user_message() -> None:
+    prompt = _model(budget=100)._prepare(_payload())
+
+    assert prompt.input_ids.shape[0] <= 100
+    assert prompt.usage["history_messages_dropped"] % 2 == 0
+    assert prompt.usage["history_tokens_dropped"] > 0
+    assert prompt.usage["history_summarized"] is False
+    # System message, then the newest turns starting with a user message, then the current message
+    assert prompt.messages[1]["role"] == "user"
+    assert prompt.messages[-2]["content"].startswith("jawaban 9")
+    assert prompt.messages[-1]["content"] == "pesan terbaru"
+
+
+def test_summarize_moves_dropped_turns_into_the_system_message() -> None:
+    model = _model(budget=150, policy="summarize")
+    summarized = []
+    model._summarize = lambda history, previous=None: summarized.append(len(history)) or "ringkasan singkat"
+
+    prompt = model._prepare(_payload())
+
+    assert prompt.usage["history_summarized"] is True
+    # The drop is settled on token counts alone, so the model summarizes exactly once
+    assert summarized == [prompt.usage["history_messages_dropped"]]
+    assert prompt.input_ids.shape[0] <= 150
+    assert prompt.summary == "ringkasan singkat"
+    assert prompt.messages[0]["content"].endswith("ringkasan singkat")
+    assert prompt.payload.system_message.startswith("Anda asisten.")
+
+
+def test_earlier_summary_is_folded_into_the_next_one() -> None:
+    model = _model(budget=150, policy="summarize")
+    previous = []
+    model._summarize = lambda history, earlier=None: previous.append(earlier) or "ringkasan baru"
+
+    within_budget = model._prepare(_payload(turns=1), summary="ringkasan lama")
+    assert within_budget.summary == "ringkasan lama"
+    assert within_budget.messages[0]["content"].endswith("ringkasan lama")
+    assert previous == []
+
+    over_budget = model._prepare(_payload(), summary="ringkasan lama")
+    assert previous == ["ringkasan lama"]
+    assert over_budget.summary == "ringkasan baru"
+    assert "ringkasan lama" not in over_budget.messages[0]["content"]
@@ -0,0 +1,154 @@
+import socket
+import threading
+import time
+
+import pytest
+from pydantic import ValidationError
+
+from huggingfastapi.models.payload import EvaluationJobPayload
+from huggingfastapi.models.prediction import EvaluationResult
+from huggingfastapi.services import jobs
+from huggingfastapi.services.jobs import EvaluationJob, EvaluationJobQueue, QueueFullError, check_callback_url
+
+
+def _result(prompt: str) -> EvaluationResult:
+    return EvaluationResult(
+        overall_score=50.0,
+        clarity=50.0,
+        specificity=50.0,
+        ethics=50.0,
+        effectiveness=50.0,
+        bias_risk=10.0,
+        suggestions=[],
+        strengths=[],
+        weaknesses=[],
+        improved_prompt=prompt,
+        evaluation_details={},
+        sources_used=[],
+        timestamp="2025-07-25T10:30:00",
+    )
+
+
+def _wait_for(job: EvaluationJob, timeout: float = 5) -> None:
+    deadline = time.monotonic() + timeout
+    while job.finished_at is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_higher_priority_jobs_run_first() -> None:
+    gate = threading.Event()
+    order = []
+
+    def runner(job: EvaluationJob) -> EvaluationResult:
+        gate.wait()
+        order.append(job.prompt)
+        return _result(job.prompt)
+
+    job_queue = EvaluationJobQueue(runner, workers=1, max_queue=10, ttl_seconds=60)
+    job_queue.start()
+    blocker = job_queue.submit(EvaluationJob(evaluator="goto", prompt="blocker"))
+    while blocker.status == "queued":
+        time.sleep(0.01)
+    jobs = [
+        job_queue.submit(EvaluationJob(evaluator="goto", prompt=prompt, priority=priority))
+        for prompt, priority in [("low", 0), ("high", 5), ("low-2", 0)]
+    ]
+    assert job_queue.queue_position(jobs[1]) == 1
+    gate.set()
+    for job in jobs:
+        _wait_for(job)
+    job_queue.stop()
+
+    assert order == ["blocker", "high", "low", "low-2"]
+    assert all(job.status == "succeeded" for job in jobs)
+    assert job_queue.describe(jobs[1])["result"]["improved_prompt"] == "high"
+
+
+def test_full_queue_rejects_and_failures_are_recorded() -> None:
+    gate = threading.Event()
+
+    def runner(job: EvaluationJob) -> EvaluationResult:
+        gate.wait()
+        raise RuntimeError("model error")
+
+    job_queue = EvaluationJobQueue(runner, workers=1, max_queue=1, ttl_seconds=60)
+    job_queue.start()
+    running = job_queue.submit(EvaluationJob(evaluator="goto", prompt="running"))
+    while running.status == "queued":
+        time.sleep(0.01)
+    job_queue.submit(EvaluationJob(evaluator="goto", prompt="waiting"))
+    with pytest.raises(QueueFullError):
+        job_queue.submit(EvaluationJob(evaluator="goto", prompt="rejected"))
+
+    gate.set()
+    _wait_for(running)
+    job_queue.stop()
+
+    assert running.status == "failed"
+    assert running.error == "model error"
+    stats = job_queue.stats()
+    assert stats["rejected"] == 1
+    assert stats["failed"] == 2
+
+
+def test_callback_url_must_be_http() -> None:
+    assert str(EvaluationJobPayload(prompt="p", callback_url="https://lms.example/hook").callback_url).startswith("https")
+    with pytest.raises(ValidationError):
+        EvaluationJobPayload(prompt="p", callback_url="file:///etc/passwd")
+
+
+def _resolves_to(monkeypatch, address: str) -> None:
+    monkeypatch.setattr(socket, "getaddrinfo", lambda *args, **kwargs: [(None, None, None, "", (address, 80))])
+
+
+def test_callbacks_are_retried_without_a_final_sleep(monkeypatch) -> None:
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    _resolves_to(monkeypatch, "93.184.216.34")
+
+    def refuse(*args, **kwargs):
+        raise OSError("refused")
+
+    monkeypatch.setattr(jobs._callback_opener, "open", refuse)
+    job_queue = EvaluationJobQueue(lambda job: _result(job.prompt), workers=1, max_queue=1, ttl_seconds=60)
+
+    job = EvaluationJob(evaluator="goto", prompt="p", callback_url="http://lms.example/hook")
+    job_queue._send_callback(job)
+    assert sleeps == [1, 2]
+    assert job.callback_status == "failed: refused"
+
+    local_file = EvaluationJob(evaluator="goto", prompt="p", callback_url="file:///etc/passwd")
+    job_queue._send_callback(local_file)
+    assert local_file.callback_status == "failed: callback URL must be http or https"
+
+
+def test_retry_after_follows_measured_run_times() -> None:
+    job_queue = EvaluationJobQueue(lambda job: _result(job.prompt), workers=2, max_queue=1, ttl_seconds=60)
+    assert job_queue.retry_after() == EvaluationJobQueue.DEFAULT_RETRY_AFTER
+
+    job_queue._run_times.extend([8000.0, 12000.0])
+    assert job_queue.retry_after() == 5
+
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.0.0.5", "169.254.169.254", "::1", "::ffff:192.168.1.1"])
+def test_callbacks_to_internal_addresses_are_refused(monkeypatch, address) -> None:
+    _resolves_to(monkeypatch, address)
+    sent = []
+    monkeypatch.setattr(jobs._callback_opener, "open", lambda *args, **kwargs: sent.append(args))
+    job_queue = EvaluationJobQueue(lambda job: _result(job.prompt), workers=1, max_queue=1, ttl_seconds=60)
+
+    with pytest.raises(ValueError, match="non-public"):
+        check_callback_url("http://lms.example/hook")
+    job = EvaluationJob(evaluator="goto", prompt="p", callback_url="http://lms.example/hook")
+    job_queue._send_callback(job)
+
+    assert not sent
+    assert job.callback_status == "failed: callback host lms.example resolves to a non-public address"
+
+
+def test_callback_allowlist_replaces_the_address_check(monkeypatch) -> None:
+    _resolves_to(monkeypatch, "10.0.0.5")
+
+    check_callback_url("http://lms.internal/hook", allowed_hosts=["lms.internal"])
+    with pytest.raises(ValueError, match="EVAL_JOB_CALLBACK_HOSTS"):
+        check_callback_url("http://elsewhere.example/hook", allowed_hosts=["lms.internal"])
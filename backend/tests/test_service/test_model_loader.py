@@ -0,0 +1,89 @@
+import json
+import os
+
+from huggingfastapi.services import utils
+from huggingfastapi.services.utils import ModelLoader
+
+
+class _FakePretrained:
+    """Stands in for a tokenizer/model class: records loads and saves one weights file"""
+
+    loads = []
+
+    def __init__(self, source, **kwargs):
+        self.source = source
+        self.kwargs = kwargs
+
+    @classmethod
+    def from_pretrained(cls, source, **kwargs):
+        cls.loads.append((source, kwargs))
+        return cls(source, **kwargs)
+
+    def save_pretrained(self, directory, **kwargs):
+        with open(f"{directory}/weights.safetensors", "wb") as weights:
+            weights.write(b"weights")
+
+    def to(self, device):
+        return self
+
+
+def _load(tmp_path, verify="hash"):
+    return ModelLoader(
+        model_name="org/model",
+        model_directory=str(tmp_path),
+        tokenizer_loader=_FakePretrained,
+        model_loader=_FakePretrained,
+        model_kwargs={"quantization_config": "8bit", "device_map": "auto"},
+        variant="int8",
+        verify=verify,
+    )
+
+
+def test_artifact_is_saved_once_with_manifest(tmp_path) -> None:
+    _FakePretrained.loads = []
+    loader = _load(tmp_path)
+
+    manifest = json.loads((loader.save_path / ModelLoader.MANIFEST).read_text())
+    assert loader.save_path == tmp_path / "org" / "model-int8"
+    assert manifest["files"]["weights.safetensors"]["size"] == 7
+    # Quantization only applies to the download; loads from the artifact keep device placement
+    assert _FakePretrained.loads[1] == ("org/model", {"quantization_config": "8bit", "device_map": "auto"})
+    assert _FakePretrained.loads[-1] == (str(loader.save_path), {"device_map": "auto"})
+
+    _FakePretrained.loads = []
+    _load(tmp_path)
+    assert [source for source, _ in _FakePretrained.loads] == [str(loader.save_path)] * 2
+
+
+def test_corrupted_artifact_is_rebuilt(tmp_path) -> None:
+    weights = _load(tmp_path).save_path / "weights.safetensors"
+    stat = weights.stat()
+    weights.write_bytes(b"WEIGHTS")
+    os.utime(weights, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    # Same size and mtime, so only the full hash check notices
+    _load(tmp_path, verify="size")
+    assert weights.read_bytes() == b"WEIGHTS"
+
+    _load(tmp_path)
+    assert weights.read_bytes() == b"weights"
+
+
+def test_size_check_only_rehashes_modified_files(tmp_path, monkeypatch) -> None:
+    weights = _load(tmp_path, verify="size").save_path / "weights.safetensors"
+    hashed = []
+    sha256 = utils._sha256
+    monkeypatch.setattr(utils, "_sha256", lambda path: hashed.append(path) or sha256(path))
+
+    _load(tmp_path, verify="size")
+    assert hashed == []
+
+    # Rewritten with the same content: hashed once, then trusted again
+    os.utime(weights, ns=(0, 0))
+    _load(tmp_path, verify="size")
+    _load(tmp_path, verify="size")
+    assert hashed == [weights]
+
+    weights.write_bytes(b"WEIGHTS")
+    _load(tmp_path, verify="size")
+    assert weights.read_bytes() == b"weights"
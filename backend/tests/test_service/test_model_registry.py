@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.datastructures import State
+
+from huggingfastapi.core.readiness import ensure_model_ready
+from huggingfastapi.services.model_registry import ModelNotReadyError, ModelRegistry
+
+
+def test_prefetch_runs_concurrently_but_construction_is_serialized() -> None:
+    both_prefetching = threading.Barrier(2, timeout=5)
+    constructing = []
+    overlaps = []
+
+    def construct() -> None:
+        constructing.append(1)
+        overlaps.append(len(constructing))
+        time.sleep(0.05)
+        constructing.pop()
+
+    registry = ModelRegistry(retry_after=3)
+    # Each prefetch only returns once the other one is running too
+    registry.register("detector", construct, prefetch=both_prefetching.wait)
+    registry.register("generator", construct, prefetch=both_prefetching.wait)
+    registry.start()
+
+    assert registry.wait(timeout=5)
+    assert registry.is_ready()
+    assert overlaps == [1, 1]
+    assert registry.snapshot()["detector"]["status"] == "ready"
+    registry.check("generator")
+
+
+def test_failed_and_unknown_models_are_not_ready() -> None:
+    release = threading.Event()
+    registry = ModelRegistry(retry_after=2.5)
+    registry.register("slow", release.wait)
+    registry.register("broken", lambda: 1 / 0)
+    registry.start()
+
+    with pytest.raises(ModelNotReadyError) as error:
+        registry.check("slow")
+    assert error.value.retry_after == 3
+    assert not registry.wait(timeout=0.1)
+
+    release.set()
+    assert registry.wait(timeout=5)
+    assert not registry.is_ready()
+    assert registry.snapshot()["broken"]["status"] == "failed"
+    with pytest.raises(ModelNotReadyError):
+        registry.check("missing")
+
+
+def test_only_loading_models_ask_clients_to_retry() -> None:
+    release = threading.Event()
+    state = State()
+    state.model_registry = ModelRegistry(retry_after=4)
+    state.model_registry.register("slow", release.wait)
+    state.model_registry.register("broken", lambda: 1 / 0)
+    state.model_registry.start()
+
+    with pytest.raises(HTTPException) as loading:
+        ensure_model_ready(state, "slow")
+    release.set()
+    state.model_registry.wait(timeout=5)
+    with pytest.raises(HTTPException) as failed:
+        ensure_model_ready(state, "broken")
+    with pytest.raises(HTTPException) as missing:
+        ensure_model_ready(state, "missing")
+
+    assert loading.value.status_code == 503
+    assert loading.value.headers == {"Retry-After": "4"}
+    assert failed.value.status_code == 500
+    assert not failed.value.headers
+    assert missing.value.status_code == 503
+    assert not missing.value.headers
@@ -0,0 +1,72 @@
+from multiprocessing.connection import Listener
+import threading
+
+import pytest
+
+from huggingfastapi.services.model_server import ModelServerClient, RemoteGoToPromptEvaluator
+
+
+def _serve(listener: Listener) -> None:
+    """Stand-in for ModelServer._serve speaking the same reply protocol"""
+    connection = listener.accept()
+    with connection:
+        while True:
+            try:
+                method, args, kwargs = connection.recv()
+            except EOFError:
+                return
+            if method == "count":
+                for i in range(args[0]):
+                    connection.send(("item", i))
+                connection.send(("end", None))
+            elif method == "evaluate_prompt_stream":
+                for name in ("clarity", "ethics"):
+                    connection.send(("item", {"event": "score", "name": name, "value": 80.0}))
+                connection.send(("item", {"event": "done", "result": args[0].upper()}))
+                connection.send(("end", None))
+            elif method == "echo":
+                connection.send(("ok", (args, kwargs)))
+            else:
+                connection.send(("error", ValueError(method)))
+
+
+@pytest.fixture
+def client(tmp_path):
+    address = str(tmp_path / "model.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=b"secret")
+    threading.Thread(target=_serve, args=(listener,), daemon=True).start()
+    client = ModelServerClient(address, authkey="secret", pool_size=1)
+    yield client
+    client.close()
+    listener.close()
+
+
+def test_calls_reuse_one_connection(client) -> None:
+    assert client.call("echo", 1, key="a") == ((1,), {"key": "a"})
+    assert list(client.stream("count", 3)) == [0, 1, 2]
+    # The stand-in accepts a single connection, so this only works if it was pooled
+    assert client.call("echo", 2) == ((2,), {})
+
+
+def test_server_errors_are_raised(client) -> None:
+    with pytest.raises(ValueError):
+        client.call("missing")
+    assert client.call("echo") == ((), {})
+
+
+def test_remote_evaluation_stream_settles_after_the_reader_stops(client) -> None:
+    description = {"rubric_version": "1", "metric_names": [], "qualitative_names": []}
+    evaluator = RemoteGoToPromptEvaluator(client, description)
+    settled = threading.Event()
+    outcome = []
+
+    def on_done(result, error) -> None:
+        outcome.append((result, error))
+        settled.set()
+
+    stream = evaluator.evaluate_prompt_stream("puisi", on_done=on_done)
+    assert next(stream)["name"] == "clarity"
+    stream.close()
+
+    assert settled.wait(5)
+    assert outcome == [("PUISI", None)]
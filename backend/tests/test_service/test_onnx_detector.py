@@ -0,0 +1,39 @@
+import pytest
+import torch
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from transformers import BertConfig  # noqa: E402
+
+from huggingfastapi.services import onnx_detector  # noqa: E402
+from huggingfastapi.services.nlp import DesklibAIDetectionModel  # noqa: E402
+
+
+def _tokenizer(texts, padding=True, truncation=False, max_length=None, return_tensors="pt"):
+    """Character-level stand-in for the detector's tokenizer"""
+    ids = [[2] + [3 + ord(char) % 90 for char in text][: (max_length or 512) - 1] for text in texts]
+    longest = max(len(row) for row in ids)
+    return {
+        "input_ids": torch.tensor([row + [0] * (longest - len(row)) for row in ids]),
+        "attention_mask": torch.tensor([[1] * len(row) + [0] * (longest - len(row)) for row in ids]),
+    }
+
+
+def test_int8_export_matches_pytorch(tmp_path) -> None:
+    torch.manual_seed(0)
+    config = BertConfig(
+        vocab_size=96, hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+        intermediate_size=64, max_position_embeddings=512,
+    )
+    model = DesklibAIDetectionModel(config).eval()
+
+    int8_path = onnx_detector.export_int8(model, _tokenizer, tmp_path)
+    session = onnx_detector.OnnxDetectorSession(int8_path, threads=1)
+    report = onnx_detector.validate(model, session, _tokenizer, max_len=256, tolerance=0.05)
+
+    assert report["passed"], report
+    encoded = _tokenizer(["Halo", "Tulis puisi tentang laut"])
+    with torch.no_grad():
+        expected = torch.sigmoid(model(**encoded)["logits"]).view(-1).tolist()
+    assert onnx_detector.probabilities(session, encoded) == pytest.approx(expected, abs=0.05)
@@ -0,0 +1,99 @@
+import torch
+from transformers import DynamicCache
+
+from huggingfastapi.models.payload import TextGenerationPayload
+from huggingfastapi.services.utils import (
+    common_prefix_length,
+    concat_kv_caches,
+    pad_kv_cache_left,
+    stack_kv_caches,
+    trim_kv_cache_left,
+)
+
+
+def _cache(tokens: int, fill: float = 1.0) -> DynamicCache:
+    layer = (torch.full((1, 1, tokens, 4), fill), torch.full((1, 1, tokens, 4), -fill))
+    return DynamicCache.from_legacy_cache((layer,))
+
+
+def test_common_prefix_length() -> None:
+    assert common_prefix_length(torch.tensor([1, 2, 3]), torch.tensor([1, 2, 4, 5])) == 2
+    assert common_prefix_length(torch.tensor([1, 2]), torch.tensor([1, 2, 3])) == 2
+    assert common_prefix_length(torch.tensor([7]), torch.tensor([1, 2])) == 0
+    assert common_prefix_length(torch.tensor([], dtype=torch.long), torch.tensor([1])) == 0
+
+
+def test_stack_kv_caches_left_pads_each_row() -> None:
+    stacked = stack_kv_caches([_cache(2, 1.0), None, _cache(3, 2.0)], total_length=4)
+
+    key, value = stacked[0]
+    assert key.shape == (3, 1, 4, 4)
+    assert key[0, 0, :, 0].tolist() == [0.0, 0.0, 1.0, 1.0]
+    assert key[1].abs().sum() == 0
+    assert key[2, 0, :, 0].tolist() == [0.0, 2.0, 2.0, 2.0]
+    assert value[2, 0, -1, 0] == -2.0
+
+
+def test_stack_kv_caches_passes_a_single_full_cache_through() -> None:
+    cache = _cache(3)
+
+    assert stack_kv_caches([cache], total_length=3) is cache
+    assert stack_kv_caches([None, None], total_length=3) is None
+
+
+def test_prefix_path_matches_a_full_prefill(tiny_text_generation_model) -> None:
+    model = tiny_text_generation_model
+    model.register_prefix("rubrik", TextGenerationPayload(text="Nilai jawaban berikut: "))
+    messages = model._pre_process(TextGenerationPayload(text="Nilai jawaban berikut: laut itu biru"))
+    input_ids = model._encode(messages)
+
+    reuse, cache = model._reusable_prefix(input_ids, "rubrik")
+    with torch.no_grad():
+        cached = model.model(input_ids=input_ids[None, reuse:], past_key_values=cache, use_cache=True).logits[0, -1]
+        full = model.model(input_ids=input_ids[None]).logits[0, -1]
+
+    assert reuse > 0
+    assert torch.allclose(cached, full, atol=1e-5)
+
+    result = model.generate(
+        TextGenerationPayload(text="Nilai jawaban berikut: laut itu biru", max_new_tokens=4), prefix_key="rubrik"
+    )
+    assert result.model == "tiny-gemma2"
+
+
+def test_prefix_path_falls_back_to_plain_generation(tiny_text_generation_model, monkeypatch) -> None:
+    model = tiny_text_generation_model
+    model.register_prefix("rubrik", TextGenerationPayload(text="Nilai jawaban berikut: "))
+
+    def _fail(*args, **kwargs):
+        raise RuntimeError("cache layout not supported")
+
+    monkeypatch.setattr(model, "_run_generate", _fail)
+    results = model.generate_batch(
+        [TextGenerationPayload(text="Nilai jawaban berikut: a", max_new_tokens=3),
+         TextGenerationPayload(text="Nilai jawaban berikut: b", max_new_tokens=3)],
+        prefix_keys=["rubrik", "rubrik"],
+    )
+
+    single = model.generate(TextGenerationPayload(text="Nilai jawaban berikut: c", max_new_tokens=3), prefix_key="rubrik")
+
+    assert len(results) == 2
+    assert results[1].full_conversation[-1]["role"] == "assistant"
+    assert single.full_conversation[-2]["content"] == "Nilai jawaban berikut: c"
+
+
+def test_pad_concat_and_trim_kv_caches() -> None:
+    padded = pad_kv_cache_left(_cache(2, 3.0), total_length=4)
+    key, value = padded[0]
+    assert key[0, 0, :, 0].tolist() == [0.0, 0.0, 3.0, 3.0]
+    assert value[0, 0, :, 0].tolist() == [0.0, 0.0, -3.0, -3.0]
+    assert pad_kv_cache_left(padded, total_length=4) is padded
+
+    batch = concat_kv_caches([padded, _cache(4, 1.0)])
+    assert batch[0][0].shape == (2, 1, 4, 4)
+    assert batch[0][0][:, 0, 0, 0].tolist() == [0.0, 1.0]
+
+    trimmed = trim_kv_cache_left(batch, 2)
+    assert trimmed.get_seq_length() == 2
+    assert trimmed[0][0][:, 0, :, 0].tolist() == [[3.0, 3.0], [1.0, 1.0]]
+    assert trim_kv_cache_left(batch, 0) is batch
@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+
+from huggingfastapi.services.nlp import GeminiPromptEvaluator, GoToPromptEvaluator
+
+
+class _FakeModel:
+    """Answers every GoTo sub-task; sub-tasks whose prompt contains `fail_on` raise"""
+
+    model_id = "fake-goto"
+
+    def __init__(self, fail_on=None, batch_fails=False):
+        self.fail_on = fail_on
+        self.batch_fails = batch_fails
+        self.score_calls = []
+
+    def generate(self, payload, prefix_key=None):
+        if self.fail_on and self.fail_on in payload.text:
+            raise RuntimeError("CUDA out of memory")
+        text = "80" if payload.max_new_tokens <= 8 else '["poin"]'
+        return SimpleNamespace(generated_text=text)
+
+    def generate_batch(self, payloads, prefix_keys=None):
+        if self.batch_fails:
+            raise RuntimeError("batch too large")
+        return [self.generate(payload) for payload in payloads]
+
+    def score(self, payload, prefix_key=None):
+        self.score_calls.append(1)
+        return SimpleNamespace(expected_score=70.4, confidence=0.5)
+
+    def score_batch(self, payloads, prefix_keys=None):
+        if self.batch_fails:
+            raise RuntimeError("batch too large")
+        self.score_calls.append(len(payloads))
+        return [SimpleNamespace(expected_score=70.4, confidence=0.5) for _ in payloads]
+
+
+def _done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_failed_subtask_marks_the_result_degraded(parallel) -> None:
+    evaluator = GoToPromptEvaluator(
+        _FakeModel(fail_on="CLARITY (Kejelasan)"), batched=False, prefix_cache=False, score_mode="generate", parallel=parallel
+    )
+    try:
+        result = evaluator.evaluate_prompt("Tulis puisi tentang laut")
+    finally:
+        evaluator.close()
+
+    assert result.degraded
+    assert result.evaluation_details["failed_subtasks"] == ["clarity"]
+    assert result.clarity == 0 and result.specificity == 80
+
+
+def test_complete_result_is_not_degraded() -> None:
+    evaluator = GoToPromptEvaluator(_FakeModel(), batched=False, prefix_cache=False, score_mode="generate", parallel=False)
+
+    result = evaluator.evaluate_prompt("Tulis puisi tentang laut")
+
+    assert not result.degraded
+    assert result.evaluation_details["failed_subtasks"] == []
+    assert result.strengths == ["poin"]
+
+
+
+@pytest.mark.parametrize("batch_fails", [False, True])
+def test_batched_reports_whether_the_stages_really_ran_as_a_batch(batch_fails) -> None:
+    evaluator = GoToPromptEvaluator(
+        _FakeModel(batch_fails=batch_fails), batched=True, prefix_cache=False, score_mode="generate", parallel=False
+    )
+
+    result = evaluator.evaluate_prompt("Tulis puisi tentang laut")
+
+    assert result.evaluation_details["batched"] is not batch_fails
+    assert not result.degraded
+
+
+@pytest.mark.parametrize("batched,batch_fails,calls", [(True, False, [5]), (True, True, [1] * 5), (False, False, [1] * 5)])
+def test_logit_scores_are_read_in_one_batch(batched, batch_fails, calls) -> None:
+    model = _FakeModel(batch_fails=batch_fails)
+    evaluator = GoToPromptEvaluator(model, batched=batched, prefix_cache=False, score_mode="logits", parallel=False)
+
+    scores, confidences, stage_batched = evaluator._score_stage("Tulis puisi tentang laut")
+
+    assert model.score_calls == calls
+    assert stage_batched is (batched and not batch_fails)
+    assert scores["clarity"] == 70 and confidences["bias_risk"] == 0.5
+
+
+def test_parallel_logit_scores_are_one_batch_subtask() -> None:
+    model = _FakeModel()
+    scheduler = SimpleNamespace(submit=lambda payload, prefix_key=None: _done(model.generate(payload)))
+    evaluator = GoToPromptEvaluator(
+        model, batched=True, prefix_cache=False, score_mode="logits", parallel=True, scheduler=scheduler
+    )
+    streamed = {}
+    try:
+        result = evaluator.evaluate_prompt("Tulis puisi tentang laut", on_complete=streamed.__setitem__)
+    finally:
+        evaluator.close()
+
+    details = result.evaluation_details
+    assert model.score_calls == [5]
+    assert details["batched"] is True
+    assert result.clarity == 70 and details["score_confidence"]["bias_risk"] == 0.5
+    assert streamed["clarity"] == 70 and streamed["strengths"] == ["poin"]
+    assert details["generation_backend"]["clarity"] == "model"
+    assert details["generation_backend"]["improved_prompt"] == "scheduler"
+    assert set(details["subtask_timings_ms"]) == {"scores", "strengths", "weaknesses", "suggestions", "improved_prompt"}
+
+
+def test_unknown_score_mode_is_rejected() -> None:
+    with pytest.raises(ValueError, match="GOTO_SCORE_MODE"):
+        GoToPromptEvaluator(_FakeModel(), score_mode="logit", parallel=False)
+
+def test_truncated_gemini_response_is_degraded() -> None:
+    evaluator = GeminiPromptEvaluator(api_key="")
+    complete = SimpleNamespace(text='{"clarity": 70, "specificity": 60, "ethics": 90, "effectiveness": 65, "bias_risk": 5}')
+    truncated = SimpleNamespace(text='{"clarity": 70, "specificity": 60, "strengths": ["Jelas"')
+
+    assert not evaluator._build_result("Tulis puisi", complete).degraded
+    result = evaluator._build_result("Tulis puisi", truncated)
+    assert result.degraded
+    assert result.clarity == 70 and result.ethics == 50
+
+
+def test_gemini_concurrency_limit_works_across_event_loops() -> None:
+    evaluator = GeminiPromptEvaluator(api_key="", max_concurrency=2)
+    peak = []
+
+    async def generate_content_async(prompt):
+        peak.append(evaluator.in_flight)
+        await asyncio.sleep(0.01)
+        return SimpleNamespace(text=prompt)
+
+    evaluator.model = SimpleNamespace(generate_content_async=generate_content_async)
+
+    async def burst():
+        return await asyncio.gather(*(evaluator._generate_with_retry_async(f"p{i}", max_retries=1) for i in range(4)))
+
+    # e.g. the serving loop and a worker's own asyncio.run()
+    for _ in range(2):
+        assert [response.text for response in asyncio.run(burst())] == ["p0", "p1", "p2", "p3"]
+    assert max(peak) == 2
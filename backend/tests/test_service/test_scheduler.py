@@ -0,0 +1,125 @@
+import collections
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+import torch
+from transformers import DynamicCache
+
+from huggingfastapi.models.payload import TextGenerationPayload
+from huggingfastapi.services.scheduler import GenerationScheduler, _Sequence
+
+
+def _history(turns: int):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"pertanyaan {turn} " * 4})
+        history.append({"role": "assistant", "content": f"jawaban {turn} " * 4})
+    return history
+
+
+def test_history_summary_runs_off_the_tokenizer_pool(tiny_text_generation_model) -> None:
+    model = tiny_text_generation_model
+    model.prompt_token_budget, model.history_policy = 200, "summarize"
+    threads = []
+    model._summarize = lambda history, previous=None: threads.append(threading.current_thread().name) or "ringkas"
+    scheduler = GenerationScheduler(model, max_batch_size=2, token_budget=4096)
+    scheduler.start()
+    try:
+        result = scheduler.submit(
+            TextGenerationPayload(text="halo", conversation_history=_history(8), max_new_tokens=4)
+        ).result(timeout=30)
+    finally:
+        scheduler.stop()
+
+    assert result.history_summarized
+    assert len(threads) == 1 and threads[0].startswith("history-summary")
+
+
+def _queued(scheduler: GenerationScheduler, prompt_tokens: int, max_new_tokens: int, ready: bool = True) -> _Sequence:
+    encoding = Future()
+    if ready:
+        encoding.set_result(SimpleNamespace(input_ids=torch.zeros(prompt_tokens, dtype=torch.long)))
+    sequence = _Sequence(encoding, max_new_tokens, 0.0, None, Future())
+    scheduler._waiting.append(sequence)
+    return sequence
+
+
+def test_admission_respects_the_token_budget_and_skips_untokenized_requests() -> None:
+    scheduler = GenerationScheduler(None, max_batch_size=3, token_budget=30)
+    tokenizing = _queued(scheduler, 10, 5, ready=False)
+    first, second, third = (_queued(scheduler, 10, 5) for _ in range(3))
+
+    assert scheduler._admit() == [first, second]
+    assert list(scheduler._waiting) == [tokenizing, third]
+
+    scheduler._active = [first, second]
+    assert scheduler._admit() == []
+
+    # An oversized request still runs once the batch is empty
+    scheduler._active, scheduler._waiting = [], collections.deque()
+    oversized = _queued(scheduler, 40, 5)
+    assert scheduler._admit() == [oversized]
+
+
+def test_a_failing_step_only_fails_the_sequence_that_caused_it(tiny_text_generation_model, monkeypatch) -> None:
+    scheduler = GenerationScheduler(tiny_text_generation_model, max_batch_size=4, token_budget=4096)
+    prefill, decode_step = scheduler._prefill, scheduler._decode_step
+    decode_failures = [RuntimeError("out of memory")]
+
+    def failing_prefill(sequence):
+        if sequence.max_new_tokens == 7:
+            raise RuntimeError("bad prompt")
+        prefill(sequence)
+
+    def failing_decode_step():
+        if decode_failures:
+            raise decode_failures.pop()
+        decode_step()
+
+    monkeypatch.setattr(scheduler, "_prefill", failing_prefill)
+    monkeypatch.setattr(scheduler, "_decode_step", failing_decode_step)
+    scheduler.start()
+    try:
+        futures = [
+            scheduler.submit(TextGenerationPayload(text=text, max_new_tokens=tokens, temperature=0))
+            for text, tokens in (("halo", 5), ("rusak", 7), ("apa kabar", 6))
+        ]
+        with pytest.raises(RuntimeError, match="bad prompt"):
+            futures[1].result(timeout=30)
+        results = [futures[0].result(timeout=30), futures[2].result(timeout=30)]
+    finally:
+        scheduler.stop()
+
+    assert not decode_failures
+    assert [result.full_conversation[0]["content"] for result in results] == ["halo", "apa kabar"]
+    assert scheduler.stats()["completed"] == 2
+    assert scheduler.stats()["failed"] == 1
+
+
+def test_requests_with_and_without_a_prefix_share_one_dynamic_cache(tiny_text_generation_model) -> None:
+    model = tiny_text_generation_model
+    model.register_prefix("rubrik", TextGenerationPayload(text="Nilai: "))
+    caches = []
+    hook = model.model.register_forward_pre_hook(
+        lambda module, args, kwargs: caches.append(type(kwargs.get("past_key_values"))), with_kwargs=True
+    )
+    model.terminators = [model.tokenizer.pad_token_id]
+    scheduler = GenerationScheduler(model, max_batch_size=2, token_budget=4096)
+    scheduler.start()
+    try:
+        # The prefixed request runs long enough for the other one to join its batch
+        payloads = [
+            TextGenerationPayload(text="Nilai: a", max_new_tokens=64, temperature=0),
+            TextGenerationPayload(text="halo", max_new_tokens=4, temperature=0),
+        ]
+        futures = [scheduler.submit(payload, prefix_key=key) for payload, key in zip(payloads, ["rubrik", None])]
+        results = [future.result(timeout=30) for future in futures]
+    finally:
+        scheduler.stop()
+        hook.remove()
+
+    assert [result.full_conversation[0]["content"] for result in results] == ["Nilai: a", "halo"]
+    assert scheduler.stats()["max_batch_size_seen"] == 2
+    assert set(caches) == {DynamicCache}
@@ -0,0 +1,27 @@
+import pytest
+
+from huggingfastapi.models.payload import TextGenerationPayload
+
+
+def test_score_batch_matches_scoring_each_prompt_alone(tiny_text_generation_model) -> None:
+    model = tiny_text_generation_model
+    model.register_prefix("rubrik", TextGenerationPayload(text="Nilai jawaban berikut: "))
+    rows = [
+        ("Nilai jawaban berikut: laut", "rubrik"),
+        ("Nilai jawaban berikut: langit biru sekali hari ini", "rubrik"),
+        ("halo", None),
+    ]
+    payloads = [TextGenerationPayload(text=text) for text, _ in rows]
+
+    batch = model.score_batch(payloads, prefix_keys=[key for _, key in rows])
+    alone = [model.score(payload, prefix_key=key) for payload, (_, key) in zip(payloads, rows)]
+
+    for batched, single in zip(batch, alone):
+        assert batched.most_likely_score == single.most_likely_score
+        assert batched.expected_score == pytest.approx(single.expected_score, abs=0.05)
+        assert batched.valid_mass == pytest.approx(single.valid_mass, abs=1e-3)
+
+
+def test_score_batch_rejects_missing_payloads(tiny_text_generation_model) -> None:
+    with pytest.raises(ValueError):
+        tiny_text_generation_model.score_batch([])
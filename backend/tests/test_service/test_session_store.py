@@ -0,0 +1,111 @@
+import time
+
+import torch
+from transformers import DynamicCache
+
+from huggingfastapi.services.session_store import MB, ChatSession, SessionStore, kv_cache_nbytes
+
+
+def _session(session_id: str, tokens: int = 4) -> ChatSession:
+    layer = (torch.zeros(1, 1, tokens, 32), torch.zeros(1, 1, tokens, 32))
+    return ChatSession(
+        session_id=session_id,
+        history=[{"role": "user", "content": session_id}, {"role": "assistant", "content": "ok"}],
+        token_ids=torch.arange(tokens),
+        cache=DynamicCache.from_legacy_cache((layer,)),
+    )
+
+
+def test_checkout_takes_the_cache_and_leaves_the_history() -> None:
+    store = SessionStore(memory_budget_mb=1, offload_budget_mb=0, ttl_seconds=0)
+    store.checkin(_session("a"))
+
+    taken = store.checkout("a")
+    assert taken.cache is not None and kv_cache_nbytes(taken.cache) == 2 * 4 * 32 * 4
+
+    concurrent = store.checkout("a")
+    assert concurrent.cache is None
+    assert concurrent.history == taken.history
+    assert store.checkout("missing") is None
+    assert store.stats()["device_mb"] == 0
+
+
+def test_least_recently_used_caches_are_offloaded_then_dropped() -> None:
+    session_bytes = kv_cache_nbytes(_session("x").cache)
+    store = SessionStore(memory_budget_mb=2 * session_bytes / MB, offload_budget_mb=session_bytes / MB, ttl_seconds=0)
+    for session_id in ["a", "b", "c", "d"]:
+        store.checkin(_session(session_id))
+
+    stats = store.stats()
+    assert stats["sessions"] == 4
+    assert stats["cached_sessions"] == 3
+    assert (stats["offloads"], stats["evictions"]) == (2, 1)
+
+    # "a" was offloaded first and then dropped; its history survives for a full re-prefill
+    oldest = store.checkout("a")
+    assert oldest.cache is None and oldest.history[0]["content"] == "a"
+    offloaded = store.checkout("b", "cpu")
+    assert offloaded.cache is not None and not offloaded.offloaded
+    assert store.stats()["offload_hits"] == 1
+
+
+def test_idle_sessions_expire() -> None:
+    store = SessionStore(memory_budget_mb=1, offload_budget_mb=0, ttl_seconds=60)
+    store.checkin(_session("a"))
+    store._sessions["a"].last_used -= 120
+
+    assert store.checkout("a") is None
+    assert store.stats()["sessions"] == 0
+
+
+def test_session_turns_reuse_the_cache_on_gemma2(tiny_text_generation_model) -> None:
+    from huggingfastapi.models.payload import TextGenerationPayload
+
+    first = tiny_text_generation_model.generate(
+        TextGenerationPayload(text="Halo", system_message="Anda asisten.", session_id="s", max_new_tokens=4)
+    )
+    second = tiny_text_generation_model.generate(
+        TextGenerationPayload(text="Lagi", system_message="Anda asisten.", session_id="s", max_new_tokens=4)
+    )
+
+    assert first.cached_tokens == 0 and first.prefill_tokens > 0
+    assert second.session_id == "s"
+    # The second turn's prompt starts with the first turn's prompt and reply
+    assert second.cached_tokens > first.prefill_tokens
+    assert tiny_text_generation_model.session_stats()["hits"] == 1
+
+
+def test_session_keeps_the_summary_of_dropped_turns(tiny_text_generation_model) -> None:
+    from huggingfastapi.models.payload import TextGenerationPayload
+
+    model = tiny_text_generation_model
+    model.prompt_token_budget, model.history_policy = 200, "summarize"
+    summaries = []
+    model._summarize = lambda history, previous=None: summaries.append(previous) or f"ringkasan {len(summaries)}"
+
+    for turn in range(6):
+        model.generate(TextGenerationPayload(text=f"pertanyaan nomor {turn} " * 3, session_id="s", max_new_tokens=8))
+    session = model.sessions.checkout("s")
+
+    # Each summary replaces the previous one, which the model sees while writing it
+    assert summaries[0] is None and summaries[1:] == [f"ringkasan {n}" for n in range(1, len(summaries))]
+    assert session.summary == f"ringkasan {len(summaries)}"
+
+
+def test_abandoned_stream_checks_its_session_back_in(tiny_text_generation_model) -> None:
+    from huggingfastapi.models.payload import TextGenerationPayload
+
+    model = tiny_text_generation_model
+    first = model.generate(TextGenerationPayload(text="Halo", session_id="s", max_new_tokens=4))
+    stream = model.stream(TextGenerationPayload(text="Lagi", session_id="s", max_new_tokens=32))
+    assert next(stream)["event"] == "token"
+    stream.close()
+
+    deadline = time.monotonic() + 5
+    while model.session_stats()["cached_sessions"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    third = model.generate(TextGenerationPayload(text="Lagi", session_id="s", max_new_tokens=4))
+
+    # The abandoned turn left the history as it was and the first turn's cache reusable
+    assert len(model.sessions.checkout("s").history) == 4
+    assert third.cached_tokens > first.prefill_tokens
@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from huggingfastapi.services.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_execution() -> None:
+    single_flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        leader = pool.submit(single_flight.do, "key", compute)
+        started.wait()
+        followers = [pool.submit(single_flight.do, "key", compute) for _ in range(4)]
+        results = [leader.result()] + [follower.result() for follower in followers]
+
+    assert results == ["result"] * 5
+    assert len(calls) == 1
+    stats = single_flight.stats()
+    assert stats["executions"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["in_flight"] == 0
+
+
+def test_exception_reaches_every_waiter_and_is_not_kept() -> None:
+    single_flight = SingleFlight()
+
+    def fail():
+        raise RuntimeError("model error")
+
+    with pytest.raises(RuntimeError):
+        single_flight.do("key", fail)
+    assert single_flight.do("key", lambda: "retried") == "retried"
+
+
+def test_concurrent_coroutines_share_one_execution() -> None:
+    single_flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*[single_flight.do_async("key", compute) for _ in range(10)])
+
+    assert asyncio.run(main()) == ["result"] * 10
+    assert len(calls) == 1
+    assert single_flight.stats()["coalesced"] == 9
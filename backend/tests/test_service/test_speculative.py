@@ -0,0 +1,23 @@
+import threading
+
+import torch
+
+from huggingfastapi.services.text_generation import _ForwardCounter
+
+
+def test_forward_counter_only_counts_the_current_thread() -> None:
+    target, draft = torch.nn.Linear(2, 2), torch.nn.Linear(2, 2)
+    counter = _ForwardCounter(target=target, draft=draft)
+    inputs = torch.zeros(1, 2)
+
+    target(inputs)  # outside counting()
+    with counter.counting() as counts:
+        for _ in range(3):
+            draft(inputs)
+        target(inputs)
+        # A concurrent request on another thread must not leak into these counts
+        other = threading.Thread(target=lambda: [target(inputs) for _ in range(5)])
+        other.start()
+        other.join()
+
+    assert counts == {"draft": 3, "target": 1}
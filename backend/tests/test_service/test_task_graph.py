@@ -0,0 +1,33 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from huggingfastapi.services.task_graph import TaskGraph
+
+
+def test_independent_tasks_run_concurrently() -> None:
+    graph = TaskGraph()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for name in ["a", "b", "c", "d"]:
+            graph.add(name, lambda _, name=name: pool.submit(lambda: time.sleep(0.2) or name))
+        started = time.perf_counter()
+        results, durations = graph.run(timeout=5)
+
+    assert results == {"a": "a", "b": "b", "c": "c", "d": "d"}
+    assert time.perf_counter() - started < 0.6
+    assert set(durations) == set(results)
+
+
+def test_dependants_receive_results_and_failures_propagate() -> None:
+    graph = TaskGraph()
+    completed = []
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        graph.add("base", lambda _: pool.submit(lambda: 2))
+        graph.add("double", lambda deps: pool.submit(lambda: deps["base"] * 2), deps=["base"])
+        graph.add("broken", lambda _: pool.submit(lambda: 1 / 0))
+        graph.add("after_broken", lambda deps: pool.submit(lambda: "unreachable"), deps=["broken"])
+        results, _ = graph.run(on_complete=lambda name, result: completed.append(name), timeout=5)
+
+    assert results["double"] == 4
+    assert isinstance(results["broken"], ZeroDivisionError)
+    assert results["after_broken"] is results["broken"]
+    assert completed.index("base") < completed.index("double")
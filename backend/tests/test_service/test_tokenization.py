@@ -0,0 +1,32 @@
+import threading
+
+from huggingfastapi.services.tokenization import prefetched
+
+
+def test_prefetched_keeps_order_and_prepares_ahead() -> None:
+    prepared = []
+    next_ready = threading.Event()
+
+    def prepare(item: int) -> int:
+        prepared.append(item)
+        if item == 1:
+            next_ready.set()
+        return item * 10
+
+    results = []
+    for result in prefetched(range(5), prepare, depth=1):
+        if result == 0:
+            # Item 1 is tokenized while the caller still works on item 0
+            assert next_ready.wait(timeout=5)
+        results.append(result)
+
+    assert results == [0, 10, 20, 30, 40]
+    assert sorted(prepared) == [0, 1, 2, 3, 4]
+
+
+def test_prefetched_stops_submitting_when_the_caller_stops() -> None:
+    prepared = []
+    for result in prefetched(range(100), prepared.append, depth=2):
+        break
+
+    assert len(prepared) <= 3
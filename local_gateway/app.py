@@ -1,17 +1,19 @@
 import os
-import requests
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+import time
+import json
+import asyncio
+import hashlib
 import logging
+import collections
+from contextlib import asynccontextmanager
 
-# Inisialisasi aplikasi Flask
-app = Flask(__name__)
-
-# Terapkan CORS ke aplikasi Anda agar bisa diakses dari front-end
-# Ini mengizinkan semua domain, cocok untuk development.
-# Untuk produksi, Anda bisa membatasinya ke domain FE Anda, misal: CORS(app, origins="https.your-frontend.com")
-# CORS for localhost:5173
-CORS(app, origins=["http://localhost:5173"])
+import anyio
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -19,153 +21,389 @@ logger = logging.getLogger(__name__)
 
 # --- Konfigurasi ---
 # URL API tujuan yang akan Anda panggil
-BASE_TARGET_API_URL = "https://508c20e2d15d.ngrok-free.app/"
-API_TOKEN = "85ce9e41-8848-45b7-a608-e3ad168d378c"
+BASE_TARGET_API_URL = os.environ.get("BACKEND_URL", "https://508c20e2d15d.ngrok-free.app/")
+API_TOKEN = os.environ.get("API_TOKEN", "85ce9e41-8848-45b7-a608-e3ad168d378c")
+GATEWAY_PORT = int(os.environ.get("GATEWAY_PORT", "5000"))
+DEBUG_MODE = os.environ.get("DEBUG_MODE", "false").lower() == "true"
+
+# Koneksi keep-alive ke backend dipakai ulang, jadi handshake TCP/TLS lewat ngrok hanya sekali
+MAX_CONNECTIONS = int(os.environ.get("GATEWAY_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GATEWAY_MAX_KEEPALIVE", "20"))
+# Batas request yang sedang diteruskan ke backend; sisanya menunggu slot
+MAX_CONCURRENCY = int(os.environ.get("GATEWAY_MAX_CONCURRENCY", "64"))
+# Berapa lama (detik) request menunggu slot sebelum dijawab 503
+QUEUE_TIMEOUT = float(os.environ.get("GATEWAY_QUEUE_TIMEOUT", "10"))
+
+# Timeout baca (detik) per route; evaluasi GoTo bisa berjalan beberapa menit
+ROUTE_TIMEOUTS = {
+    "/health/heartbeat": 5,
+    "/api/v1/health": 10,
+    "/api/v1/detect-ai": 30,
+    "/api/v1/generate-text": 120,
+    "/api/v1/chat": 120,
+    "/api/v1/evaluate": 120,
+    "/api/v1/evaluate-goto": 300,
+    "/api/v1/evaluate-jobs": 15,
+}
+DEFAULT_TIMEOUT = 60
+# Respons yang diteruskan apa adanya (termasuk stream SSE/NDJSON)
+PASSTHROUGH_CONTENT_TYPES = ("application/json", "text/event-stream", "application/x-ndjson")
+
+# Cache respons di gateway: input yang sama tidak perlu melewati tunnel ngrok dua kali
+CACHE_ENABLED = os.environ.get("GATEWAY_CACHE_ENABLED", "true").lower() == "true"
+CACHE_SIZE = int(os.environ.get("GATEWAY_CACHE_SIZE", "1024"))
+# TTL (detik) per route yang di-cache; route lain selalu diteruskan ke backend
+CACHE_TTLS = {
+    "/api/v1/detect-ai": int(os.environ.get("GATEWAY_CACHE_TTL_DETECT_AI", "86400")),
+    "/api/v1/evaluate": int(os.environ.get("GATEWAY_CACHE_TTL_EVALUATE", "21600")),
+    "/api/v1/evaluate-goto": int(os.environ.get("GATEWAY_CACHE_TTL_EVALUATE_GOTO", "21600")),
+}
+
+
+class ResponseCache:
+    """
+    LRU cache respons backend untuk route POST yang hasilnya deterministik
+    Key = route + sha256 dari body JSON kanonik, jadi urutan key dan spasi tidak berpengaruh.
+    Request identik yang datang bersamaan digabung: hanya satu yang diteruskan ke backend,
+    sisanya menunggu hasil yang sama. Hanya respons 200 JSON yang disimpan.
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = dict(CACHE_TTLS if ttls is None else ttls)
+        # key -> (expires_at, status_code, content_type, body)
+        self._entries = collections.OrderedDict()
+        self._inflight = {}
+        self._stats = {"hits": 0, "misses": 0, "shared": 0}
+
+    @staticmethod
+    def make_key(route, data):
+        body = json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return f"{route}:{hashlib.sha256(body.encode('utf-8')).hexdigest()}"
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, route, response):
+        content_type = response.headers.get("content-type", "")
+        if response.status_code != 200 or not content_type.startswith("application/json"):
+            return
+        # Backend menandai hasil evaluasi yang tidak lengkap dengan no-store
+        if "no-store" in response.headers.get("cache-control", ""):
+            return
+        self._entries[key] = (time.monotonic() + self.ttls[route], response.status_code, content_type, response.body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def fetch(self, route, data, compute):
+        """
+        Kembalikan respons dari cache, dari request identik yang sedang berjalan, atau dari `compute()`
+        """
+        key = self.make_key(route, data)
+        entry = self.get(key)
+        if entry is not None:
+            self._stats["hits"] += 1
+            return self._respond(entry[1], entry[2], entry[3], "HIT")
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["shared"] += 1
+            state = "SHARED"
+        else:
+            self._stats["misses"] += 1
+            state = "MISS"
+            task = asyncio.ensure_future(self._compute(key, route, compute))
+            self._inflight[key] = task
+        # shield: client yang putus tidak membatalkan request yang ditunggu client lain
+        response = await asyncio.shield(task)
+        return self._respond(response.status_code, response.headers.get("content-type"), response.body, state, response.headers)
+
+    async def _compute(self, key, route, compute):
+        try:
+            response = await compute()
+            self.put(key, route, response)
+            return response
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _respond(status_code, content_type, body, state, upstream_headers=None):
+        headers = {"X-Gateway-Cache": state}
+        for name in ("Retry-After", "Cache-Control"):
+            if upstream_headers is not None and name.lower() in upstream_headers:
+                headers[name] = upstream_headers[name.lower()]
+        return Response(body, status_code=status_code, media_type=content_type, headers=headers)
+
+    def stats(self):
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["shared"]
+        return {
+            **self._stats,
+            "hit_rate": round((self._stats["hits"] + self._stats["shared"]) / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._inflight),
+            "ttls": self.ttls,
+        }
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Satu client (dan satu pool koneksi) untuk seluruh umur gateway
+    app.state.client = httpx.AsyncClient(
+        base_url=BASE_TARGET_API_URL,
+        headers={'token': API_TOKEN},
+        limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS),
+    )
+    app.state.slots = asyncio.Semaphore(MAX_CONCURRENCY)
+    app.state.cache = ResponseCache() if CACHE_ENABLED else None
+    yield
+    await app.state.client.aclose()
 
-def make_api_request(endpoint_path, data=None, method='POST'):
+
+# Inisialisasi aplikasi FastAPI
+app = FastAPI(title="EIRA Local Gateway", version="1.1.0", lifespan=lifespan)
+
+# Terapkan CORS ke aplikasi Anda agar bisa diakses dari front-end
+# Untuk produksi, Anda bisa membatasinya ke domain FE Anda
+# CORS for localhost:5173
+app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:5173"], allow_methods=["*"], allow_headers=["*"])
+
+
+def route_timeout(endpoint_path):
+    for prefix, seconds in ROUTE_TIMEOUTS.items():
+        if endpoint_path == prefix or endpoint_path.startswith(prefix + "/"):
+            return seconds
+    return DEFAULT_TIMEOUT
+
+
+async def make_api_request(endpoint_path, data=None, method='POST', stream=True):
     """
     Helper function untuk mengirim request ke API backend
+    Body respons di-stream langsung ke FE, slot konkurensi dilepas saat stream selesai
+    Dengan stream=False body dibaca penuh dulu (dipakai oleh cache)
     """
-    headers = {
-        'token': API_TOKEN,
-        'Content-Type': 'application/json'
-    }
-    
-    url = BASE_TARGET_API_URL + endpoint_path
-    
+    slots: asyncio.Semaphore = app.state.slots
     try:
-        if method == 'GET':
-            response = requests.get(url, headers=headers)
-        else:  # POST
-            response = requests.post(url, headers=headers, json=data)
+        await asyncio.wait_for(slots.acquire(), timeout=QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Gateway penuh, menolak request ke {endpoint_path}")
+        return JSONResponse(
+            {"error": "Gateway sedang penuh, coba lagi nanti"}, status_code=503, headers={"Retry-After": "5"}
+        )
 
-        # Coba dapatkan respons JSON dari API tujuan
+    client: httpx.AsyncClient = app.state.client
+    timeout = httpx.Timeout(route_timeout(endpoint_path), connect=10.0)
+    request = client.build_request(method, endpoint_path.lstrip("/"), json=data, timeout=timeout)
+
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.HTTPError as e:
+        slots.release()
+        logger.error(f"Error saat menghubungi API tujuan: {e!r}")
+        return JSONResponse({"error": "Gagal menghubungi API tujuan", "details": str(e) or repr(e)}, status_code=504)
+
+    async def close():
+        await response.aclose()
+        slots.release()
+
+    content_type = response.headers.get("content-type", "")
+    passthrough = content_type.startswith(PASSTHROUGH_CONTENT_TYPES)
+    headers = {"Content-Type": content_type}
+    for name in ("Retry-After", "Cache-Control"):
+        if name.lower() in response.headers:
+            headers[name] = response.headers[name.lower()]
+
+    if not stream or not passthrough:
         try:
-            response_data = response.json()
-        except requests.exceptions.JSONDecodeError:
-            return jsonify({
+            content = await response.aread()
+        except httpx.HTTPError as e:
+            logger.error(f"Error saat membaca respons API tujuan: {e!r}")
+            return JSONResponse({"error": "Gagal menghubungi API tujuan", "details": str(e) or repr(e)}, status_code=504)
+        finally:
+            await close()
+        if not passthrough:
+            # Misalnya halaman error HTML dari ngrok
+            return JSONResponse({
                 "error": "Gagal mem-parsing respons dari API tujuan",
                 "status_code": response.status_code,
-                "content": response.text
-            }), 502
+                "content": content.decode("utf-8", errors="replace"),
+            }, status_code=502)
+        return Response(content, status_code=response.status_code, headers=headers)
 
-        return jsonify(response_data), response.status_code
+    async def relay():
+        # finally juga jalan saat stream backend putus di tengah jalan atau client menutup koneksi
+        try:
+            async for chunk in response.aiter_bytes():
+                yield chunk
+        except httpx.HTTPError as e:
+            logger.error(f"Stream dari API tujuan terputus: {e!r}")
+            raise
+        finally:
+            with anyio.CancelScope(shield=True):
+                await close()
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error saat menghubungi API tujuan: {e}")
-        return jsonify({"error": "Gagal menghubungi API tujuan", "details": str(e)}), 504
+    return StreamingResponse(relay(), status_code=response.status_code, headers=headers)
+
+
+async def read_json(request: Request, field):
+    """
+    Baca body JSON dan pastikan field wajib ada; kembalikan (data, respons error)
+    """
+    try:
+        data = await request.json()
+        if field not in data:
+            return None, JSONResponse({"error": f"Field '{field}' tidak ditemukan di body request"}, status_code=400)
+    except Exception:
+        return None, JSONResponse({"error": "Body request tidak valid atau bukan JSON"}, status_code=400)
+    return data, None
+
+
+async def forward_json(request: Request, endpoint_path, field):
+    data, error = await read_json(request, field)
+    if error is not None:
+        return error
+    cache: ResponseCache = app.state.cache
+    if cache is not None and endpoint_path in cache.ttls:
+        return await cache.fetch(endpoint_path, data, lambda: make_api_request(endpoint_path, data, stream=False))
+    return await make_api_request(endpoint_path, data)
 
 
 # === HEALTH ENDPOINTS ===
 
-@app.route('/health/heartbeat', methods=['GET'])
-def gateway_heartbeat():
+@app.get('/health/heartbeat')
+async def gateway_heartbeat():
     """
     Health check endpoint - heartbeat
     """
-    return make_api_request("/health/heartbeat", method='GET')
+    return await make_api_request("/health/heartbeat", method='GET')
 
 
-@app.route('/api/v1/health', methods=['GET'])
-def gateway_health():
+@app.get('/api/v1/health')
+async def gateway_health():
     """
     Health check endpoint - full health status
     """
-    print("Checking health status...")
-    return make_api_request("/api/v1/health", method='GET')
+    logger.info("Checking health status...")
+    return await make_api_request("/api/v1/health", method='GET')
 
 
 # === AI DETECTION ENDPOINTS ===
 
-@app.route('/api/v1/detect-ai', methods=['POST'])
-def gateway_detect_ai():
+@app.post('/api/v1/detect-ai')
+async def gateway_detect_ai(request: Request):
     """
     AI Detection endpoint
     Detects if text is AI-generated or human-written
     """
-    try:
-        data = request.get_json()
-        if 'text' not in data:
-            return jsonify({"error": "Field 'text' tidak ditemukan di body request"}), 400
-    except Exception:
-        return jsonify({"error": "Body request tidak valid atau bukan JSON"}), 400
-
-    return make_api_request("/api/v1/detect-ai", data)
+    return await forward_json(request, "/api/v1/detect-ai", 'text')
 
 
 # === TEXT GENERATION ENDPOINTS ===
 
-@app.route('/api/v1/generate-text', methods=['POST'])
-def gateway_generate_text():
+@app.post('/api/v1/generate-text')
+async def gateway_generate_text(request: Request):
     """
     Text generation endpoint using Gemma2-9B model
     """
-    try:
-        data = request.get_json()
-        if 'text' not in data:
-            return jsonify({"error": "Field 'text' tidak ditemukan di body request"}), 400
-    except Exception:
-        return jsonify({"error": "Body request tidak valid atau bukan JSON"}), 400
+    return await forward_json(request, "/api/v1/generate-text", 'text')
 
-    return make_api_request("/api/v1/generate-text", data)
+
+@app.post('/api/v1/generate-text/stream')
+async def gateway_generate_text_stream(request: Request):
+    """
+    Text generation sebagai server-sent events, diteruskan token demi token
+    """
+    return await forward_json(request, "/api/v1/generate-text/stream", 'text')
 
 
-@app.route('/api/v1/chat', methods=['POST'])
-def gateway_chat():
+@app.post('/api/v1/chat')
+async def gateway_chat(request: Request):
     """
     Chat endpoint using Gemma2-9B model
     Simplified chat interface for conversational text generation
     """
-    try:
-        data = request.get_json()
-        if 'text' not in data:
-            return jsonify({"error": "Field 'text' tidak ditemukan di body request"}), 400
-    except Exception:
-        return jsonify({"error": "Body request tidak valid atau bukan JSON"}), 400
+    return await forward_json(request, "/api/v1/chat", 'text')
 
-    return make_api_request("/api/v1/chat", data)
+
+@app.post('/api/v1/chat/stream')
+async def gateway_chat_stream(request: Request):
+    """
+    Chat sebagai server-sent events, diteruskan token demi token
+    """
+    return await forward_json(request, "/api/v1/chat/stream", 'text')
 
 
 # === PROMPT EVALUATION ENDPOINTS ===
 
-@app.route('/api/v1/evaluate', methods=['POST'])
-def gateway_evaluate_gemini():
+@app.post('/api/v1/evaluate')
+async def gateway_evaluate_gemini(request: Request):
     """
     Prompt evaluation endpoint using Gemini model
     """
-    try:
-        data = request.get_json()
-        if 'prompt' not in data:
-            return jsonify({"error": "Field 'prompt' tidak ditemukan di body request"}), 400
-    except Exception:
-        return jsonify({"error": "Body request tidak valid atau bukan JSON"}), 400
-
-    return make_api_request("/api/v1/evaluate", data)
+    return await forward_json(request, "/api/v1/evaluate", 'prompt')
 
 
-@app.route('/api/v1/evaluate-goto', methods=['POST'])
-def gateway_evaluate_goto():
+@app.post('/api/v1/evaluate-goto')
+async def gateway_evaluate_goto(request: Request):
     """
     Prompt evaluation endpoint using GoTo model
     Endpoint ini bertindak sebagai gateway.
     Menerima request dari FE, meneruskannya ke API tujuan,
     dan mengembalikan responsnya ke FE.
     """
-    try:
-        data = request.get_json()
-        if 'prompt' not in data:
-            return jsonify({"error": "Field 'prompt' tidak ditemukan di body request"}), 400
-    except Exception:
-        return jsonify({"error": "Body request tidak valid atau bukan JSON"}), 400
+    return await forward_json(request, "/api/v1/evaluate-goto", 'prompt')
+
+
+@app.post('/api/v1/evaluate-goto/stream')
+async def gateway_evaluate_goto_stream(request: Request):
+    """
+    Evaluasi GoTo bertahap (server-sent events), setiap skor diteruskan begitu selesai
+    """
+    return await forward_json(request, "/api/v1/evaluate-goto/stream", 'prompt')
+
+
+# === EVALUATION JOB ENDPOINTS ===
+
+@app.post('/api/v1/evaluate-jobs')
+async def gateway_create_evaluation_job(request: Request):
+    """
+    Antrekan evaluasi prompt dan langsung kembalikan job id
+    Hasilnya diambil lewat polling ke /api/v1/evaluate-jobs/<job_id>
+    """
+    return await forward_json(request, "/api/v1/evaluate-jobs", 'prompt')
 
-    return make_api_request("/api/v1/evaluate-goto", data)
+
+@app.get('/api/v1/evaluate-jobs/{job_id}')
+async def gateway_get_evaluation_job(job_id: str):
+    """
+    Status dan hasil sebuah job evaluasi
+    """
+    return await make_api_request(f"/api/v1/evaluate-jobs/{job_id}", method='GET')
+
+
+# === GATEWAY ENDPOINTS ===
+
+@app.get('/api/v1/gateway/cache')
+async def gateway_cache_stats():
+    """
+    Statistik cache respons gateway
+    """
+    cache: ResponseCache = app.state.cache
+    return {"enabled": cache is not None, **(cache.stats() if cache is not None else {})}
 
 
 # === API DOCUMENTATION ENDPOINT ===
 
-@app.route('/api/v1/endpoints', methods=['GET'])
-def list_endpoints():
+@app.get('/api/v1/endpoints')
+async def list_endpoints():
     """
     List all available endpoints in the gateway
     """
@@ -177,7 +415,7 @@ def list_endpoints():
                 "description": "Basic heartbeat check"
             },
             "health": {
-                "method": "GET", 
+                "method": "GET",
                 "path": "/api/v1/health",
                 "description": "Full health status including model connectivity"
             }
@@ -193,17 +431,29 @@ def list_endpoints():
         "text_generation": {
             "generate_text": {
                 "method": "POST",
-                "path": "/api/v1/generate-text", 
+                "path": "/api/v1/generate-text",
                 "description": "Generate text using Gemma2-9B model",
                 "required_fields": ["text"],
                 "optional_fields": ["system_message", "conversation_history", "max_new_tokens", "temperature"]
             },
+            "generate_text_stream": {
+                "method": "POST",
+                "path": "/api/v1/generate-text/stream",
+                "description": "Generate text as server-sent events",
+                "required_fields": ["text"]
+            },
             "chat": {
                 "method": "POST",
                 "path": "/api/v1/chat",
                 "description": "Chat interface using Gemma2-9B model",
                 "required_fields": ["text"],
                 "optional_fields": ["conversation_history", "max_new_tokens", "temperature"]
+            },
+            "chat_stream": {
+                "method": "POST",
+                "path": "/api/v1/chat/stream",
+                "description": "Chat interface as server-sent events",
+                "required_fields": ["text"]
             }
         },
         "prompt_evaluation": {
@@ -214,49 +464,72 @@ def list_endpoints():
                 "required_fields": ["prompt"]
             },
             "evaluate_goto": {
-                "method": "POST", 
+                "method": "POST",
                 "path": "/api/v1/evaluate-goto",
                 "description": "Evaluate prompts using GoTo model (Indonesian optimized)",
                 "required_fields": ["prompt"]
+            },
+            "evaluate_goto_stream": {
+                "method": "POST",
+                "path": "/api/v1/evaluate-goto/stream",
+                "description": "GoTo evaluation as server-sent events, one event per finished metric",
+                "required_fields": ["prompt"]
+            },
+            "create_evaluation_job": {
+                "method": "POST",
+                "path": "/api/v1/evaluate-jobs",
+                "description": "Queue a prompt evaluation and return a job id immediately",
+                "required_fields": ["prompt"],
+                "optional_fields": ["evaluator", "priority", "callback_url"]
+            },
+            "get_evaluation_job": {
+                "method": "GET",
+                "path": "/api/v1/evaluate-jobs/<job_id>",
+                "description": "Poll the status and result of an evaluation job"
+            }
+        },
+        "gateway": {
+            "cache_stats": {
+                "method": "GET",
+                "path": "/api/v1/gateway/cache",
+                "description": "Hit rate, size and TTLs of the gateway response cache"
             }
         }
     }
-    
-    return jsonify({
+
+    return {
         "message": "EIRA Local Gateway API",
-        "version": "1.0.0",
+        "version": "1.1.0",
         "backend_url": BASE_TARGET_API_URL,
         "endpoints": endpoints
-    })
+    }
 
 
 # === ERROR HANDLERS ===
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({
-        "error": "Endpoint not found",
-        "message": "The requested endpoint does not exist",
-        "available_endpoints": "/api/v1/endpoints"
-    }), 404
-
-
-@app.errorhandler(500)
-def internal_error(error):
-    return jsonify({
+@app.exception_handler(StarletteHTTPException)
+async def http_error(request: Request, error: StarletteHTTPException):
+    if error.status_code == 404:
+        return JSONResponse({
+            "error": "Endpoint not found",
+            "message": "The requested endpoint does not exist",
+            "available_endpoints": "/api/v1/endpoints"
+        }, status_code=404)
+    return JSONResponse({"error": error.detail}, status_code=error.status_code)
+
+
+@app.exception_handler(Exception)
+async def internal_error(request: Request, error: Exception):
+    logger.error(f"Unhandled gateway error: {error!r}")
+    return JSONResponse({
         "error": "Internal server error",
         "message": "Something went wrong on the gateway server"
-    }), 500
+    }, status_code=500)
 
 
-# Menjalankan server Flask
+# Menjalankan server gateway
 if __name__ == '__main__':
     print("🚀 EIRA Local Gateway starting...")
     print(f"📡 Backend API: {BASE_TARGET_API_URL}")
-    print("📋 Available endpoints: http://localhost:5000/api/v1/endpoints")
-    app.run(debug=True, port=5000)
-
-
-# Menjalankan server Flask
-if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    print(f"📋 Available endpoints: http://localhost:{GATEWAY_PORT}/api/v1/endpoints")
+    uvicorn.run("app:app", host="127.0.0.1", port=GATEWAY_PORT, reload=DEBUG_MODE)
@@ -28,8 +28,8 @@ fi
 echo "✅ Requirements installed successfully."
 
 # Start the gateway
-echo "🌐 Starting gateway on http://localhost:5000..."
-echo "📋 Available endpoints: http://localhost:5000/api/v1/endpoints"
+echo "🌐 Starting gateway on http://localhost:${GATEWAY_PORT:-5000}..."
+echo "📋 Available endpoints: http://localhost:${GATEWAY_PORT:-5000}/api/v1/endpoints"
 echo "🧪 Run tests: python3 test_gateway.py"
 echo ""
 echo "Press Ctrl+C to stop the gateway"
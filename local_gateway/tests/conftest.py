@@ -0,0 +1,35 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import app as gateway
+
+
+class Backend:
+    """Stand-in for the backend API: `handler` answers every proxied request"""
+
+    def __init__(self):
+        self.requests = []
+        self.handler = lambda request: httpx.Response(200, json={"ok": True})
+
+    def __call__(self, request):
+        self.requests.append(request)
+        return self.handler(request)
+
+
+@pytest.fixture()
+def backend():
+    return Backend()
+
+
+@pytest.fixture()
+def client(backend):
+    with TestClient(gateway.app) as test_client:
+        gateway.app.state.client = httpx.AsyncClient(
+            base_url="http://backend", transport=httpx.MockTransport(backend)
+        )
+        gateway.app.state.slots = asyncio.Semaphore(1)
+        gateway.app.state.cache = gateway.ResponseCache()
+        yield test_client
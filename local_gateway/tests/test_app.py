@@ -0,0 +1,53 @@
+import httpx
+
+
+class FailingStream(httpx.AsyncByteStream):
+    """SSE body that times out after its first event"""
+
+    def __init__(self):
+        self.closed = False
+
+    async def __aiter__(self):
+        yield b"data: {\"event\": \"token\"}\n\n"
+        raise httpx.ReadTimeout("backend berhenti mengirim")
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_streamed_response_is_passed_through(client, backend) -> None:
+    backend.handler = lambda request: httpx.Response(
+        200, headers={"content-type": "text/event-stream"}, content=b"data: 1\n\ndata: 2\n\n"
+    )
+
+    response = client.post("/api/v1/chat/stream", json={"text": "halo"})
+
+    assert response.status_code == 200
+    assert response.text == "data: 1\n\ndata: 2\n\n"
+    assert backend.requests[0].url.path == "/api/v1/chat/stream"
+
+
+def test_failed_stream_releases_its_slot_and_upstream_response(client, backend) -> None:
+    stream = FailingStream()
+    backend.handler = lambda request: httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=stream)
+
+    try:
+        client.post("/api/v1/generate-text/stream", json={"text": "halo"})
+    except httpx.ReadTimeout:
+        pass  # the client sees a truncated stream
+
+    assert stream.closed
+    # The only slot is free again, so the next request goes through instead of waiting for a 503
+    backend.handler = lambda request: httpx.Response(200, json={"status": "ok"})
+    assert client.get("/health/heartbeat").json() == {"status": "ok"}
+
+
+def test_degraded_evaluations_are_not_cached(client, backend) -> None:
+    backend.handler = lambda request: httpx.Response(200, json={"degraded": True}, headers={"Cache-Control": "no-store"})
+
+    first = client.post("/api/v1/evaluate-goto", json={"prompt": "Tulis puisi"})
+    second = client.post("/api/v1/evaluate-goto", json={"prompt": "Tulis puisi"})
+
+    assert len(backend.requests) == 2
+    assert second.headers["X-Gateway-Cache"] == "MISS"
+    assert first.headers["Cache-Control"] == "no-store"
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse, Response
+
+from app import ResponseCache
+
+ROUTE = "/api/v1/detect-ai"
+
+
+def test_key_ignores_field_order_and_whitespace() -> None:
+    first = ResponseCache.make_key(ROUTE, {"text": "halo dunia", "lang": "id"})
+    second = ResponseCache.make_key(ROUTE, {"lang": "id", "text": "halo dunia"})
+
+    assert first == second
+    assert first != ResponseCache.make_key(ROUTE, {"text": "halo  dunia", "lang": "id"})
+    assert first != ResponseCache.make_key("/api/v1/evaluate", {"text": "halo dunia", "lang": "id"})
+
+
+def test_entries_expire_after_their_route_ttl(monkeypatch) -> None:
+    cache = ResponseCache(ttls={ROUTE: 60})
+    cache.put("k", ROUTE, JSONResponse({"label": "human"}))
+    assert cache.get("k") is not None
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted() -> None:
+    cache = ResponseCache(max_entries=2, ttls={ROUTE: 60})
+    cache.put("a", ROUTE, JSONResponse({}))
+    cache.put("b", ROUTE, JSONResponse({}))
+    cache.get("a")
+    cache.put("c", ROUTE, JSONResponse({}))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+
+
+def test_only_successful_json_responses_are_stored() -> None:
+    cache = ResponseCache(ttls={ROUTE: 60})
+    cache.put("error", ROUTE, JSONResponse({"error": "x"}, status_code=500))
+    cache.put("html", ROUTE, Response("<html/>", media_type="text/html"))
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_concurrent_identical_requests_share_one_backend_call() -> None:
+    cache = ResponseCache(ttls={ROUTE: 60})
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return JSONResponse({"label": "ai"})
+
+    async def scenario():
+        responses = await asyncio.gather(*[cache.fetch(ROUTE, {"text": "sama"}, compute) for _ in range(4)])
+        responses.append(await cache.fetch(ROUTE, {"text": "sama"}, compute))
+        return responses
+
+    responses = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert [response.headers["X-Gateway-Cache"] for response in responses] == ["MISS", "SHARED", "SHARED", "SHARED", "HIT"]
+    assert all(response.body == b'{"label":"ai"}' for response in responses)
+
+
+def test_no_store_responses_are_not_cached() -> None:
+    cache = ResponseCache(ttls={ROUTE: 60})
+    cache.put("k", ROUTE, JSONResponse({"degraded": True}, headers={"Cache-Control": "no-store"}))
+
+    assert cache.get("k") is None